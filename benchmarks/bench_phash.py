@@ -0,0 +1,91 @@
+"""
+FILE       : bench_phash.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-11
+DESCRIPTION:
+Benchmarks near-duplicate lookups as a user's upload index grows. For each
+index size it builds a multi-index hash table of random 64-bit hashes and
+times queries that are a few bits away from an indexed hash, compared with a
+linear scan over every hash.
+
+Usage: python benchmarks/bench_phash.py [--sizes 100,1000,10000,100000]
+                                        [--threshold 6] [--queries 200]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from near_duplicate import MultiIndexHash, hamming, HASH_BITS
+
+
+# FUNCTION   : flip_bits
+# DESCRIPTION: Returns value with `count` random bits flipped (a simulated re-scan)
+# PARAMETERS : value (int), count (int), rng (random.Random)
+# RETURNS    : int
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(HASH_BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+# FUNCTION   : run
+# DESCRIPTION: Times indexed and linear-scan lookups for one index size
+# PARAMETERS : size (int), threshold (int), queries (int), rng (random.Random)
+# RETURNS    : dict with timings in microseconds per query
+
+def run(size, threshold, queries, rng):
+    hashes = [rng.getrandbits(HASH_BITS) for _ in range(size)]
+    index = MultiIndexHash(max_distance=threshold)
+    start = time.perf_counter()
+    for i, value in enumerate(hashes):
+        index.add(value, i)
+    build = time.perf_counter() - start
+
+    probes = [flip_bits(rng.choice(hashes), rng.randint(0, threshold), rng) for _ in range(queries)]
+
+    start = time.perf_counter()
+    indexed = [len(index.search(probe, threshold)) for probe in probes]
+    index_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scanned = [sum(1 for value in hashes if hamming(probe, value) <= threshold) for probe in probes]
+    scan_time = time.perf_counter() - start
+
+    if indexed != scanned:
+        raise AssertionError("Index and linear scan returned different matches")
+
+    return {
+        "size": size,
+        "build_ms": round(build * 1000, 2),
+        "index_us": round(index_time / queries * 1e6, 1),
+        "linear_us": round(scan_time / queries * 1e6, 1),
+        "matches": sum(indexed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("DESCRIPTION:")[0])
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--threshold", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'size':>8} {'build ms':>10} {'index us':>10} {'linear us':>11} {'matches':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        result = run(size, args.threshold, args.queries, rng)
+        print(f"{result['size']:>8} {result['build_ms']:>10} {result['index_us']:>10} "
+              f"{result['linear_us']:>11} {result['matches']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+FILE       : bench_preprocess.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-14
+DESCRIPTION:
+Runs the image pre-processing stage over a set of images (the Test folder by
+default) and reports the bytes saved and time spent per image. With --ocr the
+original and pre-processed images are both sent to the configured OCR engine
+and the similarity of the two texts is reported, to check that recognition
+is not hurt (use OCR_ENGINE=vision for this).
+
+Usage: python benchmarks/bench_preprocess.py [--ocr] [images ...]
+"""
+
+import os
+import sys
+import glob
+import time
+import difflib
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from preprocess import preprocess
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image pre-processing")
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--ocr", action="store_true",
+                        help="compare OCR text of original and pre-processed images")
+    args = parser.parse_args()
+
+    paths = args.images or sorted(glob.glob(os.path.join(ROOT, "Test", "*.png")))
+    engine = None
+    if args.ocr:
+        from ocr_engine import get_engine
+        engine = get_engine()
+
+    total_in = total_out = 0
+    print(f"{'image':<20} {'original':>10} {'output':>10} {'saved':>7} {'ms':>8}"
+          + (f" {'ocr ms':>8} {'ocr ms':>8} {'text sim':>8}" if engine else ""))
+    for path in paths:
+        with open(path, "rb") as image_file:
+            content = image_file.read()
+        # min_bytes=0 so small test images are processed too
+        output, stats = preprocess(content, min_bytes=0)
+        total_in += stats["original_bytes"]
+        total_out += stats["output_bytes"]
+        saved = 1 - stats["output_bytes"] / stats["original_bytes"]
+        line = (f"{os.path.basename(path):<20} {stats['original_bytes']:>10} "
+                f"{stats['output_bytes']:>10} {saved:>7.1%} {stats['seconds'] * 1000:>8.1f}")
+        if engine:
+            start = time.perf_counter()
+            original_text = engine.extract_text(content)
+            original_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            processed_text = engine.extract_text(output)
+            processed_ms = (time.perf_counter() - start) * 1000
+            similarity = difflib.SequenceMatcher(None, original_text, processed_text).ratio()
+            line += f" {original_ms:>8.0f} {processed_ms:>8.0f} {similarity:>8.3f}"
+        print(line)
+
+    if total_in:
+        print(f"Total: {total_in} -> {total_out} bytes ({1 - total_out / total_in:.1%} saved)")
+
+
+if __name__ == "__main__":
+    main()
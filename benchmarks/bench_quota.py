@@ -0,0 +1,109 @@
+"""
+FILE       : bench_quota.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-26
+DESCRIPTION:
+Drives the OCR quota limiter with a burst of calls from several threads against
+the fake engine, which injects quota (429) and server (503) errors. Reports
+how many calls succeeded, failed or ran out of quota, the rate actually sent
+compared with the limit, and call latency including waits and retries.
+
+Usage: python benchmarks/bench_quota.py [--rpm 120] [--threads 8] [--calls 200]
+                                        [--quota-errors 0.05] [--server-errors 0.05]
+                                        [--latency 0.02] [--wait 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+
+# FUNCTION   : percentile
+# DESCRIPTION: Nearest-rank percentile of a sorted list
+# PARAMETERS : values (sorted list of float), fraction (float, 0-1)
+# RETURNS    : float
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Usage:")[0])
+    parser.add_argument("--rpm", type=int, default=120)
+    parser.add_argument("--daily", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--quota-errors", type=float, default=0.05)
+    parser.add_argument("--server-errors", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--wait", type=float, default=10)
+    args = parser.parse_args()
+
+    # The limiter reads its settings from config at import time
+    os.environ.update({
+        "VISION_RATE_LIMIT": "memory",
+        "VISION_REQUESTS_PER_MINUTE": str(args.rpm),
+        "VISION_DAILY_BUDGET": str(args.daily),
+        "VISION_QUOTA_WAIT": str(args.wait),
+        "VISION_RETRY_BASE_DELAY": "0.05",
+        "VISION_RETRY_MAX_DELAY": "1",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ocr_engine import FakeEngine, LimitedEngine
+    import quota
+
+    fake = FakeEngine(latency=args.latency, quota_error_rate=args.quota_errors,
+                      server_error_rate=args.server_errors, seed=1)
+    engine = LimitedEngine(fake)
+    outcomes = {"ok": 0, "failed": 0, "quota_exceeded": 0}
+    latencies = []
+    lock = threading.Lock()
+    remaining_calls = [args.calls]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining_calls[0] == 0:
+                    return
+                remaining_calls[0] -= 1
+            start = time.perf_counter()
+            try:
+                engine.extract_text(b"page")
+                outcome = "ok"
+            except quota.QuotaExceeded:
+                outcome = "quota_exceeded"
+            except Exception:
+                outcome = "failed"
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    sent_per_minute = fake.counts["calls"] / elapsed * 60
+    print(f"{args.calls} calls from {args.threads} threads in {elapsed:.1f} s "
+          f"(limit {args.rpm}/min, burst {args.rpm})")
+    print(f"  outcomes      : {outcomes}")
+    print(f"  engine calls  : {fake.counts}")
+    print(f"  sent rate     : {sent_per_minute:.0f}/min (includes the initial burst)")
+    print(f"  latency p50   : {percentile(latencies, 0.50) * 1000:.0f} ms")
+    print(f"  latency p95   : {percentile(latencies, 0.95) * 1000:.0f} ms")
+    print(f"  latency max   : {latencies[-1] * 1000 if latencies else 0:.0f} ms")
+    print(f"  budget left   : {quota.remaining()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+FILE       : bench_render.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-01
+DESCRIPTION:
+Compares rendering downloads inline (in the request threads, as before) with
+the render pool. --threads threads each render documents of --pages pages of
+text for --seconds seconds. Reports documents per second and p50/p95 latency,
+and how late a light probe thread (standing in for the other requests of the
+same gunicorn worker) wakes up while the renders run, which shows the GIL
+contention the pool removes.
+
+Usage: python benchmarks/bench_render.py [--format pdf] [--pages 30] [--threads 4]
+                                         [--workers 2] [--seconds 10]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import exports
+from render_pool import RenderPool
+
+# About one page of handwritten notes
+PAGE = ("The quick brown fox jumps over the lazy dog while the students take notes "
+        "on the lecture about photosynthesis and cell respiration. ") * 20
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# FUNCTION   : probe
+# DESCRIPTION: Sleeps 10 ms at a time until stop is set and records how late
+#              each wake-up was
+# PARAMETERS : stop (threading.Event), delays (list) - Filled with seconds late
+# RETURNS    : None
+
+def probe(stop, delays):
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(0.01)
+        delays.append(time.perf_counter() - start - 0.01)
+
+
+# FUNCTION   : drive
+# DESCRIPTION: Renders documents from `threads` threads for `seconds` seconds
+# PARAMETERS : render (callable) - render(text, format) -> bytes
+#              text (str), format (str), threads (int), seconds (float)
+# RETURNS    : tuple - (latencies, probe delays, elapsed seconds)
+
+def drive(render, text, format, threads, seconds):
+    latencies = []
+    delays = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            render(text, format)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    prober = threading.Thread(target=probe, args=(stop, delays))
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    prober.start()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return latencies, delays, elapsed
+
+
+def report(label, latencies, delays, elapsed):
+    print(f"{label:<8} {len(latencies) / elapsed:7.1f} docs/s"
+          f"  p50 {percentile(latencies, 0.50) * 1000:7.0f} ms"
+          f"  p95 {percentile(latencies, 0.95) * 1000:7.0f} ms"
+          f"  probe late p95 {percentile(delays, 0.95) * 1000:6.1f} ms"
+          f"  max {max(delays, default=0) * 1000:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Usage:")[0])
+    parser.add_argument("--format", choices=("docx", "pdf"), default="pdf")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    text = "\n".join([PAGE] * args.pages)
+    print(f"{args.format}, {args.pages} pages ({len(text)} characters), {args.threads} threads, "
+          f"{args.workers} pool workers, {args.seconds:g} s per run\n")
+
+    report("inline", *drive(exports.render_document, text, args.format, args.threads, args.seconds))
+
+    pool = RenderPool(workers=args.workers, max_queue=args.threads * 2, timeout=120)
+    # Start the workers (and their imports) before timing
+    for _ in range(args.workers):
+        pool.run(exports.render_document, "warm up", args.format)
+    report("pooled", *drive(lambda text, format: pool.run(exports.render_document, text, format),
+                            text, args.format, args.threads, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
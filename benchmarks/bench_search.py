@@ -0,0 +1,158 @@
+"""
+FILE       : bench_search.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-03
+DESCRIPTION:
+Measures history search latency as one user's history grows. Against the local
+PostgreSQL database (see db.py, migrated first), a throwaway user's history is
+filled step by step up to each of --sizes rows of generated text, whose words
+follow a Zipf distribution (a few very common words and a long tail of rare
+ones). After each step every kind of search is run --repeat times through
+history_search.search():
+  - common : a word in almost every record
+  - medium : a word in about a third of the records
+  - rare   : a word in about one record in a thousand
+  - prefix : the start of a medium word
+  - words  : two medium words
+  - dates  : the last 30 days, no text
+  - mixed  : a medium word in the last 90 days
+p50/p95 latency is reported per size; with --like the old substring query
+(text LIKE '%word%') is timed too, for comparison. The user's rows are
+deleted at the end.
+
+Usage: python benchmarks/bench_search.py [--sizes 300,3000,30000,300000]
+                                         [--repeat 20] [--like]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import itertools
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db
+import migrations
+import history_search
+
+COMMON = ["the", "and", "notes", "lecture", "page", "with", "from", "this", "that", "which"]
+MEDIUM = ["photosynthesis", "respiration", "mitochondria", "enzyme", "chlorophyll",
+          "glucose", "membrane", "nucleus", "osmosis", "protein"]
+# Long tail of rare words
+TAIL = [f"term{i}" for i in range(20000)]
+VOCABULARY = COMMON + MEDIUM + TAIL
+CUM_WEIGHTS = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+WORDS_PER_RECORD = 60
+DAYS = 730
+
+
+# FUNCTION   : percentile
+# DESCRIPTION: Nearest-rank percentile of a sorted list
+# PARAMETERS : values (sorted list of float), fraction (float, 0-1)
+# RETURNS    : float
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# FUNCTION   : grow
+# DESCRIPTION: Adds `count` generated records to the user's history with COPY
+# PARAMETERS : conn, user_id (int), count (int), rng (random.Random)
+# RETURNS    : None
+
+def grow(conn, user_id, count, rng):
+    now = datetime.datetime.now()
+    c = conn.cursor()
+    for offset in range(0, count, 10000):
+        rows = io.StringIO()
+        for _ in range(min(10000, count - offset)):
+            text = " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=WORDS_PER_RECORD))
+            stamp = now - datetime.timedelta(seconds=rng.uniform(0, DAYS * 86400))
+            rows.write(f"{user_id}\tbench.png\t{text}\t{stamp:%Y-%m-%d %H:%M:%S}\n")
+        rows.seek(0)
+        c.copy_from(rows, "history", columns=("user_id", "image", "text", "timestamp"))
+        conn.commit()
+    c.execute("ANALYZE history")
+    conn.commit()
+
+
+def timed(fn, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Usage:")[0])
+    parser.add_argument("--sizes", default="300,3000,30000,300000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--like", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    migrations.migrate()
+    rng = random.Random(args.seed)
+    # No users row is needed; history.user_id is not a foreign key
+    user_id = 2_000_000_000 + rng.randrange(100_000_000)
+    today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    searches = {
+        "common": lambda: history_search.search(user_id, COMMON[1]),
+        "medium": lambda: history_search.search(user_id, MEDIUM[5]),
+        "rare": lambda: history_search.search(user_id, TAIL[5000]),
+        "prefix": lambda: history_search.search(user_id, MEDIUM[5][:4]),
+        "words": lambda: history_search.search(user_id, f"{MEDIUM[5]} {MEDIUM[7]}"),
+        "dates": lambda: history_search.search(user_id, "", today - datetime.timedelta(days=30), today),
+        "mixed": lambda: history_search.search(user_id, MEDIUM[5], today - datetime.timedelta(days=90),
+                                               today),
+    }
+
+    conn = db.connect()
+
+    def like():
+        c = conn.cursor()
+        c.execute("SELECT image, text, timestamp FROM history WHERE user_id=%s AND text LIKE %s "
+                  "ORDER BY timestamp DESC", (user_id, f"%{MEDIUM[5]}%"))
+        c.fetchall()
+        conn.rollback()
+
+    if args.like:
+        searches["like"] = like
+
+    print(f"user {user_id}, {WORDS_PER_RECORD} words per record, {args.repeat} runs per search\n")
+    print(f"{'rows':>8}  " + "  ".join(f"{name:>15}" for name in searches))
+    print(f"{'':>8}  " + "  ".join(f"{'p50 / p95 ms':>15}" for _ in searches))
+    rows = 0
+    try:
+        for size in sizes:
+            grow(conn, user_id, size - rows, rng)
+            rows = size
+            cells = []
+            for fn in searches.values():
+                fn()  # warm up
+                latencies = timed(fn, args.repeat)
+                cells.append(f"{percentile(latencies, 0.50) * 1000:6.1f} / "
+                             f"{percentile(latencies, 0.95) * 1000:6.1f}")
+            print(f"{size:>8}  " + "  ".join(f"{cell:>15}" for cell in cells))
+    finally:
+        c = conn.cursor()
+        c.execute("DELETE FROM history WHERE user_id=%s", (user_id,))
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+FILE       : bench_tail.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-27
+DESCRIPTION:
+Measures OCR tail latency against the fake engine, which makes a share of calls
+slow and can fail them. Three runs use the same injected faults:
+  - plain    : no deadline, no hedging (how calls behaved before)
+  - deadline : every call fails after --deadline seconds
+  - hedged   : deadline plus a second attempt after the p95 latency
+A fourth run simulates an outage (every call fails slowly) with and without
+the circuit breaker, to show how long callers are held up.
+Reports p50/p95/p99/max latency, failures and engine calls (hedging costs
+extra calls) for each run.
+
+Usage: python benchmarks/bench_tail.py [--calls 400] [--threads 8] [--latency 0.05]
+                                       [--slow-rate 0.03] [--slow-latency 2]
+                                       [--deadline 1] [--server-errors 0.01]
+"""
+
+import io
+import os
+import sys
+import time
+import contextlib
+import argparse
+import threading
+
+
+# FUNCTION   : percentile
+# DESCRIPTION: Nearest-rank percentile of a sorted list
+# PARAMETERS : values (sorted list of float), fraction (float, 0-1)
+# RETURNS    : float
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# FUNCTION   : drive
+# DESCRIPTION: Makes `calls` single-image calls from `threads` threads
+# PARAMETERS : engine (OCREngine), calls (int), threads (int)
+# RETURNS    : tuple - (sorted latencies, outcome counts)
+
+def drive(engine, calls, threads):
+    latencies = []
+    outcomes = {}
+    lock = threading.Lock()
+    remaining = [calls]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                engine.extract_text(b"page")
+                outcome = "ok"
+            except Exception as e:
+                outcome = type(e).__name__
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    # Keep the retry messages out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    latencies.sort()
+    return latencies, outcomes
+
+
+def report(label, latencies, outcomes, fake):
+    print(f"{label:<16} p50 {percentile(latencies, 0.50) * 1000:6.0f} ms"
+          f"  p95 {percentile(latencies, 0.95) * 1000:6.0f} ms"
+          f"  p99 {percentile(latencies, 0.99) * 1000:6.0f} ms"
+          f"  max {latencies[-1] * 1000 if latencies else 0:6.0f} ms"
+          f"  engine calls {fake.counts['calls']:4d}  outcomes {outcomes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Usage:")[0])
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--deadline", type=float, default=1.0)
+    parser.add_argument("--server-errors", type=float, default=0.01)
+    args = parser.parse_args()
+
+    # Keep retries short and the quota out of the way; settings are read at import
+    os.environ.update({
+        "VISION_RATE_LIMIT": "off",
+        "VISION_RETRY_BASE_DELAY": "0.02",
+        "VISION_RETRY_MAX_DELAY": "0.2",
+        "OCR_HEDGE_MIN_DELAY": "0.05",
+    })
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ocr_engine import FakeEngine, LimitedEngine, HedgedEngine, BreakerEngine
+    from resilience import CircuitBreaker
+
+    def fake(**overrides):
+        settings = {"latency": args.latency, "slow_rate": args.slow_rate,
+                    "slow_latency": args.slow_latency, "quota_error_rate": 0.0,
+                    "server_error_rate": args.server_errors, "seed": 7}
+        settings.update(overrides)
+        return FakeEngine(**settings)
+
+    print(f"{args.calls} calls from {args.threads} threads, {args.latency * 1000:.0f} ms per call, "
+          f"{args.slow_rate:.0%} take {args.slow_latency:g} s, {args.server_errors:.0%} fail\n")
+
+    runs = [
+        ("plain", lambda engine: LimitedEngine(engine)),
+        ("deadline", lambda engine: HedgedEngine(LimitedEngine(engine), deadline=args.deadline,
+                                                 hedge=False)),
+        ("hedged", lambda engine: HedgedEngine(LimitedEngine(engine), deadline=args.deadline,
+                                               hedge=True)),
+    ]
+    for label, wrap in runs:
+        engine = fake()
+        wrapped = wrap(engine)
+        latencies, outcomes = drive(wrapped, args.calls, args.threads)
+        report(label, latencies, outcomes, engine)
+        if isinstance(wrapped, HedgedEngine):
+            print(f"{'':<16} hedge delay {wrapped.hedge_delay() * 1000:.0f} ms, "
+                  f"{wrapped.counts['hedged']} hedged, {wrapped.counts['hedge_wins']} won by the hedge")
+
+    # Outage: every call is slow and then fails
+    print()
+    outage_calls = max(args.threads * 5, args.calls // 4)
+    for label, breaker in (("outage", False), ("outage+breaker", True)):
+        engine = fake(slow_rate=1.0, slow_latency=args.deadline / 2, server_error_rate=1.0)
+        wrapped = HedgedEngine(LimitedEngine(engine), deadline=args.deadline, hedge=False)
+        if breaker:
+            wrapped = BreakerEngine(wrapped, CircuitBreaker(window=20, min_calls=10,
+                                                            error_rate=0.5, cooldown=60))
+        latencies, outcomes = drive(wrapped, outage_calls, args.threads)
+        report(label, latencies, outcomes, engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+FILE       : check_ddl.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-02
+DESCRIPTION:
+Checks that routes do not change the schema. Applies the migrations to the
+local PostgreSQL database (see db.py), then signs a new user up and calls the
+login, settings, preference, session and history routes through Flask's test
+client with DB_FORBID_REQUEST_DDL on, using the fake OCR engine and translator.
+Fails (exit status 1) if a route ran a CREATE/ALTER/DROP statement, as counted
+in ocr_app_db_request_ddl_total, or answered with a server error.
+
+Usage: python benchmarks/check_ddl.py
+"""
+
+import os
+import sys
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Read by config.py when the app is imported
+os.environ.update({"DB_FORBID_REQUEST_DDL": "1", "DB_MIGRATE_ON_STARTUP": "1", "METRICS_ENABLED": "1",
+                   "OCR_ENGINE": "fake", "TRANSLATE_ENGINE": "fake", "OCR_JOB_MODE": "off"})
+
+import metrics
+from app import app
+
+
+def main():
+    client = app.test_client()
+    name = f"ddlcheck_{uuid.uuid4().hex[:8]}"
+    calls = [
+        ("POST", "/signup", {"data": {"username": name, "password": "ddlcheck",
+                                      "gmail": f"{name}@ddlcheck.invalid"}}),
+        ("POST", "/login", {"data": {"username": name, "password": "ddlcheck"}}),
+        ("GET", "/settings", {}),
+        ("POST", "/toggle_2fa", {"json": {"enabled": True}}),
+        ("POST", "/toggle_2fa", {"json": {"enabled": False}}),
+        ("POST", "/toggle_analytics", {"json": {"enabled": True}}),
+        ("POST", "/toggle_notifications", {"json": {"enabled": True}}),
+        ("POST", "/update_language", {"json": {"language": "fr"}}),
+        ("GET", "/get_active_sessions", {}),
+        ("GET", "/history", {}),
+        ("GET", "/search_history?query=test", {}),
+        ("GET", "/logout", {}),
+    ]
+    failed = False
+    for method, path, kwargs in calls:
+        response = client.open(path, method=method, **kwargs)
+        print(f"{method:<4} {path:<28} HTTP {response.status_code}")
+        if response.status_code >= 500:
+            failed = True
+
+    ddl = {labels[0]: value for _, labels, _, value in metrics.DB_REQUEST_DDL.samples()}
+    for route, count in sorted(ddl.items()):
+        print(f"{count:g} schema statements in {route}")
+    print(f"\n{sum(ddl.values()):g} schema statements run by routes")
+    if ddl or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""
+FILE       : loadtest.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-28
+DESCRIPTION:
+Offline load test of the web app. The app is started under gunicorn against
+the local PostgreSQL database (see db.py) with the fake OCR engine (or the
+replay engine and its saved responses) and the fake translator, so nothing
+leaves the machine. Every simulated client signs up, logs in, uploads the
+Test/*.png corpus once so it has history, and then sends a weighted mix of
+requests to /, /translate, /download, /history and /search_history for the
+given duration.
+
+Reports throughput, p50/p95/p99 latency and errors per endpoint and the peak
+RSS of every gunicorn worker, and saves them as JSON (with the commit and the
+settings used) so results can be compared from commit to commit:
+
+  python benchmarks/loadtest.py --clients 8 --duration 30
+  python benchmarks/loadtest.py --compare benchmarks/results/a.json benchmarks/results/b.json
+
+Options: --workers/--threads (gunicorn), --clients, --duration, --mix
+"upload=1,translate=3,...", --ocr fake|replay, --ocr-latency,
+--translate-latency, --env KEY=VALUE (passed to the app), --url (test a
+server that is already running instead of starting one), --output DIR.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import uuid
+import random
+import signal
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("upload", "translate", "download", "history", "search")
+DEFAULT_MIX = "upload=1,translate=3,download=2,history=2,search=2"
+LANGUAGES = ("es", "fr", "de", "hi", "zh-cn")
+FORMATS = ("txt", "docx", "pdf")
+SEARCH_WORDS = ("the", "note", "class", "2025", "a")
+
+
+# FUNCTION   : percentile
+# DESCRIPTION: Nearest-rank percentile of a sorted list
+# PARAMETERS : values (sorted list of float), fraction (float, 0-1)
+# RETURNS    : float
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# FUNCTION   : prepare_database
+# DESCRIPTION: Applies the pending schema migrations to the local database
+# PARAMETERS : None
+# RETURNS    : None
+
+def prepare_database():
+    sys.path.insert(0, ROOT)
+    import migrations
+
+    migrations.migrate()
+
+
+# CLASS      : Server
+# DESCRIPTION: gunicorn running the app in a child process
+
+class Server:
+
+    def __init__(self, port, workers, threads, env, log_path):
+        self.port = port
+        self.workers = workers
+        self.threads = threads
+        self.env = env
+        self.log_path = log_path
+        self.process = None
+
+    def start(self):
+        env = dict(os.environ, **self.env)
+        self._log = open(self.log_path, "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-b", f"127.0.0.1:{self.port}",
+             "-w", str(self.workers), "--threads", str(self.threads), "--timeout", "120",
+             "app:app"],
+            cwd=ROOT, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited, see {self.log_path}")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=2)
+                conn.request("GET", "/login")
+                conn.getresponse().read()
+                conn.close()
+                if len(self.worker_pids()) >= self.workers:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"gunicorn did not start, see {self.log_path}")
+
+    def worker_pids(self):
+        pids = []
+        for stat_path in glob.glob("/proc/[0-9]*/stat"):
+            try:
+                with open(stat_path) as stat:
+                    fields = stat.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            if int(fields[1]) == self.process.pid:
+                pids.append(int(stat_path.split("/")[2]))
+        return pids
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._log.close()
+
+
+# FUNCTION   : rss_kb
+# DESCRIPTION: Resident set size of a process
+# PARAMETERS : pid (int)
+# RETURNS    : int (KB) or None when the process is gone
+
+def rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# CLASS      : RssSampler
+# DESCRIPTION: Samples the RSS of the gunicorn workers in the background and
+#              keeps the peak and last value of each
+
+class RssSampler(threading.Thread):
+
+    def __init__(self, server, interval=0.5):
+        super().__init__(daemon=True)
+        self.server = server
+        self.interval = interval
+        self.workers = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            for pid in self.server.worker_pids():
+                rss = rss_kb(pid)
+                if rss is None:
+                    continue
+                worker = self.workers.setdefault(str(pid), {"peak_rss_kb": 0, "rss_kb": 0})
+                worker["peak_rss_kb"] = max(worker["peak_rss_kb"], rss)
+                worker["rss_kb"] = rss
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# FUNCTION   : multipart
+# DESCRIPTION: Encodes files as a multipart/form-data body
+# PARAMETERS : field (str), files (list of (filename, bytes))
+# RETURNS    : tuple - (body bytes, content type)
+
+def multipart(field, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for filename, content in files:
+        parts.append(f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; "
+                     f"filename=\"{filename}\"\r\nContent-Type: image/png\r\n\r\n".encode())
+        parts.append(content)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+# CLASS      : Client
+# DESCRIPTION: One simulated user with its own keep-alive connection and
+#              session cookie
+
+class Client:
+
+    def __init__(self, base_url, corpus, rng):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.corpus = corpus
+        self.rng = rng
+        self.cookies = {}
+        self.conn = None
+        self.last_text = "Hello from the load test"
+
+    def request(self, method, path, body=None, content_type=None):
+        headers = {}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if content_type:
+            headers["Content-Type"] = content_type
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed a kept-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+        for cookie in response.msg.get_all("Set-Cookie") or ():
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            self.cookies[name.strip()] = value
+        return response.status, data
+
+    def form(self, path, fields):
+        return self.request("POST", path, urlencode(fields), "application/x-www-form-urlencoded")
+
+    def sign_up(self, name):
+        fields = {"username": name, "password": "loadtest", "gmail": f"{name}@loadtest.invalid"}
+        self.form("/signup", fields)
+        status, _ = self.form("/login", {"username": name, "password": "loadtest"})
+        if status != 302:
+            raise RuntimeError(f"Login failed for {name} (HTTP {status})")
+
+    def upload(self, count=1):
+        files = self.rng.sample(self.corpus, min(count, len(self.corpus)))
+        body, content_type = multipart("files", files)
+        return self.request("POST", "/", body, content_type)
+
+    def call(self, endpoint):
+        if endpoint == "upload":
+            return self.upload()
+        if endpoint == "translate":
+            return self.form("/translate", {"text": self.last_text,
+                                            "language": self.rng.choice(LANGUAGES)})
+        if endpoint == "download":
+            return self.form("/download", {"text": f"<p>{self.last_text}</p>",
+                                           "filename": f"loadtest_{uuid.uuid4().hex[:8]}",
+                                           "format": self.rng.choice(FORMATS)})
+        if endpoint == "history":
+            return self.request("GET", "/history")
+        return self.request("GET", "/search_history?" +
+                            urlencode({"query": self.rng.choice(SEARCH_WORDS)}))
+
+
+# FUNCTION   : parse_mix
+# DESCRIPTION: Parses "upload=1,translate=3" into endpoint weights
+# PARAMETERS : text (str)
+# RETURNS    : dict
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# FUNCTION   : run_clients
+# DESCRIPTION: Signs every client up, seeds its history and drives the mix
+#              for `duration` seconds
+# PARAMETERS : base_url (str), corpus (list), args (Namespace)
+# RETURNS    : tuple - (samples as (endpoint, status, seconds), elapsed seconds)
+
+def run_clients(base_url, corpus, args):
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    run_id = uuid.uuid4().hex[:8]
+    clients = [Client(base_url, corpus, random.Random(args.seed + i)) for i in range(args.clients)]
+    for i, client in enumerate(clients):
+        client.sign_up(f"loadtest_{run_id}_{i}")
+        client.upload(len(corpus))
+
+    samples = []
+    lock = threading.Lock()
+    start_event = threading.Event()
+    end_time = [0.0]
+
+    def drive(client):
+        start_event.wait()
+        own = []
+        while time.monotonic() < end_time[0]:
+            endpoint = client.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status, _ = client.call(endpoint)
+            except (http.client.HTTPException, OSError):
+                status = 0
+            own.append((endpoint, status, time.perf_counter() - started))
+        with lock:
+            samples.extend(own)
+
+    threads = [threading.Thread(target=drive, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    started = time.monotonic()
+    end_time[0] = started + args.duration
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    return samples, time.monotonic() - started
+
+
+# FUNCTION   : summarize
+# DESCRIPTION: Latency, throughput and error figures per endpoint and overall
+# PARAMETERS : samples (list), elapsed (float)
+# RETURNS    : dict
+
+def summarize(samples, elapsed):
+    def figures(rows):
+        latencies = sorted(seconds for _, _, seconds in rows)
+        statuses = {}
+        for _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(count for status, count in statuses.items()
+                     if status == "0" or int(status) >= 500)
+        return {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "errors": errors,
+            "statuses": statuses,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+
+    endpoints = {name: figures([row for row in samples if row[0] == name])
+                 for name in ENDPOINTS if any(row[0] == name for row in samples)}
+    return {"elapsed_s": round(elapsed, 2), "total": figures(samples), "endpoints": endpoints}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result):
+    print(f"{'endpoint':<10} {'requests':>8} {'rps':>8} {'errors':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, row in list(result["summary"]["endpoints"].items()) + [("total", result["summary"]["total"])]:
+        print(f"{name:<10} {row['requests']:>8} {row['throughput_rps']:>8} {row['errors']:>7} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+    for pid, worker in result.get("workers", {}).items():
+        print(f"worker {pid}: peak RSS {worker['peak_rss_kb'] / 1024:.1f} MB, "
+              f"last {worker['rss_kb'] / 1024:.1f} MB")
+
+
+# FUNCTION   : compare
+# DESCRIPTION: Prints the change in throughput and latency between two saved runs
+# PARAMETERS : old_path (str), new_path (str)
+# RETURNS    : None
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'endpoint':<10} {'metric':<15} {'old':>10} {'new':>10} {'change':>8}")
+    old_rows = dict(old["summary"]["endpoints"], total=old["summary"]["total"])
+    new_rows = dict(new["summary"]["endpoints"], total=new["summary"]["total"])
+    for name in new_rows:
+        if name not in old_rows:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "errors"):
+            before, after = old_rows[name][metric], new_rows[name][metric]
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "-"
+            print(f"{name:<10} {metric:<15} {before:>10} {after:>10} {change:>8}")
+    old_peak = max((w["peak_rss_kb"] for w in old.get("workers", {}).values()), default=0)
+    new_peak = max((w["peak_rss_kb"] for w in new.get("workers", {}).values()), default=0)
+    print(f"{'workers':<10} {'peak_rss_kb':<15} {old_peak:>10} {new_peak:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("Options:")[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--ocr", choices=("fake", "replay"), default="fake")
+    parser.add_argument("--ocr-latency", type=float, default=0.2)
+    parser.add_argument("--translate-latency", type=float, default=0.1)
+    parser.add_argument("--corpus", default=os.path.join(ROOT, "Test", "*.png"))
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--url", help="Test this running server instead of starting one")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results"))
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    corpus = []
+    for path in sorted(glob.glob(args.corpus)):
+        with open(path, "rb") as image_file:
+            corpus.append((os.path.basename(path), image_file.read()))
+    if not corpus:
+        parser.error(f"No images match {args.corpus}")
+
+    # Every upload runs OCR: no cache hits or near-duplicate reuse
+    app_env = {
+        "OCR_ENGINE": args.ocr,
+        "FAKE_OCR_LATENCY": str(args.ocr_latency),
+        "TRANSLATE_ENGINE": "fake",
+        "FAKE_TRANSLATE_LATENCY": str(args.translate_latency),
+        "OCR_CACHE_ENABLED": "0",
+        "NEAR_DUPLICATE_REUSE": "0",
+        "VISION_RATE_LIMIT": "off",
+    }
+    app_env.update(item.split("=", 1) for item in args.env)
+
+    server = sampler = None
+    base_url = args.url
+    if base_url is None:
+        prepare_database()
+        os.makedirs(args.output, exist_ok=True)
+        server = Server(args.port, args.workers, args.threads, app_env,
+                        os.path.join(args.output, "gunicorn.log"))
+        server.start()
+        sampler = RssSampler(server)
+        sampler.start()
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        samples, elapsed = run_clients(base_url, corpus, args)
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.stop()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count(),
+                 "platform": platform.platform()},
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("compare", "output", "corpus")},
+        "app_env": app_env,
+        "corpus_images": len(corpus),
+        "summary": summarize(samples, elapsed),
+        "workers": sampler.workers if sampler else {},
+    }
+    print_report(result)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}-"
+                                     f"{result['commit'] or 'nogit'}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
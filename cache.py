@@ -0,0 +1,118 @@
+"""
+FILE       : cache.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-08
+DESCRIPTION:
+This module provides a small thread-safe in-process LRU cache with an optional
+time-to-live and an optional bound on the total size of its values. It keeps
+hit, miss and eviction counters so callers can report their hit rate. It is the
+in-memory tier of the OCR and translation caches and holds rendered exports.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+# CLASS      : LRUCache
+# DESCRIPTION: Least-recently-used cache bounded by entry count and, when
+#              max_bytes is set, by the total size of its values (measured
+#              with sizeof), with entries expiring `ttl` seconds after they
+#              were stored (None = never)
+
+class LRUCache:
+
+    def __init__(self, max_entries=1024, ttl=None, max_bytes=None, sizeof=len):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default when missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries.
+
+        A value larger than max_bytes on its own is not stored.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (expires_at, value)
+            self._sizes[key] = size
+            self._bytes += size
+            while len(self._data) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        # Caller holds the lock
+        if self._data.pop(key, _MISSING) is _MISSING:
+            return False
+        self._bytes -= self._sizes.pop(key)
+        return True
+
+    def delete(self, key):
+        """Remove key if present. Returns True when an entry was removed."""
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        """Remove every entry and return how many were removed."""
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+            return count
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Return the size and counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,87 @@
+"""
+FILE       : cache_generations.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-04
+DESCRIPTION:
+This module tells the in-memory tier of a cache when it was invalidated in
+another process. Every cache has a generation number in the
+cache_generations table (migration 3), which invalidating the cache increases
+in the same transaction that deletes its rows. Memory entries are stored with
+the generation they were read under and only trusted while it is current, so
+an invalidation from any worker, instance or the command line reaches every
+process. Each process reads the generations at most once every
+CACHE_GENERATION_CHECK_INTERVAL seconds, which bounds how long a stale memory
+entry can still be served.
+"""
+
+import time
+import threading
+import psycopg2
+from db import get_db_connection
+from config import CACHE_GENERATION_CHECK_INTERVAL
+
+_generations = {}
+_checked_at = None
+_lock = threading.Lock()
+
+
+# FUNCTION   : current
+# DESCRIPTION: Returns the generation of a cache, reading every cache's
+#              generation from the database when the last read is older than
+#              CACHE_GENERATION_CHECK_INTERVAL. While one thread reads, the
+#              others get the value already known.
+# PARAMETERS : name (str) - Cache name ("ocr", "translation")
+# RETURNS    : int
+
+def current(name):
+    global _checked_at
+    now = time.monotonic()
+    with _lock:
+        due = _checked_at is None or now - _checked_at >= CACHE_GENERATION_CHECK_INTERVAL
+        if due:
+            _checked_at = now
+    if due:
+        _refresh()
+    with _lock:
+        return _generations.get(name, 0)
+
+
+def _refresh():
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT name, generation FROM cache_generations")
+            rows = c.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        # Keep the generations already known and try again after the interval
+        print(f"Cache generation check failed: {e}")
+        return
+    with _lock:
+        _generations.update(rows)
+
+
+# FUNCTION   : bump
+# DESCRIPTION: Increases the generation of a cache, within the caller's
+#              transaction, so memory entries stored under the old one are
+#              no longer trusted. This process sees the new generation at once.
+# PARAMETERS : c (psycopg2 cursor) - Cursor of the invalidating transaction
+#              name (str) - Cache name
+# RETURNS    : int - New generation
+
+def bump(c, name):
+    c.execute("""
+        INSERT INTO cache_generations (name, generation, updated_at) VALUES (%s, 1, NOW())
+        ON CONFLICT (name) DO UPDATE
+        SET generation = cache_generations.generation + 1, updated_at = NOW()
+        RETURNING generation
+    """, (name,))
+    generation = c.fetchone()[0]
+    with _lock:
+        _generations[name] = generation
+    return generation
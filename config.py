@@ -1,20 +1,222 @@
-"""
-FILE       : config.py
-PROJECT    : Handwritten OCR | Capstone Project 2025
-PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
-             Shubh Soni (8887735), Dev Patel (8866936)
-DATE       : 2025-03-15
-DESCRIPTION:
-This configuration file sets up constants for file uploads, allowed image types,
-and the database connection string for the Handwritten OCR Flask application
-"""
-import os
-
-UPLOAD_FOLDER = "static/uploads/"
-ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
-DATABASE_URL = "postgresql+psycopg2://postgres:myPassword123@/handwritten_ocr?host=/cloudsql/lucid-diode-452919-p1:us-central1:ocr-postgres-db"
-
-
-
-if not os.path.exists(UPLOAD_FOLDER):
+"""
+FILE       : config.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-03-15
+DESCRIPTION:
+This configuration file sets up constants for file uploads, allowed image types,
+and the database connection string for the Handwritten OCR Flask application
+"""
+import os
+
+UPLOAD_FOLDER = "static/uploads/"
+ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "pdf", "tif", "tiff"}
+DATABASE_URL = "postgresql+psycopg2://postgres:myPassword123@/handwritten_ocr?host=/cloudsql/lucid-diode-452919-p1:us-central1:ocr-postgres-db"
+
+# Upload limits. MAX_CONTENT_LENGTH caps a whole upload request and
+# UPLOAD_MAX_FILE_BYTES each file in it. Up to UPLOAD_MEMORY_BYTES of upload
+# content is kept in memory per process for OCR; beyond that files are read
+# back from the upload folder when their turn comes.
+MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 100 * 1024 * 1024))
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", 20 * 1024 * 1024))
+UPLOAD_MEMORY_BYTES = int(os.environ.get("UPLOAD_MEMORY_BYTES", 64 * 1024 * 1024))
+
+# Multi-page documents are split into pages before OCR. PDF pages are rendered
+# at DOCUMENT_DPI; pages after DOCUMENT_MAX_PAGES are ignored.
+DOCUMENT_EXTENSIONS = {"pdf", "tif", "tiff"}
+DOCUMENT_DPI = int(os.environ.get("DOCUMENT_DPI", 200))
+DOCUMENT_MAX_PAGES = int(os.environ.get("DOCUMENT_MAX_PAGES", 500))
+
+# OCR engine: "vision" (live API), "replay" (saved responses), "record" or
+# "fake" (no network, injected errors)
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "vision")
+OCR_REPLAY_DIR = os.environ.get("OCR_REPLAY_DIR", os.path.join("Test", "replay"))
+
+# Vision quota: "memory" shares one token bucket between the threads of a
+# process, "postgres" between every process (rate_limits table), "off" turns
+# limiting off. At most VISION_REQUESTS_PER_MINUTE images per minute and
+# VISION_DAILY_BUDGET per UTC day (0 = no daily cap) are sent. A call waits up
+# to VISION_QUOTA_WAIT seconds for budget. Transient errors are retried
+# VISION_RETRY_ATTEMPTS times with jittered exponential backoff.
+VISION_RATE_LIMIT = os.environ.get("VISION_RATE_LIMIT", "memory")
+VISION_REQUESTS_PER_MINUTE = int(os.environ.get("VISION_REQUESTS_PER_MINUTE", 1800))
+VISION_DAILY_BUDGET = int(os.environ.get("VISION_DAILY_BUDGET", 0))
+VISION_QUOTA_WAIT = float(os.environ.get("VISION_QUOTA_WAIT", 10))
+VISION_RETRY_ATTEMPTS = int(os.environ.get("VISION_RETRY_ATTEMPTS", 4))
+VISION_RETRY_BASE_DELAY = float(os.environ.get("VISION_RETRY_BASE_DELAY", 0.5))
+VISION_RETRY_MAX_DELAY = float(os.environ.get("VISION_RETRY_MAX_DELAY", 8))
+
+# Fake OCR engine (OCR_ENGINE=fake): seconds per call and the share of calls
+# that fail with a quota (429) or server (503) error
+FAKE_OCR_LATENCY = float(os.environ.get("FAKE_OCR_LATENCY", 0.05))
+FAKE_OCR_QUOTA_ERROR_RATE = float(os.environ.get("FAKE_OCR_QUOTA_ERROR_RATE", 0))
+FAKE_OCR_SERVER_ERROR_RATE = float(os.environ.get("FAKE_OCR_SERVER_ERROR_RATE", 0))
+# Share of fake calls that take FAKE_OCR_SLOW_LATENCY seconds instead (tail latency)
+FAKE_OCR_SLOW_RATE = float(os.environ.get("FAKE_OCR_SLOW_RATE", 0))
+FAKE_OCR_SLOW_LATENCY = float(os.environ.get("FAKE_OCR_SLOW_LATENCY", 5))
+
+# Every OCR call (single image or batch) gets OCR_DEADLINE seconds, retries
+# included, before it fails. With OCR_HEDGE_ENABLED a second attempt is sent
+# when the first has taken longer than the p95 of the last OCR_HEDGE_WINDOW
+# calls (at least OCR_HEDGE_MIN_DELAY; OCR_HEDGE_DEFAULT_DELAY until enough
+# calls were seen) and the first answer wins. Each hedge costs quota.
+OCR_DEADLINE = float(os.environ.get("OCR_DEADLINE", 30))
+OCR_HEDGE_ENABLED = os.environ.get("OCR_HEDGE_ENABLED", "0") == "1"
+OCR_HEDGE_WINDOW = int(os.environ.get("OCR_HEDGE_WINDOW", 200))
+OCR_HEDGE_MIN_DELAY = float(os.environ.get("OCR_HEDGE_MIN_DELAY", 0.5))
+OCR_HEDGE_DEFAULT_DELAY = float(os.environ.get("OCR_HEDGE_DEFAULT_DELAY", 3))
+
+# Circuit breaker around the OCR engine: once OCR_BREAKER_MIN_CALLS of the last
+# OCR_BREAKER_WINDOW calls are known and the share that failed (server errors,
+# timeouts) reaches OCR_BREAKER_ERROR_RATE, calls fail at once for
+# OCR_BREAKER_COOLDOWN seconds, or go to OCR_FALLBACK_ENGINE when it is set.
+OCR_BREAKER_ENABLED = os.environ.get("OCR_BREAKER_ENABLED", "1") == "1"
+OCR_BREAKER_WINDOW = int(os.environ.get("OCR_BREAKER_WINDOW", 20))
+OCR_BREAKER_MIN_CALLS = int(os.environ.get("OCR_BREAKER_MIN_CALLS", 10))
+OCR_BREAKER_ERROR_RATE = float(os.environ.get("OCR_BREAKER_ERROR_RATE", 0.5))
+OCR_BREAKER_COOLDOWN = float(os.environ.get("OCR_BREAKER_COOLDOWN", 30))
+OCR_FALLBACK_ENGINE = os.environ.get("OCR_FALLBACK_ENGINE", "")
+
+# Multi-file uploads are sent to Vision with batch_annotate_images. The API
+# accepts at most 16 images per request; the byte cap keeps a batch under the
+# request size limit.
+OCR_BATCH_MODE = os.environ.get("OCR_BATCH_MODE", "1") == "1"
+VISION_BATCH_SIZE = int(os.environ.get("VISION_BATCH_SIZE", 16))
+VISION_BATCH_MAX_BYTES = int(os.environ.get("VISION_BATCH_MAX_BYTES", 8 * 1024 * 1024))
+
+# With batch mode off, files of one upload are OCR'd concurrently: at most
+# OCR_REQUEST_CONCURRENCY per request, OCR_MAX_WORKERS per process.
+OCR_REQUEST_CONCURRENCY = int(os.environ.get("OCR_REQUEST_CONCURRENCY", 4))
+OCR_MAX_WORKERS = int(os.environ.get("OCR_MAX_WORKERS", 8))
+
+# Asynchronous OCR jobs: "off" runs OCR inside the upload request, "memory"
+# queues jobs in-process and "postgres" queues them in the ocr_jobs table.
+# With postgres, workers run in the web process when JOB_EMBEDDED_WORKERS is
+# set, and/or as separate processes started with `python jobs.py`.
+OCR_JOB_MODE = os.environ.get("OCR_JOB_MODE", "off")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_EMBEDDED_WORKERS = os.environ.get("JOB_EMBEDDED_WORKERS", "0") == "1"
+JOB_RESULT_TTL = int(os.environ.get("JOB_RESULT_TTL", 24 * 3600))
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", 600))
+
+# OCR result cache keyed by image content (memory LRU + ocr_cache table)
+OCR_CACHE_ENABLED = os.environ.get("OCR_CACHE_ENABLED", "1") == "1"
+OCR_CACHE_MEMORY_ENTRIES = int(os.environ.get("OCR_CACHE_MEMORY_ENTRIES", 512))
+OCR_CACHE_DB_MAX_ROWS = int(os.environ.get("OCR_CACHE_DB_MAX_ROWS", 100000))
+OCR_CACHE_TTL = int(os.environ.get("OCR_CACHE_TTL", 30 * 24 * 3600))
+
+# How often each process checks whether a cache was invalidated elsewhere
+# (cache_generations table). Memory hits may be this many seconds stale.
+CACHE_GENERATION_CHECK_INTERVAL = float(os.environ.get("CACHE_GENERATION_CHECK_INTERVAL", 5))
+
+# Image pre-processing before OCR. Images under PREPROCESS_MIN_BYTES are sent
+# as they are; larger ones are rotated per EXIF, scaled down, optionally made
+# grayscale and cropped, then re-encoded as PREPROCESS_FORMAT.
+PREPROCESS_ENABLED = os.environ.get("PREPROCESS_ENABLED", "1") == "1"
+PREPROCESS_MIN_BYTES = int(os.environ.get("PREPROCESS_MIN_BYTES", 1024 * 1024))
+PREPROCESS_MAX_SIDE = int(os.environ.get("PREPROCESS_MAX_SIDE", 2048))
+PREPROCESS_GRAYSCALE = os.environ.get("PREPROCESS_GRAYSCALE", "1") == "1"
+PREPROCESS_CROP_MARGINS = os.environ.get("PREPROCESS_CROP_MARGINS", "1") == "1"
+PREPROCESS_FORMAT = os.environ.get("PREPROCESS_FORMAT", "JPEG").upper()
+PREPROCESS_QUALITY = int(os.environ.get("PREPROCESS_QUALITY", 85))
+
+# Near-duplicate detection: an upload whose dHash is within PHASH_THRESHOLD
+# bits of one of the user's previous uploads reuses that upload's text. Off by
+# default: pages of the same notebook can be a few bits apart. A hash match is
+# only reused when the two images, shrunk to 64x64 grayscale, differ clearly
+# (by more than PHASH_CONFIRM_PIXEL_DIFF levels) in at most
+# PHASH_CONFIRM_MAX_CHANGED of their pixels.
+NEAR_DUPLICATE_REUSE = os.environ.get("NEAR_DUPLICATE_REUSE", "0") == "1"
+PHASH_THRESHOLD = int(os.environ.get("PHASH_THRESHOLD", 6))
+PHASH_CONFIRM_PIXEL_DIFF = int(os.environ.get("PHASH_CONFIRM_PIXEL_DIFF", 48))
+PHASH_CONFIRM_MAX_CHANGED = float(os.environ.get("PHASH_CONFIRM_MAX_CHANGED", 0.01))
+PHASH_INDEX_USERS = int(os.environ.get("PHASH_INDEX_USERS", 256))
+
+# Translation backend: "google" (googletrans) or "fake" (no network; returns
+# the text tagged with the target language after FAKE_TRANSLATE_LATENCY s)
+TRANSLATE_ENGINE = os.environ.get("TRANSLATE_ENGINE", "google")
+FAKE_TRANSLATE_LATENCY = float(os.environ.get("FAKE_TRANSLATE_LATENCY", 0.02))
+
+# Translating into several languages at once: at most TRANSLATE_MAX_TARGETS
+# languages per request, translated concurrently on a shared pool of
+# TRANSLATE_WORKERS threads. A language not done after TRANSLATE_TIMEOUT
+# seconds is reported as an error while the others are still returned.
+TRANSLATE_MAX_TARGETS = int(os.environ.get("TRANSLATE_MAX_TARGETS", 8))
+TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", 16))
+TRANSLATE_TIMEOUT = float(os.environ.get("TRANSLATE_TIMEOUT", 15))
+
+# Translation clients per process. Each is used by one call at a time and keeps
+# its HTTP connection open; a call waits (within its deadline) for a free one.
+TRANSLATE_POOL_SIZE = int(os.environ.get("TRANSLATE_POOL_SIZE", 8))
+
+# Text is translated and cached per paragraph; paragraphs longer than this are
+# split into sentences, so editing one sentence re-translates only that sentence
+TRANSLATE_SEGMENT_MAX_CHARS = int(os.environ.get("TRANSLATE_SEGMENT_MAX_CHARS", 600))
+
+# Consecutive segments are sent to the backend together, in one call of up to
+# this many characters (only the ones not already cached), so a long text takes
+# a few calls per language instead of one per segment
+TRANSLATE_BATCH_MAX_CHARS = int(os.environ.get("TRANSLATE_BATCH_MAX_CHARS", 4500))
+
+# Translation cache keyed by normalized text, languages and backend (memory
+# LRU + translation_cache table). Texts over TRANSLATE_CACHE_MAX_CHARS are not cached.
+TRANSLATE_CACHE_ENABLED = os.environ.get("TRANSLATE_CACHE_ENABLED", "1") == "1"
+TRANSLATE_CACHE_MEMORY_ENTRIES = int(os.environ.get("TRANSLATE_CACHE_MEMORY_ENTRIES", 2048))
+TRANSLATE_CACHE_DB_MAX_ROWS = int(os.environ.get("TRANSLATE_CACHE_DB_MAX_ROWS", 200000))
+TRANSLATE_CACHE_TTL = int(os.environ.get("TRANSLATE_CACHE_TTL", 30 * 24 * 3600))
+TRANSLATE_CACHE_MAX_CHARS = int(os.environ.get("TRANSLATE_CACHE_MAX_CHARS", 20000))
+
+# Rendered downloads (txt/docx/pdf) are kept in memory, keyed by the SHA-256 of
+# the text and the format, so downloading the same result again is instant.
+# Bounded by entry count and by EXPORT_CACHE_MAX_BYTES of rendered files.
+EXPORT_CACHE_ENABLED = os.environ.get("EXPORT_CACHE_ENABLED", "1") == "1"
+EXPORT_CACHE_MAX_ENTRIES = int(os.environ.get("EXPORT_CACHE_MAX_ENTRIES", 256))
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# docx/pdf rendering runs in RENDER_POOL_WORKERS worker processes per gunicorn
+# worker (0 = render inline in the request thread). At most RENDER_QUEUE_LIMIT
+# jobs may wait or run at once (more get a 503), and a job is abandoned after
+# RENDER_TIMEOUT seconds.
+RENDER_POOL_WORKERS = int(os.environ.get("RENDER_POOL_WORKERS", 2))
+RENDER_QUEUE_LIMIT = int(os.environ.get("RENDER_QUEUE_LIMIT", 16))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 20))
+
+# History search returns the HISTORY_SEARCH_LIMIT best matches, ranked among
+# the user's HISTORY_SEARCH_CANDIDATES most recent matching records, so a
+# search costs about the same however long the history grows
+HISTORY_SEARCH_LIMIT = int(os.environ.get("HISTORY_SEARCH_LIMIT", 50))
+HISTORY_SEARCH_CANDIDATES = int(os.environ.get("HISTORY_SEARCH_CANDIDATES", 1000))
+
+# Rows fetched per round-trip by the server-side cursor of /export_history
+HISTORY_EXPORT_FETCH_ROWS = int(os.environ.get("HISTORY_EXPORT_FETCH_ROWS", 200))
+
+# PostgreSQL connection pool, per process (so per gunicorn worker): at most
+# DB_POOL_SIZE connections; a caller waits up to DB_POOL_TIMEOUT seconds for a
+# free one. A connection idle for DB_POOL_PING_AFTER seconds is checked before
+# reuse, and one older than DB_POOL_MAX_AGE seconds is replaced.
+DB_POOL_ENABLED = os.environ.get("DB_POOL_ENABLED", "1") == "1"
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_POOL_MAX_AGE = int(os.environ.get("DB_POOL_MAX_AGE", 1800))
+DB_POOL_PING_AFTER = int(os.environ.get("DB_POOL_PING_AFTER", 30))
+
+# Apply pending schema migrations (migrations.py) when the app starts. Turn off
+# when migrations are run as a separate deploy step. With DB_FORBID_REQUEST_DDL
+# a route that runs CREATE/ALTER/DROP fails instead of only being counted in
+# ocr_app_db_request_ddl_total.
+DB_MIGRATE_ON_STARTUP = os.environ.get("DB_MIGRATE_ON_STARTUP", "1") == "1"
+DB_FORBID_REQUEST_DDL = os.environ.get("DB_FORBID_REQUEST_DDL", "0") == "1"
+
+# Metrics on /metrics in the Prometheus text format. When METRICS_TOKEN is set
+# the scraper must send it as "Authorization: Bearer <token>".
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Users allowed to use the admin endpoints (comma separated user ids)
+ADMIN_USER_IDS = {int(i) for i in os.environ.get("ADMIN_USER_IDS", "").split(",") if i.strip()}
+
+
+
+if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
\ No newline at end of file
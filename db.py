@@ -1,36 +1,335 @@
-"""
-FILE       : db.py
-PROJECT    : Handwritten OCR | Capstone Project 2025
-PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
-             Shubh Soni (8887735), Dev Patel (8866936)
-DATE       : 2025-03-15
-DESCRIPTION:
-Provides a utility function to establish a PostgreSQL database connection.
-Automatically switches between local and Google Cloud SQL based on environment
-"""
-import os
-import psycopg2
-
-
-# FUNCTION   : get_db_connection
-# DESCRIPTION: Returns a database connection object based on the environment—
-#              local development or Google Cloud Run deployment
-# PARAMETERS : None
-# RETURNS    : psycopg2 connection object
-
-def get_db_connection():
-    if os.getenv("K_SERVICE"):  
-        return psycopg2.connect(
-            dbname="handwritten_ocr",
-            user="postgres",
-            password="myPassword123",
-            host="/cloudsql/lucid-diode-452919-p1:us-central1:ocr-postgres-db"
-        )
-    else:  # Running locally
-        return psycopg2.connect(
-            dbname="handwritten_ocr",
-            user="postgres",
-            password="myPassword123",
-            host="127.0.0.1",
-            port="5432"
-        )
+"""
+FILE       : db.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-03-15
+DESCRIPTION:
+Provides a utility function to establish a PostgreSQL database connection.
+Automatically switches between local and Google Cloud SQL based on environment.
+Connections come from a per-process pool of up to DB_POOL_SIZE connections,
+so a request does not pay for a new connection and its authentication, and a
+process never holds more than DB_POOL_SIZE connections to Cloud SQL. Calling
+close() on a pooled connection rolls back anything left uncommitted and hands
+it back to the pool. Connections taken during a request are handed back when
+the request ends, even if the route raised before closing them. A connection
+idle for DB_POOL_PING_AFTER seconds is checked with "SELECT 1" before it is
+reused, and one older than DB_POOL_MAX_AGE seconds is replaced.
+The schema is only changed by migrations.py. Statements a request runs are
+checked for DDL, which is counted per route in ocr_app_db_request_ddl_total
+(and refused with DB_FORBID_REQUEST_DDL).
+"""
+import os
+import re
+import time
+import queue
+import weakref
+import threading
+import psycopg2
+from psycopg2 import extensions
+from flask import g, request, has_request_context
+import metrics
+from config import (DB_POOL_ENABLED, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_AGE, DB_POOL_PING_AFTER,
+                    DB_FORBID_REQUEST_DDL)
+
+# Statements that change the schema
+_DDL = re.compile(r"^\s*(CREATE|ALTER|DROP|TRUNCATE|COMMENT|GRANT|REVOKE)\b", re.IGNORECASE)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes free within DB_POOL_TIMEOUT seconds."""
+
+
+# FUNCTION   : connect
+# DESCRIPTION: Opens a new database connection based on the environment—
+#              local development or Google Cloud Run deployment
+# PARAMETERS : None
+# RETURNS    : psycopg2 connection object
+
+def connect():
+    metrics.DB_CONNECTIONS.inc()
+    if os.getenv("K_SERVICE"):
+        return psycopg2.connect(
+            dbname="handwritten_ocr",
+            user="postgres",
+            password="myPassword123",
+            host="/cloudsql/lucid-diode-452919-p1:us-central1:ocr-postgres-db"
+        )
+    else:  # Running locally
+        return psycopg2.connect(
+            dbname="handwritten_ocr",
+            user="postgres",
+            password="myPassword123",
+            host="127.0.0.1",
+            port="5432"
+        )
+
+
+# CLASS      : RequestCursor
+# DESCRIPTION: Cursor of the connections taken during a request. Counts the
+#              schema statements it runs, or refuses them with
+#              DB_FORBID_REQUEST_DDL.
+
+class RequestCursor(extensions.cursor):
+
+    def execute(self, query, vars=None):
+        if isinstance(query, str) and _DDL.match(query):
+            route = (request.endpoint if has_request_context() else None) or "unmatched"
+            metrics.DB_REQUEST_DDL.inc(route=route)
+            if DB_FORBID_REQUEST_DDL:
+                raise psycopg2.ProgrammingError(f"Schema statement run by route {route}; "
+                                                f"add a migration in migrations.py instead")
+        return super().execute(query, vars)
+
+
+# CLASS      : PooledConnection
+# DESCRIPTION: Wraps a pooled psycopg2 connection. Everything but close() goes
+#              to the connection; close() returns it to the pool. A wrapper
+#              dropped without close() still gives its connection back.
+
+class PooledConnection:
+    __slots__ = ("_pool", "_raw", "_created_at", "_finalizer", "__weakref__")
+
+    def __init__(self, pool, raw, created_at):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_created_at", created_at)
+        object.__setattr__(self, "_finalizer",
+                           weakref.finalize(self, pool._orphans.put, (raw, created_at)))
+
+    def _connection(self):
+        if self._raw is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._connection(), name, value)
+
+    def __enter__(self):
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._connection().__exit__(*exc_info)
+
+    @property
+    def closed(self):
+        return 1 if self._raw is None else self._raw.closed
+
+    def close(self):
+        raw = self._raw
+        if raw is None:
+            return
+        object.__setattr__(self, "_raw", None)
+        self._finalizer.detach()
+        self._pool.putconn(raw, self._created_at)
+
+
+# CLASS      : ConnectionPool
+# DESCRIPTION: Up to `size` connections shared by the threads of one process.
+#              A caller waits up to `timeout` seconds for a free one.
+
+class ConnectionPool:
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, max_age=DB_POOL_MAX_AGE,
+                 ping_after=DB_POOL_PING_AFTER, connect=connect):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.ping_after = ping_after
+        self._connect = connect
+        self.counts = {"checkouts": 0, "timeouts": 0, "opened": 0, "recycled": 0,
+                       "failed_checks": 0, "discarded": 0, "orphans": 0}
+        # (connection, created_at, returned_at); the most recently returned is reused first
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        # Connections of wrappers garbage-collected without close(); put() is safe there
+        self._orphans = queue.SimpleQueue()
+        self._cond = threading.Condition()
+
+    def getconn(self):
+        """Check a connection out, waiting for one to become free if needed."""
+        self._adopt_orphans()
+        start = time.monotonic()
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = start + self.timeout - time.monotonic()
+                if remaining <= 0:
+                    self.counts["timeouts"] += 1
+                    metrics.DB_POOL_WAIT_SECONDS.observe(time.monotonic() - start)
+                    raise PoolTimeout(f"No database connection became free within {self.timeout:g} "
+                                      f"seconds ({self.size} in use)")
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._created += 1
+            self._in_use += 1
+            self.counts["checkouts"] += 1
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.monotonic() - start)
+
+        try:
+            if entry is not None:
+                raw, created_at = self._checked(*entry)
+            else:
+                raw, created_at = None, None
+            if raw is None:
+                raw, created_at = self._connect(), time.monotonic()
+                self._count("opened")
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw, created_at)
+
+    def _checked(self, raw, created_at, returned_at):
+        # Returns (raw, created_at), or (None, None) when a new connection is needed
+        now = time.monotonic()
+        if raw.closed:
+            self._count("failed_checks")
+            return None, None
+        if now - created_at > self.max_age:
+            self._count("recycled")
+            self._close(raw)
+            return None, None
+        if now - returned_at > self.ping_after:
+            try:
+                c = raw.cursor()
+                c.execute("SELECT 1")
+                c.close()
+                raw.rollback()
+            except psycopg2.Error as e:
+                print(f"Dropping broken database connection: {e}")
+                self._count("failed_checks")
+                self._close(raw)
+                return None, None
+        return raw, created_at
+
+    def putconn(self, raw, created_at):
+        """Return a connection, rolling back whatever it left uncommitted."""
+        keep = not raw.closed
+        if keep:
+            try:
+                if raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    raw.rollback()
+                if raw.autocommit:
+                    raw.autocommit = False
+                raw.cursor_factory = None
+            except psycopg2.Error as e:
+                print(f"Dropping database connection that could not be reset: {e}")
+                keep = False
+        if not keep:
+            self._count("discarded")
+            self._close(raw)
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._idle.append((raw, created_at, time.monotonic()))
+            else:
+                self._created -= 1
+            self._cond.notify()
+
+    def _adopt_orphans(self):
+        while True:
+            try:
+                raw, created_at = self._orphans.get_nowait()
+            except queue.Empty:
+                return
+            self._count("orphans")
+            self.putconn(raw, created_at)
+
+    def _close(self, raw):
+        try:
+            raw.close()
+        except psycopg2.Error:
+            pass
+
+    def _count(self, name):
+        with self._cond:
+            self.counts[name] += 1
+
+    def closeall(self):
+        """Close the idle connections (used at shutdown and by tools)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for raw, _, _ in idle:
+            self._close(raw)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self.size, "open": self._created, "in_use": self._in_use,
+                    "idle": len(self._idle), **self.counts}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+# FUNCTION   : get_pool
+# DESCRIPTION: Returns this process's connection pool, creating it on first use
+#              (and again in a forked worker, since connections cannot be
+#              shared across processes)
+# PARAMETERS : None
+# RETURNS    : ConnectionPool
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+# FUNCTION   : get_db_connection
+# DESCRIPTION: Returns a database connection from the pool (a new connection
+#              when DB_POOL_ENABLED is off). Inside a request the connection
+#              is also handed back when the request ends, and its cursors
+#              check for schema statements.
+# PARAMETERS : None
+# RETURNS    : PooledConnection (or psycopg2 connection object)
+
+def get_db_connection():
+    if not DB_POOL_ENABLED:
+        conn = connect()
+        if has_request_context():
+            conn.cursor_factory = RequestCursor
+        return conn
+    conn = get_pool().getconn()
+    if has_request_context():
+        conn.cursor_factory = RequestCursor
+        g.setdefault("db_connections", []).append(conn)
+    return conn
+
+
+# FUNCTION   : init_app
+# DESCRIPTION: Hands back every connection a request took and did not close,
+#              when the request ends (also after an exception)
+# PARAMETERS : app (Flask)
+# RETURNS    : None
+
+def init_app(app):
+
+    @app.teardown_request
+    def _return_connections(error=None):
+        for conn in g.pop("db_connections", ()):
+            conn.close()
+
+
+def _pool_stat(name):
+    return lambda: _pool.stats()[name] if _pool is not None else 0
+
+
+metrics.Gauge("ocr_app_db_pool_in_use", "Pooled database connections checked out",
+              function=_pool_stat("in_use"))
+metrics.Gauge("ocr_app_db_pool_idle", "Pooled database connections waiting to be reused",
+              function=_pool_stat("idle"))
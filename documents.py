@@ -0,0 +1,151 @@
+"""
+FILE       : documents.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-22
+DESCRIPTION:
+This module splits multi-page uploads (PDF and multi-page TIFF) into pages for
+OCR. Pages are produced one at a time by a generator: each page is rendered
+(PDF, at DOCUMENT_DPI) or decoded (TIFF), saved to the upload folder as a JPEG
+so it can be shown on the result and history pages, and handed on as an
+UploadedImage. Nothing holds more than the page being produced, so memory use
+does not depend on the number of pages. The pages of one document share a
+document id and are stored in order in the history table. A document that
+cannot be read (corrupt or not really a PDF/TIFF) fails on its own: it is
+handed on with its error and the other files of the upload are still OCR'd.
+"""
+
+import os
+import io
+import uuid
+import itertools
+from PIL import Image, ImageSequence
+from config import UPLOAD_FOLDER, DOCUMENT_EXTENSIONS, DOCUMENT_DPI, DOCUMENT_MAX_PAGES
+from uploads import UploadedImage
+from preprocess import flatten
+
+PAGE_QUALITY = 90
+
+
+# FUNCTION   : is_document
+# DESCRIPTION: Tells whether a filename is a multi-page document type
+# PARAMETERS : filename (str)
+# RETURNS    : bool
+
+def is_document(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in DOCUMENT_EXTENSIONS
+
+
+def _is_pdf(path):
+    return path.lower().endswith(".pdf")
+
+
+def _open_pdf(path):
+    # pypdfium2 is only needed once a PDF is uploaded
+    import pypdfium2
+    return pypdfium2.PdfDocument(path)
+
+
+# FUNCTION   : page_count
+# DESCRIPTION: Number of pages in a saved document, without rendering any
+# PARAMETERS : filename (str) - Saved filename in the upload folder
+# RETURNS    : int - Page count, capped at DOCUMENT_MAX_PAGES. A document
+#              that cannot be read counts as 1, for the error reported
+#              when its pages are produced.
+
+def page_count(filename):
+    path = os.path.join(UPLOAD_FOLDER, filename)
+    try:
+        if _is_pdf(path):
+            pdf = _open_pdf(path)
+            try:
+                count = len(pdf)
+            finally:
+                pdf.close()
+        else:
+            with Image.open(path) as image:
+                count = getattr(image, "n_frames", 1)
+    except Exception as e:
+        print(f"Could not count the pages of {filename}: {e}")
+        return 1
+    return min(count, DOCUMENT_MAX_PAGES)
+
+
+# FUNCTION   : iter_page_images
+# DESCRIPTION: Yields the pages of a document as grayscale PIL images, one at
+#              a time. Each page is closed before the next one is produced.
+# PARAMETERS : path (str) - Path to the PDF or TIFF file
+# RETURNS    : generator of PIL.Image
+
+def iter_page_images(path):
+    if _is_pdf(path):
+        pdf = _open_pdf(path)
+        try:
+            for index in range(min(len(pdf), DOCUMENT_MAX_PAGES)):
+                page = pdf[index]
+                try:
+                    bitmap = page.render(scale=DOCUMENT_DPI / 72, grayscale=True)
+                    yield bitmap.to_pil()
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+        return
+
+    with Image.open(path) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            if index >= DOCUMENT_MAX_PAGES:
+                break
+            yield flatten(frame, grayscale=True)
+
+
+# FUNCTION   : iter_pages
+# DESCRIPTION: Saves each page of a document as <document id>_p<n>.jpg in the
+#              upload folder and yields it for OCR. When the document cannot
+#              be read, the pages read so far are followed by the document
+#              itself carrying the error.
+# PARAMETERS : filename (str) - Saved document filename in the upload folder
+#              name (str, optional) - Original document filename for display
+# RETURNS    : generator of UploadedImage with document_id, document and page
+#              set, or with error set for an unreadable document
+
+def iter_pages(filename, name=None):
+    document_id = uuid.uuid4().hex
+    name = name or filename
+    name_stem = name.rsplit(".", 1)[0]
+    page_images = iter_page_images(os.path.join(UPLOAD_FOLDER, filename))
+    for number in itertools.count(1):
+        # pypdfium2 and Pillow raise their own errors for a corrupt file
+        try:
+            page_image = next(page_images, None)
+        except Exception as e:
+            print(f"Could not read document {filename}: {e}")
+            yield UploadedImage(filename, name=name, error=f"The document could not be read: {e}")
+            return
+        if page_image is None:
+            return
+        output = io.BytesIO()
+        page_image.save(output, format="JPEG", quality=PAGE_QUALITY)
+        page_image.close()
+        content = output.getvalue()
+        page_filename = f"{document_id}_p{number:04d}.jpg"
+        with open(os.path.join(UPLOAD_FOLDER, page_filename), "wb") as page_file:
+            page_file.write(content)
+        yield UploadedImage(page_filename, content, document_id=document_id,
+                            document=name, page=number, name=f"{name_stem}_p{number:04d}.jpg")
+
+
+# FUNCTION   : expand
+# DESCRIPTION: Turns saved uploads into the stream of images to OCR: images
+#              are passed through and documents are replaced by their pages
+# PARAMETERS : images (iterable of UploadedImage) - Saved uploads, in order
+# RETURNS    : generator of UploadedImage, in upload and page order
+
+def expand(images):
+    for image in images:
+        if is_document(image.filename):
+            image.release()
+            yield from iter_pages(image.filename, image.name)
+        else:
+            yield image
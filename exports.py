@@ -0,0 +1,189 @@
+"""
+FILE       : exports.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-30
+DESCRIPTION:
+This module renders text as a downloadable .txt, .docx or .pdf file. Files are
+rendered into memory and never written to disk, so users downloading at the
+same time cannot overwrite each other's files and nothing piles up in the
+upload folder. Rendered files are kept in a byte-bounded LRU keyed by the
+SHA-256 of the text and the format, so downloading the same result again
+skips the rendering. zip_stream() packs many texts into a ZIP archive that is
+handed out entry by entry while it is written, for bulk history exports.
+"""
+
+import io
+import zipfile
+import hashlib
+from collections import deque
+from xml.sax.saxutils import escape
+from docx import Document
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+from cache import LRUCache
+import metrics
+import render_pool
+from config import EXPORT_CACHE_ENABLED, EXPORT_CACHE_MAX_ENTRIES, EXPORT_CACHE_MAX_BYTES
+
+FORMATS = ("txt", "docx", "pdf")
+
+MIMETYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+
+export_cache = LRUCache(max_entries=EXPORT_CACHE_MAX_ENTRIES, max_bytes=EXPORT_CACHE_MAX_BYTES)
+
+
+# FUNCTION   : render_document
+# DESCRIPTION: Renders text as a file of the given format in memory. Runs in a
+#              render pool worker for docx and pdf (see render()). In a PDF
+#              every line is its own paragraph, with the text escaped since
+#              reportlab reads paragraphs as markup.
+# PARAMETERS : text (str), format (str) - "txt", "docx" or "pdf"
+# RETURNS    : bytes - File content
+
+def render_document(text, format):
+    buffer = io.BytesIO()
+    if format == "docx":
+        doc = Document()
+        doc.add_paragraph(text)
+        doc.save(buffer)
+    elif format == "pdf":
+        pdf = SimpleDocTemplate(buffer, pagesize=letter)
+        pdf.build([Paragraph(escape(line)) if line.strip() else Spacer(1, 12)
+                   for line in text.splitlines()] or [Spacer(1, 12)])
+    else:  # txt
+        buffer.write(text.encode("utf-8"))
+    return buffer.getvalue()
+
+
+# FUNCTION   : render
+# DESCRIPTION: Renders text as a file of the given format. docx and pdf are
+#              rendered in the render pool; txt is cheap and done here.
+#              Raises render_pool.RenderBusy when the pool's queue is full and
+#              render_pool.RenderTimeout when rendering takes too long.
+# PARAMETERS : text (str), format (str) - "txt", "docx" or "pdf"
+# RETURNS    : bytes - File content
+
+def render(text, format):
+    metrics.EXPORT_RENDERS.inc(format=format)
+    if format == "txt":
+        return render_document(text, format)
+    return render_pool.get_pool().run(render_document, text, format)
+
+
+# FUNCTION   : cached_render
+# DESCRIPTION: Returns the rendered file from the export cache, rendering and
+#              caching it on a miss
+# PARAMETERS : text (str), format (str) - "txt", "docx" or "pdf"
+# RETURNS    : bytes - File content
+
+def cached_render(text, format):
+    if not EXPORT_CACHE_ENABLED:
+        return render(text, format)
+    key = f"{format}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    content = export_cache.get(key)
+    if content is not None:
+        metrics.EXPORT_CACHE_LOOKUPS.inc(result="hit")
+        return content
+    metrics.EXPORT_CACHE_LOOKUPS.inc(result="miss")
+    content = render(text, format)
+    export_cache.set(key, content)
+    return content
+
+
+# CLASS      : _ChunkWriter
+# DESCRIPTION: Write-only file object that collects what zipfile writes until
+#              it is taken. It cannot seek, so zipfile writes each entry's
+#              sizes after its data instead of going back to fill them in.
+
+class _ChunkWriter(io.RawIOBase):
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# FUNCTION   : zip_stream
+# DESCRIPTION: Builds a ZIP archive of rendered files and yields it piece by
+#              piece: each entry is rendered, compressed and handed out as
+#              soon as it is ready, so only a few entries are held in memory
+#              however many there are. docx and pdf entries are rendered in
+#              the render pool, one per pool worker ahead of the entry being
+#              written. Text entries are deflated; docx and pdf files are
+#              already compressed and are stored as they are. An entry that
+#              cannot be rendered is replaced by a <name>.error.txt note, so
+#              one bad text does not cut the archive short.
+# PARAMETERS : entries (iterable of (name, text)) - Entry names without
+#                  extension, and their text
+#              format (str) - "txt", "docx" or "pdf"
+# RETURNS    : generator of bytes
+
+def zip_stream(entries, format):
+    writer = _ChunkWriter()
+    compression = zipfile.ZIP_DEFLATED if format == "txt" else zipfile.ZIP_STORED
+    with zipfile.ZipFile(writer, "w", compression=compression) as archive:
+        for filename, content in _rendered(entries, format):
+            archive.writestr(filename, content)
+            yield writer.take()
+    # The central directory is written when the archive is closed
+    yield writer.take()
+
+
+def _entry(name, format, fn, *args):
+    # (file name, content) of one archive entry, or of a note saying why it failed
+    try:
+        return f"{name}.{format}", fn(*args)
+    except Exception as e:
+        print(f"Could not render {name}.{format} for export: {e!r}")
+        return f"{name}.error.txt", f"{name}.{format} could not be rendered: {e}\n".encode("utf-8")
+
+
+def _rendered(entries, format):
+    # Yields (file name, content) in order, keeping up to one job per pool worker in flight
+    pool = render_pool.get_pool()
+    if format == "txt" or pool.workers <= 0:
+        for name, text in entries:
+            yield _entry(name, format, render, text, format)
+        return
+    pending = deque()
+    try:
+        for name, text in entries:
+            metrics.EXPORT_RENDERS.inc(format=format)
+            # The window bounds this export's jobs, so the queue limit does not apply
+            pending.append((name, pool.submit(render_document, text, format, limit=False)))
+            if len(pending) >= pool.workers:
+                name, future = pending.popleft()
+                yield _entry(name, format, pool.result, future)
+        while pending:
+            name, future = pending.popleft()
+            yield _entry(name, format, pool.result, future)
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+# FUNCTION   : stats
+# DESCRIPTION: Returns the size and hit rate of the export cache, and the
+#              render pool's counters
+# PARAMETERS : None
+# RETURNS    : dict
+
+def stats():
+    return {"enabled": EXPORT_CACHE_ENABLED, **export_cache.stats(),
+            "render_pool": render_pool.get_pool().stats()}
@@ -0,0 +1,149 @@
+"""
+FILE       : history_search.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-03
+DESCRIPTION:
+This module searches a user's history. The text of every history row is
+indexed in history.search, a tsvector that PostgreSQL keeps up to date on
+insert, with a GIN index (migration 2), so a search looks up the matching rows
+instead of reading every text. Every word of the query must appear, and the
+last one may be the start of a word ("cell photosyn" finds "cell" and
+"photosynthesis").
+Results are ranked by how closely the words appear together and come with a
+snippet of the text with the words highlighted. A date range is answered from
+the (user_id, timestamp) index.
+"""
+
+import re
+import datetime
+from markupsafe import Markup, escape
+import metrics
+from db import get_db_connection
+from config import HISTORY_SEARCH_LIMIT, HISTORY_SEARCH_CANDIDATES
+
+# Text search configuration of history.search (see migration 2). "simple" does
+# no stemming, so text in any language is indexed word for word.
+CONFIG = "simple"
+
+# ts_headline marks matches with control characters, which are replaced with
+# <mark> tags after the snippet is HTML-escaped
+_START, _STOP = "\x02", "\x03"
+_HEADLINE_OPTIONS = (f'StartSel="{_START}", StopSel="{_STOP}", MaxWords=30, MinWords=10, '
+                     'MaxFragments=2, FragmentDelimiter=" … "')
+
+# Words of a query; punctuation and tsquery operators are dropped
+_WORD = re.compile(r"[^\W_]+")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+# FUNCTION   : to_tsquery_text
+# DESCRIPTION: Turns what the user typed into a to_tsquery() expression: all
+#              words must match, the last one as a prefix
+# PARAMETERS : query (str)
+# RETURNS    : str - Empty when the query has no words
+
+def to_tsquery_text(query):
+    words = _WORD.findall(query.lower())
+    if not words:
+        return ""
+    return " & ".join(words[:-1] + [words[-1] + ":*"])
+
+
+# FUNCTION   : parse_query
+# DESCRIPTION: Splits a search box query into text and dates. A query that is
+#              just a date (YYYY-MM-DD) searches that day, as the search box
+#              used to match timestamps.
+# PARAMETERS : query (str), start (datetime or None), end (datetime or None)
+# RETURNS    : tuple - (text, start, end)
+
+def parse_query(query, start=None, end=None):
+    query = query.strip()
+    if _DATE.match(query):
+        try:
+            day = datetime.datetime.strptime(query, "%Y-%m-%d")
+        except ValueError:
+            return query, start, end
+        return "", day, day
+    return query, start, end
+
+
+# FUNCTION   : search
+# DESCRIPTION: Searches a user's history. With text, returns the best ranked
+#              matches among the HISTORY_SEARCH_CANDIDATES most recent ones,
+#              each with a highlighted snippet; without, the most recent
+#              records in the date range.
+# PARAMETERS : user_id (int), text (str), start, end (datetime or None) -
+#                  Dates of the first and last day, inclusive
+#              limit (int) - Most results returned
+# RETURNS    : list of (image, text, timestamp, snippet, filename) - snippet is
+#              Markup, or None without text; filename is the original name
+
+def search(user_id, text="", start=None, end=None, limit=HISTORY_SEARCH_LIMIT):
+    tsquery = to_tsquery_text(text)
+    conditions, params = date_conditions(start, end)
+
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        with metrics.stage("history_search"):
+            if not tsquery:
+                c.execute(f"""
+                    SELECT image, text, timestamp, NULL, COALESCE(filename, image) FROM history
+                    WHERE user_id = %(user_id)s {conditions}
+                    ORDER BY timestamp DESC
+                    LIMIT %(limit)s
+                """, {"user_id": user_id, "limit": limit, **params})
+                return c.fetchall()
+            # Rank the most recent matches, then highlight only the rows returned
+            c.execute(f"""
+                SELECT image, text, timestamp,
+                       ts_headline('{CONFIG}', text, to_tsquery('{CONFIG}', %(query)s), %(options)s),
+                       filename
+                FROM (
+                    SELECT image, text, timestamp, filename,
+                           ts_rank_cd(search, to_tsquery('{CONFIG}', %(query)s)) AS rank
+                    FROM (
+                        SELECT image, text, timestamp, COALESCE(filename, image) AS filename, search
+                        FROM history
+                        WHERE user_id = %(user_id)s AND search @@ to_tsquery('{CONFIG}', %(query)s)
+                              {conditions}
+                        ORDER BY timestamp DESC
+                        LIMIT %(candidates)s
+                    ) recent
+                    ORDER BY rank DESC, timestamp DESC
+                    LIMIT %(limit)s
+                ) best
+                ORDER BY rank DESC, timestamp DESC
+            """, {"user_id": user_id, "query": tsquery, "options": _HEADLINE_OPTIONS,
+                  "candidates": HISTORY_SEARCH_CANDIDATES, "limit": limit, **params})
+            return [(image, text, timestamp, highlight(snippet), filename)
+                    for image, text, timestamp, snippet, filename in c.fetchall()]
+    finally:
+        conn.close()
+
+
+# FUNCTION   : date_conditions
+# DESCRIPTION: SQL conditions on history.timestamp for a date range
+# PARAMETERS : start, end (datetime or None) - First and last day, inclusive
+# RETURNS    : tuple - (SQL to append to a WHERE clause, named parameters)
+
+def date_conditions(start, end):
+    conditions, params = "", {}
+    if start:
+        conditions += " AND timestamp >= %(start)s"
+        params["start"] = start
+    if end:
+        conditions += " AND timestamp < %(end)s"
+        params["end"] = end + datetime.timedelta(days=1)
+    return conditions, params
+
+
+# FUNCTION   : highlight
+# DESCRIPTION: HTML-escapes a ts_headline snippet and marks the matched words
+# PARAMETERS : snippet (str)
+# RETURNS    : Markup
+
+def highlight(snippet):
+    return Markup(str(escape(snippet)).replace(_START, "<mark>").replace(_STOP, "</mark>"))
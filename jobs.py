@@ -0,0 +1,306 @@
+"""
+FILE       : jobs.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-17
+DESCRIPTION:
+This module provides the asynchronous OCR job queue. In job mode the upload
+request only saves the files and queues a job, then returns its id straight
+away. Job workers, separate from the threads serving requests, OCR the pages,
+write the history rows and store the results, and the result page polls
+/jobs/<id> until the job is done. Two queue backends are available:
+  - memory   : jobs are kept in this process and run by background threads.
+               Only suitable with a single web worker process.
+  - postgres : jobs are kept in the ocr_jobs table and claimed with
+               FOR UPDATE SKIP LOCKED, so any number of web workers and
+               standalone workers (python jobs.py) can share the queue.
+A job that runs out of OCR quota is put back in the queue until the budget
+frees up, instead of failing.
+"""
+
+import json
+import time
+import uuid
+import queue
+import datetime
+import threading
+from db import get_db_connection
+from config import (OCR_JOB_MODE, JOB_WORKERS, JOB_RESULT_TTL, JOB_STALE_SECONDS,
+                    VISION_BATCH_SIZE)
+from ocr_service import load_upload, process_images, record_results, batches
+from quota import QuotaExceeded
+import documents
+import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _now():
+    return datetime.datetime.now()
+
+
+# CLASS      : MemoryQueue
+# DESCRIPTION: Job queue held in this process. Finished jobs are forgotten
+#              JOB_RESULT_TTL seconds after they complete.
+
+class MemoryQueue:
+
+    def __init__(self):
+        self._jobs = {}
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, filenames, total=None):
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "user_id": user_id, "status": QUEUED, "files": list(filenames),
+               "total": total or len(filenames), "done": 0, "results": None, "error": None,
+               "created_at": _now(), "updated_at": _now()}
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        self._pending.put(job_id)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def claim(self, timeout=1.0):
+        try:
+            job_id = self._pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        return self.update(job_id, status=RUNNING)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=_now())
+            return dict(job)
+
+    def requeue(self, job_id, delay):
+        self.update(job_id, status=QUEUED, done=0)
+        timer = threading.Timer(delay, self._pending.put, args=(job_id,))
+        timer.daemon = True
+        timer.start()
+
+    def _prune(self):
+        cutoff = _now() - datetime.timedelta(seconds=JOB_RESULT_TTL)
+        for job_id in [j["id"] for j in self._jobs.values()
+                       if j["status"] in (DONE, FAILED) and j["updated_at"] < cutoff]:
+            del self._jobs[job_id]
+
+
+# CLASS      : PostgresQueue
+# DESCRIPTION: Job queue stored in the ocr_jobs table
+
+class PostgresQueue:
+    # A running job whose worker died (no progress for JOB_STALE_SECONDS) is
+    # picked up again by the next claim.
+
+    COLUMNS = "id, user_id, status, files, total, done, results, error, created_at, updated_at"
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip([c.strip() for c in self.COLUMNS.split(",")], row))
+        job["files"] = json.loads(job["files"])
+        job["results"] = json.loads(job["results"]) if job["results"] else None
+        return job
+
+    def submit(self, user_id, filenames, total=None):
+        job_id = uuid.uuid4().hex
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute("""
+            INSERT INTO ocr_jobs (id, user_id, status, files, total, done, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, 0, NOW(), NOW())
+        """, (job_id, user_id, QUEUED, json.dumps(list(filenames)), total or len(filenames)))
+        conn.commit()
+        conn.close()
+        return job_id
+
+    def get(self, job_id):
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(f"SELECT {self.COLUMNS} FROM ocr_jobs WHERE id=%s", (job_id,))
+        row = c.fetchone()
+        conn.close()
+        return self._row_to_job(row)
+
+    def claim(self, timeout=1.0):
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(f"""
+            UPDATE ocr_jobs SET status=%s, updated_at=NOW()
+            WHERE id = (
+                SELECT id FROM ocr_jobs
+                WHERE (status=%s AND (run_after IS NULL OR run_after <= NOW()))
+                   OR (status=%s AND updated_at < NOW() - %s * INTERVAL '1 second')
+                ORDER BY created_at FOR UPDATE SKIP LOCKED LIMIT 1
+            )
+            RETURNING {self.COLUMNS}
+        """, (RUNNING, QUEUED, RUNNING, JOB_STALE_SECONDS))
+        row = c.fetchone()
+        conn.commit()
+        conn.close()
+        if row is None:
+            time.sleep(timeout)
+        return self._row_to_job(row)
+
+    def requeue(self, job_id, delay):
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute("""
+            UPDATE ocr_jobs SET status=%s, done=0, updated_at=NOW(),
+                run_after = NOW() + %s * INTERVAL '1 second'
+            WHERE id=%s
+        """, (QUEUED, delay, job_id))
+        conn.commit()
+        conn.close()
+
+    def update(self, job_id, **fields):
+        if "results" in fields:
+            fields["results"] = json.dumps(fields["results"], default=str)
+        assignments = ", ".join(f"{name}=%s" for name in fields)
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(f"UPDATE ocr_jobs SET {assignments}, updated_at=NOW() WHERE id=%s",
+                  list(fields.values()) + [job_id])
+        c.execute("DELETE FROM ocr_jobs WHERE status IN (%s, %s) AND updated_at < NOW() - %s * INTERVAL '1 second'",
+                  (DONE, FAILED, JOB_RESULT_TTL))
+        conn.commit()
+        conn.close()
+
+
+QUEUES = {
+    "memory": MemoryQueue,
+    "postgres": PostgresQueue,
+}
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+# FUNCTION   : get_queue
+# DESCRIPTION: Returns the process-wide job queue selected by OCR_JOB_MODE
+# PARAMETERS : None
+# RETURNS    : MemoryQueue or PostgresQueue
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                if OCR_JOB_MODE not in QUEUES:
+                    raise ValueError(f"Unknown OCR job mode: {OCR_JOB_MODE}")
+                _queue = QUEUES[OCR_JOB_MODE]()
+    return _queue
+
+
+# FUNCTION   : job_mode_enabled
+# DESCRIPTION: Tells whether uploads should be queued instead of run inline
+# PARAMETERS : None
+# RETURNS    : bool
+
+def job_mode_enabled():
+    return OCR_JOB_MODE in QUEUES
+
+
+def _load_job_upload(entry):
+    # (saved filename, original filename); jobs queued before uploads had
+    # unique names list the saved filename alone
+    return load_upload(entry) if isinstance(entry, str) else load_upload(*entry)
+
+
+# FUNCTION   : run_job
+# DESCRIPTION: OCRs every page of a job in chunks, updating its progress, then
+#              writes the history rows and stores the results. Documents are
+#              split into pages as the chunks are taken.
+# PARAMETERS : job (dict), job_queue (queue backend), log_activity (callable)
+# RETURNS    : None
+
+def run_job(job, job_queue, log_activity):
+    user_id = job["user_id"]
+    results = []
+    try:
+        pages = documents.expand(_load_job_upload(entry) for entry in job["files"])
+        for images in batches(pages, VISION_BATCH_SIZE):
+            results.extend(process_images(images, user_id))
+            job_queue.update(job["id"], done=len(results))
+        record_results(user_id, results, log_activity)
+        job_queue.update(job["id"], status=DONE, results=results)
+    except QuotaExceeded as e:
+        # Pages already done are served from the OCR cache on the next run
+        print(f"OCR job {job['id']} waiting for quota: {e}")
+        job_queue.requeue(job["id"], e.retry_after)
+    except Exception as e:
+        print(f"OCR job {job['id']} failed: {e}")
+        job_queue.update(job["id"], status=FAILED, error=str(e))
+
+
+# FUNCTION   : worker_loop
+# DESCRIPTION: Claims and runs jobs until stop_event is set
+# PARAMETERS : log_activity (callable), stop_event (threading.Event)
+# RETURNS    : None
+
+def worker_loop(log_activity, stop_event):
+    job_queue = get_queue()
+    while not stop_event.is_set():
+        try:
+            job = job_queue.claim()
+        except Exception as e:
+            print(f"OCR job claim failed: {e}")
+            time.sleep(1)
+            continue
+        if job:
+            with metrics.JOBS_IN_FLIGHT.track():
+                run_job(job, job_queue, log_activity)
+
+
+_workers_started = False
+_stop_event = threading.Event()
+
+
+# FUNCTION   : start_workers
+# DESCRIPTION: Starts JOB_WORKERS background worker threads in this process
+#              (once). Used for the memory backend, and optionally with postgres.
+# PARAMETERS : log_activity (callable) - log_user_activity(user_id, activity, details)
+#              count (int) - Number of worker threads
+# RETURNS    : None
+
+def start_workers(log_activity, count=JOB_WORKERS):
+    global _workers_started
+    with _queue_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+    for i in range(count):
+        threading.Thread(target=worker_loop, args=(log_activity, _stop_event),
+                         name=f"ocr-job-{i}", daemon=True).start()
+
+
+if __name__ == "__main__":
+    # Standalone worker process for the postgres backend:
+    #   OCR_JOB_MODE=postgres python jobs.py
+    # The app's copy of this module is used so the embedded-worker guard and
+    # the queue are shared with it.
+    from app import log_user_activity
+    import jobs
+
+    if OCR_JOB_MODE != "postgres":
+        raise SystemExit("Standalone workers need OCR_JOB_MODE=postgres")
+    print(f"Starting {JOB_WORKERS} OCR job workers")
+    jobs.start_workers(log_user_activity)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        jobs._stop_event.set()
@@ -0,0 +1,200 @@
+"""
+FILE       : layout.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-24
+DESCRIPTION:
+This module keeps the structure of an OCR result: the pages, blocks, paragraphs
+and words Vision found, with their bounding boxes and confidences. It is packed
+into a small binary blob made of flat arrays, one set per level (boxes as four
+int32 per item, confidences as float32, the index of the parent item as
+uint32), plus the UTF-8 text of the words, and compressed with zlib. The blob
+is stored in the ocr_layouts table next to the history row, so it is only read
+when something asks for it, and features such as low-confidence highlighting
+never need another Vision call. Boxes are in pixels of the uploaded image
+(upright, after EXIF rotation), even when a smaller copy was sent for OCR.
+"""
+
+import sys
+import zlib
+import struct
+from array import array
+import psycopg2
+from db import get_db_connection
+
+MAGIC = b"OCRL"
+VERSION = 1
+HEADER = struct.Struct("<4sBIIII")
+
+LEVELS = ("pages", "blocks", "paragraphs", "words")
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _box(bounding_box, transform):
+    vertices = bounding_box.vertices
+    if not vertices:
+        return 0, 0, 0, 0
+    xs = [vertex.x for vertex in vertices]
+    ys = [vertex.y for vertex in vertices]
+    sx, sy, ox, oy = transform or (1.0, 1.0, 0.0, 0.0)
+    return (int(round(min(xs) * sx + ox)), int(round(min(ys) * sy + oy)),
+            int(round(max(xs) * sx + ox)), int(round(max(ys) * sy + oy)))
+
+
+# FUNCTION   : pack
+# DESCRIPTION: Packs the layout of a Vision response into the binary format
+# PARAMETERS : response (AnnotateImageResponse)
+#              transform (tuple, optional) - (scale_x, scale_y, offset_x,
+#                  offset_y) mapping the coordinates of the image sent for OCR
+#                  back to the uploaded image (see preprocess.py)
+# RETURNS    : bytes, or None when the response has no text
+
+def pack(response, transform=None):
+    annotation = response.full_text_annotation
+    if not annotation.pages:
+        return None
+
+    boxes = {level: array("i") for level in LEVELS}
+    confidences = {level: array("f") for level in LEVELS}
+    parents = {level: array("I") for level in LEVELS[1:]}
+    text_offsets = array("I", [0])
+    text = bytearray()
+
+    sx, sy, ox, oy = transform or (1.0, 1.0, 0.0, 0.0)
+    for page in annotation.pages:
+        # A page's box is the part of the uploaded image that was sent for OCR
+        page_index = len(confidences["pages"])
+        boxes["pages"].extend((int(round(ox)), int(round(oy)),
+                               int(round(page.width * sx + ox)), int(round(page.height * sy + oy))))
+        confidences["pages"].append(page.confidence)
+        for block in page.blocks:
+            block_index = len(confidences["blocks"])
+            boxes["blocks"].extend(_box(block.bounding_box, transform))
+            confidences["blocks"].append(block.confidence)
+            parents["blocks"].append(page_index)
+            for paragraph in block.paragraphs:
+                paragraph_index = len(confidences["paragraphs"])
+                boxes["paragraphs"].extend(_box(paragraph.bounding_box, transform))
+                confidences["paragraphs"].append(paragraph.confidence)
+                parents["paragraphs"].append(block_index)
+                for word in paragraph.words:
+                    boxes["words"].extend(_box(word.bounding_box, transform))
+                    confidences["words"].append(word.confidence)
+                    parents["words"].append(paragraph_index)
+                    text.extend("".join(symbol.text for symbol in word.symbols).encode("utf-8"))
+                    text_offsets.append(len(text))
+
+    parts = [HEADER.pack(MAGIC, VERSION, *(len(confidences[level]) for level in LEVELS))]
+    for level in LEVELS:
+        parts.append(_little_endian(boxes[level]).tobytes())
+        parts.append(_little_endian(confidences[level]).tobytes())
+        if level in parents:
+            parts.append(_little_endian(parents[level]).tobytes())
+    parts.append(_little_endian(text_offsets).tobytes())
+    parts.append(bytes(text))
+    return zlib.compress(b"".join(parts), 6)
+
+
+# CLASS      : Layout
+# DESCRIPTION: Unpacked layout. Each level is a set of parallel arrays: boxes
+#              (x0, y0, x1, y1 per item), confidences and parents.
+
+class Layout:
+
+    def __init__(self, data):
+        raw = zlib.decompress(data)
+        magic, version, *counts = HEADER.unpack_from(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a packed OCR layout")
+        self.counts = dict(zip(LEVELS, counts))
+        self.boxes = {}
+        self.confidences = {}
+        self.parents = {}
+
+        position = HEADER.size
+        for level in LEVELS:
+            count = self.counts[level]
+            self.boxes[level], position = self._read(raw, position, "i", count * 4)
+            self.confidences[level], position = self._read(raw, position, "f", count)
+            if level != "pages":
+                self.parents[level], position = self._read(raw, position, "I", count)
+        offsets, position = self._read(raw, position, "I", self.counts["words"] + 1)
+        text = raw[position:]
+        self.words_text = [text[offsets[i]:offsets[i + 1]].decode("utf-8")
+                           for i in range(self.counts["words"])]
+
+    @staticmethod
+    def _read(raw, position, typecode, count):
+        values = array(typecode)
+        end = position + values.itemsize * count
+        values.frombytes(raw[position:end])
+        return _little_endian(values), end
+
+    def box(self, level, index):
+        start = index * 4
+        return tuple(self.boxes[level][start:start + 4])
+
+    def words(self, max_confidence=None):
+        """Yield (index, text, box, confidence) for each word, optionally only
+        the words whose confidence is below max_confidence."""
+        for i, word in enumerate(self.words_text):
+            confidence = self.confidences["words"][i]
+            if max_confidence is None or confidence < max_confidence:
+                yield i, word, self.box("words", i), confidence
+
+    def to_dict(self, max_confidence=None):
+        return {
+            "pages": [{"box": self.box("pages", i),
+                       "confidence": round(self.confidences["pages"][i], 4)}
+                      for i in range(self.counts["pages"])],
+            "counts": self.counts,
+            "words": [{"index": i, "text": text, "box": box, "confidence": round(confidence, 4),
+                       "paragraph": self.parents["words"][i]}
+                      for i, text, box, confidence in self.words(max_confidence)],
+        }
+
+
+# FUNCTION   : save
+# DESCRIPTION: Stores a packed layout for a history row, on the caller's cursor
+# PARAMETERS : cursor, history_id (int), data (bytes)
+# RETURNS    : None
+
+def save(cursor, history_id, data):
+    cursor.execute("INSERT INTO ocr_layouts (history_id, layout) VALUES (%s, %s)",
+                   (history_id, psycopg2.Binary(data)))
+
+
+# FUNCTION   : copy
+# DESCRIPTION: Gives a history row the layout of another one (used when the
+#              text of a near-duplicate upload is reused)
+# PARAMETERS : cursor, history_id (int), source_history_id (int)
+# RETURNS    : None
+
+def copy(cursor, history_id, source_history_id):
+    cursor.execute("""
+        INSERT INTO ocr_layouts (history_id, layout)
+        SELECT %s, layout FROM ocr_layouts WHERE history_id = %s
+    """, (history_id, source_history_id))
+
+
+# FUNCTION   : load
+# DESCRIPTION: Loads the layout of one of a user's history rows
+# PARAMETERS : history_id (int), user_id (int)
+# RETURNS    : Layout, or None when the row has no stored layout
+
+def load(history_id, user_id):
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT l.layout FROM ocr_layouts l JOIN history h ON h.id = l.history_id
+        WHERE l.history_id = %s AND h.user_id = %s
+    """, (history_id, user_id))
+    row = c.fetchone()
+    conn.close()
+    return Layout(bytes(row[0])) if row else None
@@ -0,0 +1,266 @@
+"""
+FILE       : metrics.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-28
+DESCRIPTION:
+This module keeps the application's metrics and renders them in the Prometheus
+text format for the /metrics endpoint. There are three kinds:
+  - Counter   : only goes up (OCR calls, cache hits, DB connections, ...)
+  - Gauge     : goes up and down (requests and jobs in flight)
+  - Histogram : counts observations into fixed buckets (request and stage
+                durations)
+Recording a value takes one lock, one dict lookup and, for histograms, a
+bisect over the buckets, so instrumentation stays on in production. Values are
+kept per process; with several gunicorn workers each one is scraped on its own.
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from config import METRICS_ENABLED
+
+# Seconds; covers a fast cache hit through a slow multi-page upload
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+# CLASS      : Metric
+# DESCRIPTION: Base class. Values are kept per combination of label values.
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def samples(self):
+        """Yield (suffix, label values, extra labels, value) for rendering."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels_text(self.labels, key, extra)} {_number(value)}")
+        return lines
+
+
+# CLASS      : Counter
+# DESCRIPTION: Value that only increases
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+# CLASS      : Gauge
+# DESCRIPTION: Value that goes up and down, or is read from a function when
+#              the metrics are rendered
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, labels=(), function=None):
+        super().__init__(name, description, labels)
+        self.function = function
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in flight."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                yield "", (), (), float(self.function())
+            except Exception as e:
+                print(f"Metric {self.name} unavailable: {e}")
+            return
+        yield from super().samples()
+
+
+# CLASS      : Histogram
+# DESCRIPTION: Counts observations into cumulative buckets, with their sum
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # One count per bucket plus +Inf, then the sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the enclosed block takes, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                yield "_bucket", key, (("le", _number(float(bound))),), cumulative
+            yield "_sum", key, (), state[-1]
+            yield "_count", key, (), cumulative
+
+
+# Metrics recorded across the application
+REQUEST_SECONDS = Histogram("ocr_app_request_seconds", "Time to handle an HTTP request",
+                            ("route", "method", "status"))
+REQUESTS_IN_FLIGHT = Gauge("ocr_app_requests_in_flight", "HTTP requests being handled")
+STAGE_SECONDS = Histogram("ocr_app_stage_seconds",
+                          "Time spent in one stage of a request (file_save, extract_text, "
+                          "history_insert, log_user_activity, ...)", ("stage",))
+OCR_CALLS = Counter("ocr_app_ocr_calls_total", "Images sent to an OCR engine", ("engine",))
+OCR_CACHE_LOOKUPS = Counter("ocr_app_ocr_cache_lookups_total",
+                            "OCR cache lookups by the tier that answered (memory, db or miss)",
+                            ("result",))
+TRANSLATION_CALLS = Counter("ocr_app_translation_calls_total", "Calls to the translation service",
+                            ("status",))
+TRANSLATION_CACHE_LOOKUPS = Counter("ocr_app_translation_cache_lookups_total",
+                                    "Translation cache lookups by the tier that answered "
+                                    "(memory, db or miss)", ("result",))
+EXPORT_RENDERS = Counter("ocr_app_export_renders_total", "Downloads rendered", ("format",))
+RENDER_SECONDS = Histogram("ocr_app_render_seconds",
+                           "Time to render a docx or pdf, in the render pool or inline", ("mode",))
+RENDER_JOBS = Counter("ocr_app_render_jobs_total",
+                      "Render pool jobs by outcome (ok, error, timeout or rejected)", ("outcome",))
+EXPORT_CACHE_LOOKUPS = Counter("ocr_app_export_cache_lookups_total",
+                               "Rendered download cache lookups (hit or miss)", ("result",))
+DB_CONNECTIONS = Counter("ocr_app_db_connections_total", "PostgreSQL connections opened")
+DB_POOL_WAIT_SECONDS = Histogram("ocr_app_db_pool_wait_seconds",
+                                 "Time spent waiting for a pooled database connection",
+                                 buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0))
+DB_REQUEST_DDL = Counter("ocr_app_db_request_ddl_total",
+                         "Schema statements (CREATE, ALTER, DROP...) run while handling a request",
+                         ("route",))
+JOBS_IN_FLIGHT = Gauge("ocr_app_jobs_in_flight", "OCR jobs being run by this process's workers")
+
+
+# FUNCTION   : stage
+# DESCRIPTION: Times one stage of a request into STAGE_SECONDS
+# PARAMETERS : name (str) - Stage name
+# RETURNS    : Context manager
+
+def stage(name):
+    return STAGE_SECONDS.time(stage=name)
+
+
+# FUNCTION   : render
+# DESCRIPTION: Renders every metric in the Prometheus text exposition format
+# PARAMETERS : None
+# RETURNS    : str
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# FUNCTION   : init_app
+# DESCRIPTION: Times every request of a Flask app into REQUEST_SECONDS. The
+#              route label is the endpoint name, so URL parameters do not
+#              create a new series per value.
+# PARAMETERS : app (Flask)
+# RETURNS    : None
+
+def init_app(app):
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.teardown_request
+    def _stop_timer(error=None):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return
+        REQUESTS_IN_FLIGHT.dec()
+        status = getattr(g, "metrics_status", 500 if error is not None else 200)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=request.endpoint or "unmatched",
+                                method=request.method, status=str(status))
+
+    @app.after_request
+    def _record_status(response):
+        g.metrics_status = response.status_code
+        return response
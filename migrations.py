@@ -0,0 +1,264 @@
+"""
+FILE       : migrations.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-02
+DESCRIPTION:
+This module keeps the database schema up to date. Every schema change is a
+numbered migration in MIGRATIONS; the schema_migrations table records the
+ones already applied, and migrate() applies the rest in order, each in its own
+transaction. It runs once when the app starts (and can be run by hand before a
+deploy), so routes never create or alter tables. Several workers starting at
+the same time take turns through a PostgreSQL advisory lock.
+Migration 1 is the schema of table_script. It uses IF NOT EXISTS throughout,
+so a database created from table_script, or by an older version of the app,
+is brought up to date without losing data.
+
+Usage: python migrations.py [status]
+"""
+
+import psycopg2
+import db
+
+# pg_advisory_lock key held while migrating ("OCR" in ASCII)
+LOCK_KEY = 0x4F4352
+
+# (version, description, statements), in the order they are applied. Never edit
+# an applied migration; add a new one.
+MIGRATIONS = [
+    (1, "Initial schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            gmail TEXT UNIQUE NOT NULL,
+            verified INTEGER DEFAULT 0
+        )
+        """,
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS verified INTEGER DEFAULT 0",
+        """
+        CREATE TABLE IF NOT EXISTS documents (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            filename TEXT NOT NULL,
+            pages INTEGER NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS history (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            image TEXT NOT NULL,
+            text TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            phash BIGINT,
+            document_id TEXT REFERENCES documents (id) ON DELETE CASCADE,
+            page INTEGER
+        )
+        """,
+        "ALTER TABLE history ADD COLUMN IF NOT EXISTS phash BIGINT",
+        "ALTER TABLE history ADD COLUMN IF NOT EXISTS document_id TEXT REFERENCES documents (id) ON DELETE CASCADE",
+        "ALTER TABLE history ADD COLUMN IF NOT EXISTS page INTEGER",
+        "CREATE INDEX IF NOT EXISTS history_document_idx ON history (document_id, page)",
+        """
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            user_id INTEGER PRIMARY KEY,
+            analytics INTEGER,
+            notifications INTEGER,
+            language TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_2fa (
+            user_id INTEGER PRIMARY KEY,
+            enabled INTEGER,
+            secret TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            session_id TEXT,
+            ip_address TEXT,
+            device_info TEXT,
+            last_active TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS feedback (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            rating INTEGER,
+            comment TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ocr_cache (
+            cache_key TEXT PRIMARY KEY,
+            engine TEXT NOT NULL,
+            text TEXT NOT NULL,
+            layout BYTEA,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "ALTER TABLE ocr_cache ADD COLUMN IF NOT EXISTS layout BYTEA",
+        """
+        CREATE TABLE IF NOT EXISTS translation_cache (
+            cache_key TEXT PRIMARY KEY,
+            backend TEXT NOT NULL,
+            source_lang TEXT NOT NULL,
+            target_lang TEXT NOT NULL,
+            text TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_hit TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ocr_layouts (
+            history_id INTEGER PRIMARY KEY REFERENCES history (id) ON DELETE CASCADE,
+            layout BYTEA NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            files TEXT NOT NULL,
+            total INTEGER NOT NULL,
+            done INTEGER DEFAULT 0,
+            results TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            run_after TIMESTAMP
+        )
+        """,
+        "ALTER TABLE ocr_jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS ocr_jobs_status_idx ON ocr_jobs (status, created_at)",
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            name TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            day DATE NOT NULL,
+            day_used INTEGER DEFAULT 0
+        )
+        """,
+    ]),
+    (2, "History full-text search", [
+        # Kept up to date by PostgreSQL on every insert and update (needs PostgreSQL 12+)
+        """
+        ALTER TABLE history ADD COLUMN IF NOT EXISTS search tsvector
+            GENERATED ALWAYS AS (to_tsvector('simple', text)) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS history_search_idx ON history USING GIN (search)",
+        "CREATE INDEX IF NOT EXISTS history_user_timestamp_idx ON history (user_id, timestamp)",
+    ]),
+    (3, "Cache invalidation generations", [
+        """
+        CREATE TABLE IF NOT EXISTS cache_generations (
+            name TEXT PRIMARY KEY,
+            generation BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    # history.image becomes the unique name the upload is stored under and
+    # filename the name it was uploaded with (NULL for older rows)
+    (4, "Original upload filenames", [
+        "ALTER TABLE history ADD COLUMN IF NOT EXISTS filename TEXT",
+    ]),
+]
+
+
+# FUNCTION   : applied_versions
+# DESCRIPTION: Returns the versions recorded in schema_migrations
+# PARAMETERS : conn (psycopg2 connection)
+# RETURNS    : set of int
+
+def applied_versions(conn):
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in c.fetchall()}
+    conn.commit()
+    return versions
+
+
+# FUNCTION   : migrate
+# DESCRIPTION: Applies every migration not applied yet, in order. Each one and
+#              its schema_migrations row are committed together, so a failed
+#              migration leaves nothing half done and is tried again next time.
+# PARAMETERS : None
+# RETURNS    : list of int - Versions applied by this call
+
+def migrate():
+    conn = db.connect()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+        try:
+            done = applied_versions(conn)
+            applied = []
+            for version, description, statements in MIGRATIONS:
+                if version in done:
+                    continue
+                try:
+                    for statement in statements:
+                        c.execute(statement)
+                    c.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                              (version, description))
+                    conn.commit()
+                except psycopg2.Error:
+                    conn.rollback()
+                    raise
+                print(f"Applied migration {version}: {description}")
+                applied.append(version)
+            return applied
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+# FUNCTION   : pending
+# DESCRIPTION: Lists the migrations not applied yet
+# PARAMETERS : None
+# RETURNS    : list of (version, description)
+
+def pending():
+    conn = db.connect()
+    try:
+        done = applied_versions(conn)
+    finally:
+        conn.close()
+    return [(version, description) for version, description, _ in MIGRATIONS if version not in done]
+
+
+if __name__ == "__main__":
+    # Admin commands:
+    #   python migrations.py          apply pending migrations
+    #   python migrations.py status   list pending migrations
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        waiting = pending()
+        for version, description in waiting:
+            print(f"Pending migration {version}: {description}")
+        print(f"{len(waiting)} pending, latest version {MIGRATIONS[-1][0]}")
+    else:
+        applied = migrate()
+        print(f"Applied {len(applied)} migrations" if applied else "Schema is up to date")
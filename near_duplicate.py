@@ -0,0 +1,275 @@
+"""
+FILE       : near_duplicate.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-11
+DESCRIPTION:
+This module finds near-duplicate uploads so text from a previous scan of the
+same page can be reused instead of calling Vision again. Each upload gets a
+64-bit difference hash (dHash) that changes little between re-scans or phone
+photos of the same page. A user's hashes are kept in a multi-index hash table
+so the uploads within PHASH_THRESHOLD bits (Hamming distance) can be found
+without comparing against every history row. The hash is stored in history.phash.
+A 64-bit hash cannot tell apart pages that share a layout (lined notebook pages
+with different handwriting can be 2-7 bits apart), so a hash match is only
+reused after the two images themselves are compared pixel by pixel at 64x64
+(see same_image). Reuse is off unless NEAR_DUPLICATE_REUSE is set.
+"""
+
+import io
+import os
+import threading
+from PIL import Image, ImageChops, ImageOps
+from db import get_db_connection
+from cache import LRUCache
+from config import (UPLOAD_FOLDER, PHASH_THRESHOLD, PHASH_INDEX_USERS, PHASH_CONFIRM_PIXEL_DIFF,
+                    PHASH_CONFIRM_MAX_CHANGED)
+
+HASH_BITS = 64
+THUMBNAIL_SIDE = 64
+
+
+# FUNCTION   : dhash
+# DESCRIPTION: Computes the 64-bit difference hash of an image: the image is
+#              shrunk to 9x8 grayscale and each bit records whether a pixel is
+#              brighter than its right-hand neighbour
+# PARAMETERS : content (bytes) - Raw image bytes
+# RETURNS    : int - Unsigned 64-bit hash, or None if the image can't be read
+
+def dhash(content):
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.draft("L", (64, 64))
+            small = image.convert("L").resize((9, 8), Image.LANCZOS)
+    except Exception as e:
+        print(f"Could not hash image: {e}")
+        return None
+
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+# FUNCTION   : thumbnail
+# DESCRIPTION: Shrinks an image to 64x64 grayscale with its contrast stretched,
+#              for comparing two images pixel by pixel
+# PARAMETERS : content (bytes) - Raw image bytes
+# RETURNS    : PIL.Image, or None if the image can't be read
+
+def thumbnail(content):
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.draft("L", (THUMBNAIL_SIDE * 2, THUMBNAIL_SIDE * 2))
+            small = image.convert("L").resize((THUMBNAIL_SIDE, THUMBNAIL_SIDE), Image.BILINEAR)
+    except Exception as e:
+        print(f"Could not read image: {e}")
+        return None
+    return ImageOps.autocontrast(small)
+
+
+# FUNCTION   : changed_fraction
+# DESCRIPTION: Share of the pixels of two thumbnails that differ by more than
+#              PHASH_CONFIRM_PIXEL_DIFF levels. Re-encoding, resizing or a
+#              brightness change leaves it near 0; different handwriting on
+#              the same kind of page changes a few percent of the pixels.
+# PARAMETERS : a, b (PIL.Image) - Thumbnails from thumbnail()
+# RETURNS    : float - 0 to 1
+
+def changed_fraction(a, b):
+    changed = ImageChops.difference(a, b).point(lambda v: 255 if v > PHASH_CONFIRM_PIXEL_DIFF else 0)
+    return changed.histogram()[255] / (THUMBNAIL_SIDE * THUMBNAIL_SIDE)
+
+
+# FUNCTION   : same_image
+# DESCRIPTION: Confirms a hash match by comparing the upload with the saved
+#              file of the previous upload. A previous file that is gone
+#              cannot confirm anything, so its text is not reused.
+# PARAMETERS : small (PIL.Image) - Thumbnail of the new upload
+#              filename (str)    - Saved filename of the previous upload
+# RETURNS    : bool
+
+def same_image(small, filename):
+    try:
+        with open(os.path.join(UPLOAD_FOLDER, filename), "rb") as saved_file:
+            previous = thumbnail(saved_file.read())
+    except OSError:
+        return False
+    return previous is not None and changed_fraction(small, previous) <= PHASH_CONFIRM_MAX_CHANGED
+
+
+# FUNCTION   : hamming
+# DESCRIPTION: Number of differing bits between two hashes
+# PARAMETERS : a (int), b (int)
+# RETURNS    : int
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# FUNCTION   : to_signed / to_unsigned
+# DESCRIPTION: Converts a 64-bit hash to and from PostgreSQL's signed BIGINT
+# PARAMETERS : value (int)
+# RETURNS    : int
+
+def to_signed(value):
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+# CLASS      : MultiIndexHash
+# DESCRIPTION: Multi-index hashing over Hamming distance. Each hash is split into
+#              max_distance + 1 bit ranges and filed under every range. Two
+#              hashes within max_distance bits must agree exactly on at least one
+#              range (pigeonhole), so a search only compares the query against
+#              the entries sharing one of its ranges instead of every entry.
+
+class MultiIndexHash:
+
+    def __init__(self, max_distance=PHASH_THRESHOLD, bits=HASH_BITS):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        self._ranges = []
+        start = 0
+        for i in range(chunks):
+            width = bits // chunks + (1 if i < bits % chunks else 0)
+            self._ranges.append((start, (1 << width) - 1))
+            start += width
+        self._tables = [{} for _ in self._ranges]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(values) for values in self._entries.values())
+
+    def _keys(self, value_hash):
+        return [(value_hash >> shift) & mask for shift, mask in self._ranges]
+
+    def add(self, value_hash, value):
+        """Add value under value_hash."""
+        with self._lock:
+            values = self._entries.get(value_hash)
+            if values is not None:
+                values.append(value)
+                return
+            self._entries[value_hash] = [value]
+            for table, key in zip(self._tables, self._keys(value_hash)):
+                table.setdefault(key, []).append(value_hash)
+
+    def search(self, query_hash, max_distance=None):
+        """Return (distance, value) pairs within max_distance, closest first."""
+        if max_distance is None:
+            max_distance = self.max_distance
+        with self._lock:
+            if max_distance > self.max_distance:
+                # The ranges only guarantee matches up to self.max_distance
+                candidates = self._entries.keys()
+            else:
+                candidates = set()
+                for table, key in zip(self._tables, self._keys(query_hash)):
+                    candidates.update(table.get(key, ()))
+            matches = []
+            for candidate in candidates:
+                distance = hamming(query_hash, candidate)
+                if distance <= max_distance:
+                    matches.extend((distance, value) for value in self._entries[candidate])
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+# Per-user indexes, loaded from history on first use. Least recently used
+# users are dropped once PHASH_INDEX_USERS indexes are held.
+_indexes = LRUCache(max_entries=PHASH_INDEX_USERS)
+_load_lock = threading.Lock()
+
+
+# FUNCTION   : get_index
+# DESCRIPTION: Returns the index of a user's previous uploads, building it from
+#              the history table if it is not loaded yet
+# PARAMETERS : user_id (int)
+# RETURNS    : MultiIndexHash with history ids as values
+
+def get_index(user_id):
+    index = _indexes.get(user_id)
+    if index is not None:
+        return index
+
+    with _load_lock:
+        index = _indexes.get(user_id)
+        if index is not None:
+            return index
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute("SELECT id, phash FROM history WHERE user_id=%s AND phash IS NOT NULL",
+                  (user_id,))
+        index = MultiIndexHash()
+        for history_id, phash in c.fetchall():
+            index.add(to_unsigned(phash), history_id)
+        conn.close()
+        _indexes.set(user_id, index)
+        return index
+
+
+# FUNCTION   : add
+# DESCRIPTION: Adds a newly inserted history row to the user's index, if loaded
+# PARAMETERS : user_id (int), history_id (int), phash (int, unsigned)
+# RETURNS    : None
+
+def add(user_id, history_id, phash):
+    index = _indexes.get(user_id)
+    if index is not None and phash is not None:
+        index.add(phash, history_id)
+
+
+# FUNCTION   : forget_user
+# DESCRIPTION: Drops a user's index (e.g. after their history was cleared)
+# PARAMETERS : user_id (int)
+# RETURNS    : None
+
+def forget_user(user_id):
+    _indexes.delete(user_id)
+
+
+# FUNCTION   : find_duplicate
+# DESCRIPTION: Finds the closest previous upload of the user within the
+#              threshold that is confirmed to be the same image (same_image)
+#              and returns its history text
+# PARAMETERS : user_id (int), phash (int, unsigned), content (bytes) - The
+#              new upload, threshold (int)
+# RETURNS    : dict with history_id, image, filename, text, timestamp and
+#              distance, or None
+
+def find_duplicate(user_id, phash, content, threshold=PHASH_THRESHOLD):
+    if phash is None:
+        return None
+    matches = get_index(user_id).search(phash, threshold)
+    if not matches:
+        return None
+    small = thumbnail(content)
+    if small is None:
+        return None
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    for distance, history_id in matches:
+        # Rows saved before uploads had unique names (no filename) are skipped:
+        # a later upload of the same name may have replaced their file
+        c.execute("""
+            SELECT image, filename, text, timestamp FROM history
+            WHERE id=%s AND user_id=%s AND filename IS NOT NULL
+        """, (history_id, user_id))
+        row = c.fetchone()
+        if row and same_image(small, row[0]):
+            conn.close()
+            return {"history_id": history_id, "image": row[0], "filename": row[1], "text": row[2],
+                    "timestamp": row[3], "distance": distance}
+    conn.close()
+    return None
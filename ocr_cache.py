@@ -0,0 +1,344 @@
+"""
+FILE       : ocr_cache.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-08
+DESCRIPTION:
+This module caches OCR results by image content so re-uploading the same scan
+does not cost another Vision call. Entries are keyed by the SHA-256 of the image
+bytes together with the OCR engine and its options, and hold the text with the
+packed layout of the result (see layout.py). Lookups go to an in-process
+LRU first and then to the ocr_cache table in PostgreSQL; both tiers expire
+entries after OCR_CACHE_TTL seconds and are bounded in size. Failed OCR results
+are never cached. Invalidating the cache reaches the memory tier of every
+process through its generation (see cache_generations.py).
+"""
+
+import threading
+import psycopg2
+from db import get_db_connection
+from cache import LRUCache
+import cache_generations
+from ocr_engine import image_digest, response_text, CircuitOpen
+from quota import QuotaExceeded
+import layout
+import metrics
+from config import (OCR_CACHE_ENABLED, OCR_CACHE_MEMORY_ENTRIES, OCR_CACHE_DB_MAX_ROWS,
+                    OCR_CACHE_TTL)
+
+OCR_OPTIONS = "document_text_detection"
+
+# Name of this cache in the cache_generations table
+GENERATION_NAME = "ocr"
+
+# Expired and surplus rows are pruned from the table once every this many stores
+PRUNE_INTERVAL = 100
+
+memory_cache = LRUCache(max_entries=OCR_CACHE_MEMORY_ENTRIES, ttl=OCR_CACHE_TTL)
+
+_counter_lock = threading.Lock()
+_counters = {"db_hits": 0, "db_misses": 0, "db_errors": 0, "stores": 0}
+
+
+def _count(name, amount=1):
+    with _counter_lock:
+        _counters[name] += amount
+
+
+# FUNCTION   : cache_key
+# DESCRIPTION: Builds the cache key for an image digest, engine and options
+# PARAMETERS : digest (str)      - SHA-256 hex digest of the image bytes
+#              engine_name (str) - Name of the OCR engine
+#              options (str)     - OCR options that affect the result
+# RETURNS    : str - Cache key
+
+def cache_key(digest, engine_name, options=OCR_OPTIONS):
+    return f"{engine_name}:{options}:{digest}"
+
+
+# FUNCTION   : lookup
+# DESCRIPTION: Looks a key up in memory, then in PostgreSQL. A memory entry
+#              stored before the cache was last invalidated is ignored. A
+#              database hit is copied into the memory tier.
+# PARAMETERS : key (str) - Cache key
+# RETURNS    : tuple (text, packed layout or None), or None on a miss
+
+def lookup(key):
+    generation = cache_generations.current(GENERATION_NAME)
+    entry = memory_cache.get(key)
+    if entry is not None:
+        if entry[0] == generation:
+            metrics.OCR_CACHE_LOOKUPS.inc(result="memory")
+            return entry[1]
+        memory_cache.delete(key)
+
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE ocr_cache SET last_hit = NOW()
+                WHERE cache_key = %s AND created_at > NOW() - %s * INTERVAL '1 second'
+                RETURNING text, layout
+            """, (key, OCR_CACHE_TTL))
+            row = c.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"OCR cache lookup failed: {e}")
+        _count("db_errors")
+        metrics.OCR_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    if row is None:
+        _count("db_misses")
+        metrics.OCR_CACHE_LOOKUPS.inc(result="miss")
+        return None
+    _count("db_hits")
+    metrics.OCR_CACHE_LOOKUPS.inc(result="db")
+    cached = (row[0], bytes(row[1]) if row[1] is not None else None)
+    memory_cache.set(key, (generation, cached))
+    return cached
+
+
+# FUNCTION   : store
+# DESCRIPTION: Saves OCR text and layout under key in both tiers
+# PARAMETERS : key (str) - Cache key
+#              engine_name (str) - Name of the OCR engine
+#              text (str) - Extracted text
+#              packed (bytes, optional) - Packed layout
+# RETURNS    : None
+
+def store(key, engine_name, text, packed=None):
+    memory_cache.set(key, (cache_generations.current(GENERATION_NAME), (text, packed)))
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO ocr_cache (cache_key, engine, text, layout, created_at, last_hit)
+                VALUES (%s, %s, %s, %s, NOW(), NOW())
+                ON CONFLICT (cache_key) DO UPDATE
+                SET text = EXCLUDED.text, layout = EXCLUDED.layout, created_at = NOW(), last_hit = NOW()
+            """, (key, engine_name, text, psycopg2.Binary(packed) if packed is not None else None))
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"OCR cache store failed: {e}")
+        _count("db_errors")
+        return
+
+    _count("stores")
+    if _counters["stores"] % PRUNE_INTERVAL == 0:
+        prune()
+
+
+# FUNCTION   : prune
+# DESCRIPTION: Deletes expired rows and the least recently hit rows beyond
+#              OCR_CACHE_DB_MAX_ROWS from the ocr_cache table
+# PARAMETERS : None
+# RETURNS    : int - Number of rows deleted
+
+def prune():
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM ocr_cache WHERE created_at <= NOW() - %s * INTERVAL '1 second'",
+                      (OCR_CACHE_TTL,))
+            deleted = c.rowcount
+            c.execute("""
+                DELETE FROM ocr_cache WHERE cache_key IN (
+                    SELECT cache_key FROM ocr_cache ORDER BY last_hit DESC OFFSET %s
+                )
+            """, (OCR_CACHE_DB_MAX_ROWS,))
+            deleted += c.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+    except psycopg2.Error as e:
+        print(f"OCR cache prune failed: {e}")
+        _count("db_errors")
+        return 0
+
+
+def _prepare(content, prepare):
+    return prepare(content) if prepare else (content, None)
+
+
+# FUNCTION   : extract
+# DESCRIPTION: Runs the engine on one image and packs the layout of its response
+# PARAMETERS : content (bytes), engine (OCREngine), prepare (callable or None)
+# RETURNS    : tuple - (text, packed layout or None)
+
+def extract(content, engine, prepare=None):
+    prepared, transform = _prepare(content, prepare)
+    metrics.OCR_CALLS.inc(engine=engine.name)
+    response = engine.annotate(prepared)
+    return response_text(response), layout.pack(response, transform)
+
+
+# FUNCTION   : extract_batch
+# DESCRIPTION: Batch version of extract. A failure on one image does not affect
+#              the others.
+# PARAMETERS : contents (list of bytes), engine (OCREngine), prepare (callable or None)
+# RETURNS    : list of (text, layout, error) tuples; text and layout are None
+#              when error is set
+
+def extract_batch(contents, engine, prepare=None):
+    prepared = [_prepare(content, prepare) for content in contents]
+    metrics.OCR_CALLS.inc(len(contents), engine=engine.name)
+    try:
+        responses = engine.annotate_batch([p[0] for p in prepared])
+    except (QuotaExceeded, CircuitOpen):
+        # Not about these images; the caller waits or uses the fallback engine
+        raise
+    except Exception as e:
+        # e.g. the batch ran past its deadline: every image in it failed
+        responses = [e] * len(contents)
+    results = []
+    for response, (_, transform) in zip(responses, prepared):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            results.append((response_text(response), layout.pack(response, transform), None))
+        except Exception as e:
+            results.append((None, None, str(e)))
+    return results
+
+
+# FUNCTION   : cached_extract
+# DESCRIPTION: Returns the text and layout for an image from the cache, running
+#              the engine and caching the result on a miss
+# PARAMETERS : content (bytes) - Raw image bytes
+#              engine (OCREngine) - Engine used on a miss
+#              options (str) - Extra options that change the OCR result
+#              prepare (callable, optional) - Applied to the bytes before the
+#                  engine is called on a miss; returns (bytes, transform)
+#              digest (str, optional) - SHA-256 of content when the caller
+#                                       already hashed it (e.g. during upload)
+# RETURNS    : tuple - (text, packed layout or None)
+
+def cached_extract(content, engine, options=OCR_OPTIONS, prepare=None, digest=None):
+    if not OCR_CACHE_ENABLED:
+        return extract(content, engine, prepare)
+
+    key = cache_key(digest or image_digest(content), engine.name, options)
+    cached = lookup(key)
+    if cached is None:
+        cached = extract(content, engine, prepare)
+        store(key, engine.name, *cached)
+    return cached
+
+
+# FUNCTION   : cached_extract_text
+# DESCRIPTION: Same as cached_extract, returning only the text
+# PARAMETERS : As for cached_extract
+# RETURNS    : str - Extracted text
+
+def cached_extract_text(content, engine, options=OCR_OPTIONS, prepare=None, digest=None):
+    return cached_extract(content, engine, options, prepare, digest)[0]
+
+
+# FUNCTION   : cached_extract_batch
+# DESCRIPTION: Batch version of cached_extract. Only the images that miss the
+#              cache are sent to the engine.
+# PARAMETERS : contents (list of bytes) - Raw image bytes in order
+#              engine (OCREngine) - Engine used for the misses
+#              options, prepare - As for cached_extract
+#              digests (list of str, optional) - SHA-256 of each content
+# RETURNS    : list of (text, layout, error) tuples in the same order as contents
+
+def cached_extract_batch(contents, engine, options=OCR_OPTIONS, prepare=None, digests=None):
+    if not OCR_CACHE_ENABLED:
+        return extract_batch(contents, engine, prepare)
+
+    digests = digests or [image_digest(content) for content in contents]
+    keys = [cache_key(digest, engine.name, options) for digest in digests]
+    results = [None] * len(contents)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = lookup(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            results[i] = (*cached, None)
+
+    if missing:
+        extracted = extract_batch([contents[i] for i in missing], engine, prepare)
+        for i, (text, packed, error) in zip(missing, extracted):
+            results[i] = (text, packed, error)
+            if error is None:
+                store(keys[i], engine.name, text, packed)
+    return results
+
+
+# FUNCTION   : cached_extract_text_batch
+# DESCRIPTION: Same as cached_extract_batch, returning only text and errors
+# PARAMETERS : As for cached_extract_batch
+# RETURNS    : list of (text, error) tuples in the same order as contents
+
+def cached_extract_text_batch(contents, engine, options=OCR_OPTIONS, prepare=None, digests=None):
+    return [(text, error) for text, _, error
+            in cached_extract_batch(contents, engine, options, prepare, digests)]
+
+
+# FUNCTION   : invalidate
+# DESCRIPTION: Removes cached results. With a digest only that image's entries
+#              are removed (for every engine and option set), otherwise all.
+#              The cache's generation is bumped with the delete, so every
+#              process drops its memory entries within
+#              CACHE_GENERATION_CHECK_INTERVAL seconds; those of other images
+#              are then read back from the table.
+# PARAMETERS : digest (str, optional) - SHA-256 hex digest of an image
+# RETURNS    : int - Number of database rows deleted
+
+def invalidate(digest=None):
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        if digest:
+            # Keys end in :<digest> (see cache_key); compared as text, not a
+            # LIKE pattern, so % or _ in the argument match only themselves
+            suffix = f":{digest}"
+            c.execute("DELETE FROM ocr_cache WHERE right(cache_key, %s) = %s", (len(suffix), suffix))
+        else:
+            c.execute("DELETE FROM ocr_cache")
+        deleted = c.rowcount
+        cache_generations.bump(c, GENERATION_NAME)
+        conn.commit()
+    finally:
+        conn.close()
+    memory_cache.clear()
+    return deleted
+
+
+# FUNCTION   : stats
+# DESCRIPTION: Returns hit/miss counters for both cache tiers
+# PARAMETERS : None
+# RETURNS    : dict
+
+def stats():
+    with _counter_lock:
+        database = dict(_counters)
+    return {"enabled": OCR_CACHE_ENABLED, "memory": memory_cache.stats(), "database": database,
+            "generation": cache_generations.current(GENERATION_NAME)}
+
+
+if __name__ == "__main__":
+    # Admin commands:
+    #   python ocr_cache.py invalidate [digest]
+    #   python ocr_cache.py prune
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "invalidate":
+        print(f"Deleted {invalidate(sys.argv[2] if len(sys.argv) > 2 else None)} cached results")
+    elif command == "prune":
+        print(f"Deleted {prune()} cached results")
+    else:
+        print("Usage: python ocr_cache.py invalidate [digest] | prune")
@@ -0,0 +1,615 @@
+"""
+FILE       : ocr_engine.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-02
+DESCRIPTION:
+This module defines the OCR engine layer used by the application. An engine
+takes raw image bytes and returns a Vision AnnotateImageResponse. The Vision
+engine shares one ImageAnnotatorClient per process so channel setup and auth
+token loading happen once, the replay engine serves saved responses (used for
+offline runs against the Test/ images) and the record engine saves live
+responses so they can be replayed later. The fake engine stands in for Vision
+with simulated latency and injected quota and server errors. The active engine
+is chosen with the OCR_ENGINE environment variable (vision, replay, record or
+fake). Engines that call Vision (or pretend to) are wrapped in a LimitedEngine
+that keeps them within the quota and retries transient errors (see quota.py),
+a HedgedEngine that gives every call a deadline and, optionally, sends a second
+attempt when the first is slower than usual, and a BreakerEngine that fails
+fast while the service is failing (see resilience.py); vision_api.py then
+switches to OCR_FALLBACK_ENGINE when one is configured.
+Engines also accept a list of images so multi-file uploads can share one
+round-trip.
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from google.cloud import vision
+from google.api_core import exceptions as api_exceptions
+from config import (OCR_ENGINE, OCR_REPLAY_DIR, VISION_BATCH_SIZE, VISION_BATCH_MAX_BYTES,
+                    FAKE_OCR_LATENCY, FAKE_OCR_QUOTA_ERROR_RATE, FAKE_OCR_SERVER_ERROR_RATE,
+                    FAKE_OCR_SLOW_RATE, FAKE_OCR_SLOW_LATENCY, OCR_DEADLINE, OCR_HEDGE_ENABLED,
+                    OCR_HEDGE_MIN_DELAY, OCR_HEDGE_DEFAULT_DELAY, OCR_BREAKER_ENABLED,
+                    OCR_FALLBACK_ENGINE, OCR_MAX_WORKERS)
+import quota
+import resilience
+import metrics
+
+# Calls seen before the p95 latency is trusted as the hedge delay
+HEDGE_MIN_SAMPLES = 20
+
+
+class OCRError(Exception):
+    """Raised when an OCR engine cannot produce text for an image."""
+
+
+class OCRTimeout(OCRError):
+    """Raised when an OCR call does not finish before its deadline."""
+
+
+class CircuitOpen(OCRError):
+    """Raised without calling the engine while its circuit breaker is open."""
+
+
+class BatchRejected(OCRError):
+    """Stands in for the images of a batch request that was rejected as a whole."""
+
+
+# FUNCTION   : image_digest
+# DESCRIPTION: Computes the SHA-256 hex digest of the image content. Used as the
+#              key for recorded responses.
+# PARAMETERS : content (bytes) - Raw image bytes
+# RETURNS    : str - Hex digest
+
+def image_digest(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+# CLASS      : OCREngine
+# DESCRIPTION: Base class for OCR engines. Subclasses implement annotate().
+
+class OCREngine:
+    name = "base"
+
+    def annotate(self, content):
+        """Return the AnnotateImageResponse for the given image bytes."""
+        raise NotImplementedError
+
+    def annotate_batch(self, contents):
+        """Return one response (or the exception raised) per image, in order."""
+        responses = []
+        for content in contents:
+            try:
+                responses.append(self.annotate(content))
+            except Exception as e:
+                responses.append(e)
+        return responses
+
+    def extract_text(self, content):
+        """Return the full text found in the given image bytes."""
+        return response_text(self.annotate(content))
+
+    def extract_text_batch(self, contents):
+        """Return a (text, error) pair per image. Exactly one of them is None."""
+        results = []
+        for response in self.annotate_batch(contents):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                results.append((response_text(response), None))
+            except Exception as e:
+                results.append((None, str(e)))
+        return results
+
+
+# FUNCTION   : response_text
+# DESCRIPTION: Returns the full text of a Vision response, raising OCRError when
+#              the response carries an error for that image
+# PARAMETERS : response (AnnotateImageResponse)
+# RETURNS    : str - Extracted full text
+
+def response_text(response):
+    if response.error.message:
+        raise OCRError(f"Vision API Error: {response.error.message}")
+    return response.full_text_annotation.text
+
+
+# FUNCTION   : batch_chunks
+# DESCRIPTION: Splits a list of images into index ranges that respect the Vision
+#              per-request image count and payload size limits
+# PARAMETERS : contents (list of bytes) - Raw image bytes in upload order
+# RETURNS    : list of (start, end) index pairs
+
+def batch_chunks(contents):
+    chunks = []
+    start = 0
+    size = 0
+    for i, content in enumerate(contents):
+        count = i - start
+        if count and (count >= VISION_BATCH_SIZE or size + len(content) > VISION_BATCH_MAX_BYTES):
+            chunks.append((start, i))
+            start = i
+            size = 0
+        size += len(content)
+    if start < len(contents):
+        chunks.append((start, len(contents)))
+    return chunks
+
+
+# CLASS      : VisionEngine
+# DESCRIPTION: Calls Google Cloud Vision document_text_detection through a
+#              client that is created once per process and shared by all threads.
+
+class VisionEngine(OCREngine):
+    name = "vision"
+
+    _client = None
+    _client_pid = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls):
+        """Return the process-wide ImageAnnotatorClient, creating it on first use."""
+        # gRPC channels do not survive a fork, so a gunicorn worker that
+        # inherited a client from its parent builds its own.
+        pid = os.getpid()
+        if cls._client is None or cls._client_pid != pid:
+            with cls._client_lock:
+                if cls._client is None or cls._client_pid != pid:
+                    cls._client = vision.ImageAnnotatorClient()
+                    cls._client_pid = pid
+        return cls._client
+
+    @staticmethod
+    def _timeout():
+        # Time left before the caller's deadline (see HedgedEngine)
+        left = resilience.time_left()
+        return OCR_DEADLINE if left is None else max(0.1, left)
+
+    def annotate(self, content):
+        image = vision.Image(content=content)
+        return self.get_client().document_text_detection(image=image, timeout=self._timeout())
+
+    def annotate_batch(self, contents):
+        feature = vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+        responses = [None] * len(contents)
+        for start, end in batch_chunks(contents):
+            requests = [
+                vision.AnnotateImageRequest(image=vision.Image(content=content), features=[feature])
+                for content in contents[start:end]
+            ]
+            try:
+                batch = self.get_client().batch_annotate_images(requests=requests,
+                                                                timeout=self._timeout())
+                responses[start:end] = list(batch.responses)
+            except Exception as e:
+                # Quota and server errors are retried as a whole batch by
+                # LimitedEngine. A rejected batch (e.g. one oversized image)
+                # should not fail every page in it, so its images are marked
+                # for LimitedEngine to send one at a time, within the quota.
+                if quota.is_transient(e):
+                    raise
+                responses[start:end] = [BatchRejected(f"Vision API Error: {e}") for _ in range(start, end)]
+        return responses
+
+
+# CLASS      : ReplayEngine
+# DESCRIPTION: Serves responses saved as JSON in the replay directory, keyed by
+#              the SHA-256 of the image. Makes no network calls.
+
+class ReplayEngine(OCREngine):
+    name = "replay"
+
+    def __init__(self, replay_dir=OCR_REPLAY_DIR):
+        self.replay_dir = replay_dir
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def _path(self, digest):
+        return os.path.join(self.replay_dir, f"{digest}.json")
+
+    def annotate(self, content):
+        digest = image_digest(content)
+        with self._lock:
+            response = self._responses.get(digest)
+        if response is not None:
+            return response
+
+        path = self._path(digest)
+        if not os.path.exists(path):
+            raise OCRError(f"Replay Error: no recorded response for image {digest[:12]}")
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        response = vision.AnnotateImageResponse.from_json(
+            json.dumps(record["response"]), ignore_unknown_fields=True)
+
+        with self._lock:
+            self._responses[digest] = response
+        return response
+
+
+# CLASS      : RecordEngine
+# DESCRIPTION: Wraps another engine and writes each response it returns to the
+#              replay directory so the same image can later be replayed offline.
+
+class RecordEngine(OCREngine):
+    name = "record"
+
+    def __init__(self, engine=None, replay_dir=OCR_REPLAY_DIR):
+        self.engine = engine or VisionEngine()
+        self.replay_dir = replay_dir
+
+    def annotate(self, content, image_name=None):
+        response = self.engine.annotate(content)
+        self._save(content, response, image_name)
+        return response
+
+    def annotate_batch(self, contents):
+        responses = self.engine.annotate_batch(contents)
+        for content, response in zip(contents, responses):
+            if not isinstance(response, Exception):
+                self._save(content, response)
+        return responses
+
+    def _save(self, content, response, image_name=None):
+        if response.error.message:
+            return
+        os.makedirs(self.replay_dir, exist_ok=True)
+        record = {
+            "image": image_name,
+            "response": json.loads(vision.AnnotateImageResponse.to_json(response)),
+        }
+        path = os.path.join(self.replay_dir, f"{image_digest(content)}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+
+
+# CLASS      : FakeEngine
+# DESCRIPTION: Stand-in for Vision that makes no network calls. Every image
+#              gets the same text after `latency` seconds, except that a share
+#              of calls is slow (`slow_latency` seconds) and quota (429) and
+#              server (503) errors are raised at the given rates.
+
+class FakeEngine(OCREngine):
+    name = "fake"
+
+    def __init__(self, text="Fake OCR text", latency=FAKE_OCR_LATENCY,
+                 quota_error_rate=FAKE_OCR_QUOTA_ERROR_RATE,
+                 server_error_rate=FAKE_OCR_SERVER_ERROR_RATE,
+                 slow_rate=FAKE_OCR_SLOW_RATE, slow_latency=FAKE_OCR_SLOW_LATENCY, seed=None):
+        self.text = text
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.server_error_rate = server_error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.counts = {"calls": 0, "slow": 0, "quota_errors": 0, "server_errors": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def annotate(self, content):
+        with self._lock:
+            roll = self._random.random()
+            slow = self._random.random() < self.slow_rate
+            self.counts["calls"] += 1
+            self.counts["slow"] += slow
+        time.sleep(self.slow_latency if slow else self.latency)
+        if roll < self.quota_error_rate:
+            with self._lock:
+                self.counts["quota_errors"] += 1
+            raise api_exceptions.ResourceExhausted("Quota exceeded (injected by fake engine)")
+        if roll < self.quota_error_rate + self.server_error_rate:
+            with self._lock:
+                self.counts["server_errors"] += 1
+            raise api_exceptions.ServiceUnavailable("Service unavailable (injected by fake engine)")
+        return vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(text=self.text))
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+# CLASS      : LimitedEngine
+# DESCRIPTION: Wraps an engine so every call first takes its images from the
+#              quota and transient failures are retried with backoff. Images of
+#              a batch that failed transiently or was rejected as a whole are
+#              sent again one at a time, each charged to the quota. Keeps the
+#              wrapped engine's name, so cache keys do not change.
+
+class LimitedEngine(OCREngine):
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.name = engine.name
+
+    def annotate(self, content):
+        return quota.call_with_retry(lambda: self.engine.annotate(content))
+
+    def annotate_batch(self, contents):
+        responses = quota.call_with_retry(lambda: self.engine.annotate_batch(contents),
+                                          cost=len(contents))
+        # Images that failed transiently inside the batch, or whose batch was
+        # rejected, are retried alone
+        for i, response in enumerate(responses):
+            if quota.is_transient(response) or isinstance(response, BatchRejected):
+                try:
+                    responses[i] = self.annotate(contents[i])
+                except quota.QuotaExceeded:
+                    raise
+                except Exception as e:
+                    responses[i] = e
+        return responses
+
+
+# CLASS      : HedgedEngine
+# DESCRIPTION: Wraps an engine so every call (retries included) gets `deadline`
+#              seconds, after which it fails with OCRTimeout. With hedging on,
+#              a single-image call still running after the p95 latency of
+#              recent calls gets a second attempt, and the first to succeed is
+#              returned. Attempts run on a shared thread pool; an abandoned
+#              attempt stops at the deadline (Vision calls get it as their
+#              timeout) and retries stop once the deadline is near.
+
+class HedgedEngine(OCREngine):
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    def __init__(self, engine, deadline=OCR_DEADLINE, hedge=OCR_HEDGE_ENABLED, latencies=None):
+        self.engine = engine
+        self.name = engine.name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.latencies = latencies or resilience.LatencyWindow()
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "timeouts": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls):
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=max(32, OCR_MAX_WORKERS * 4),
+                                                       thread_name_prefix="ocr-attempt")
+        return cls._executor
+
+    def hedge_delay(self):
+        """Seconds to wait for the first attempt before sending a second one."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return max(OCR_HEDGE_MIN_DELAY, OCR_HEDGE_DEFAULT_DELAY)
+        return max(OCR_HEDGE_MIN_DELAY, self.latencies.percentile(0.95))
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _attempt(self, fn, deadline, record):
+        start = time.monotonic()
+        result = resilience.call_before(deadline, fn)
+        if record:
+            self.latencies.add(time.monotonic() - start)
+        return result
+
+    def _call(self, fn, hedge, record=True):
+        self._count("calls")
+        executor = self.get_executor()
+        deadline = time.monotonic() + self.deadline
+        first = executor.submit(self._attempt, fn, deadline, record)
+        pending = {first}
+        hedge_at = time.monotonic() + self.hedge_delay() if hedge else None
+        error = None
+        while pending:
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            done, pending = wait(pending, timeout=max(0.0, wake - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+            if time.monotonic() >= deadline:
+                break
+            if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+                # Only hedge while the first attempt is still running
+                pending.add(executor.submit(self._attempt, fn, deadline, record))
+                hedge_at = None
+                self._count("hedged")
+        if not pending:
+            raise error
+        self._count("timeouts")
+        raise OCRTimeout(f"OCR did not finish within {self.deadline:g} s")
+
+    def annotate(self, content):
+        return self._call(lambda: self.engine.annotate(content), self.hedge)
+
+    def annotate_batch(self, contents):
+        # A batch is not hedged (it would cost the quota of every image again)
+        # and its latency says nothing about single calls
+        return self._call(lambda: self.engine.annotate_batch(contents), False, record=False)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        p50 = self.latencies.percentile(0.50)
+        p95 = self.latencies.percentile(0.95)
+        return {"deadline": self.deadline, "hedging": self.hedge,
+                "hedge_delay": round(self.hedge_delay(), 3),
+                "latency_p50": round(p50, 3) if p50 is not None else None,
+                "latency_p95": round(p95, 3) if p95 is not None else None,
+                **counts}
+
+
+# FUNCTION   : is_service_failure
+# DESCRIPTION: Tells whether an OCR error means the service is unhealthy (as
+#              opposed to a problem with one image or the quota)
+# PARAMETERS : error (Exception)
+# RETURNS    : bool
+
+def is_service_failure(error):
+    if isinstance(error, OCRTimeout) or quota.is_transient(error):
+        return True
+    return not isinstance(error, (OCRError, quota.QuotaExceeded, api_exceptions.ClientError))
+
+
+def _failed_response(response):
+    if isinstance(response, Exception):
+        return is_service_failure(response)
+    return quota.is_transient(response)
+
+
+# CLASS      : BreakerEngine
+# DESCRIPTION: Wraps an engine with a circuit breaker. While it is open calls
+#              raise CircuitOpen at once instead of waiting on a failing service.
+
+class BreakerEngine(OCREngine):
+
+    def __init__(self, engine, breaker=None):
+        self.engine = engine
+        self.name = engine.name
+        self.breaker = breaker or resilience.CircuitBreaker()
+
+    def _call(self, fn, failed):
+        if not self.breaker.allow():
+            raise CircuitOpen("The OCR service is not responding, please try again shortly")
+        try:
+            result = fn()
+        except quota.QuotaExceeded:
+            self.breaker.cancel()
+            raise
+        except Exception as e:
+            self.breaker.record(not is_service_failure(e))
+            raise
+        self.breaker.record(not failed(result))
+        return result
+
+    def annotate(self, content):
+        return self._call(lambda: self.engine.annotate(content), quota.is_transient)
+
+    def annotate_batch(self, contents):
+        # A batch counts as failed when no image in it got through
+        return self._call(lambda: self.engine.annotate_batch(contents),
+                          lambda responses: all(map(_failed_response, responses)))
+
+    def stats(self):
+        return self.breaker.stats()
+
+
+ENGINES = {
+    "vision": VisionEngine,
+    "replay": ReplayEngine,
+    "record": RecordEngine,
+    "fake": FakeEngine,
+}
+
+# Engines whose calls count against the Vision quota
+LIMITED_ENGINES = {"vision", "record", "fake"}
+
+_engine = None
+_fallback_engine = None
+_engine_lock = threading.Lock()
+
+
+# FUNCTION   : build_engine
+# DESCRIPTION: Creates an engine by name with the wrappers it needs: quota,
+#              deadline and hedging for engines that call Vision, plus the
+#              circuit breaker when asked for
+# PARAMETERS : name (str) - Key of ENGINES
+#              breaker (bool) - Wrap the engine in a BreakerEngine
+# RETURNS    : OCREngine instance
+
+def build_engine(name, breaker=False):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine: {name}")
+    engine = ENGINES[name]()
+    if name in LIMITED_ENGINES:
+        engine = HedgedEngine(LimitedEngine(engine))
+        if breaker:
+            engine = BreakerEngine(engine)
+    return engine
+
+
+# FUNCTION   : get_engine
+# DESCRIPTION: Returns the process-wide OCR engine selected by OCR_ENGINE
+# PARAMETERS : None
+# RETURNS    : OCREngine instance
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_engine(OCR_ENGINE, breaker=OCR_BREAKER_ENABLED)
+    return _engine
+
+
+# FUNCTION   : get_fallback_engine
+# DESCRIPTION: Returns the engine used while the main engine's breaker is open
+# PARAMETERS : None
+# RETURNS    : OCREngine instance, or None when OCR_FALLBACK_ENGINE is not set
+
+def get_fallback_engine():
+    global _fallback_engine
+    if not OCR_FALLBACK_ENGINE or OCR_FALLBACK_ENGINE == OCR_ENGINE:
+        return None
+    if _fallback_engine is None:
+        with _engine_lock:
+            if _fallback_engine is None:
+                _fallback_engine = build_engine(OCR_FALLBACK_ENGINE)
+    return _fallback_engine
+
+
+def _breaker_open():
+    engine = _engine
+    return int(isinstance(engine, BreakerEngine) and engine.breaker.state != resilience.CLOSED)
+
+
+metrics.Gauge("ocr_app_ocr_breaker_open", "1 while the OCR circuit breaker is open or half open",
+              function=_breaker_open)
+
+
+# FUNCTION   : engine_stats
+# DESCRIPTION: Collects the counters of an engine and every engine it wraps
+#              (breaker state, hedging and deadline figures, fake engine counts)
+# PARAMETERS : engine (OCREngine, optional) - Defaults to the active engine
+# RETURNS    : dict
+
+def engine_stats(engine=None):
+    engine = engine or get_engine()
+    totals = {"engine": engine.name}
+    while engine is not None:
+        if hasattr(engine, "stats"):
+            totals[type(engine).__name__] = engine.stats()
+        engine = getattr(engine, "engine", None)
+    fallback = get_fallback_engine()
+    totals["fallback"] = fallback.name if fallback else None
+    return totals
+
+
+# FUNCTION   : set_engine
+# DESCRIPTION: Replaces the process-wide OCR engine (used by benchmarks and tools)
+# PARAMETERS : engine (OCREngine) - Engine to install
+# RETURNS    : None
+
+def set_engine(engine):
+    global _engine
+    with _engine_lock:
+        _engine = engine
+
+
+if __name__ == "__main__":
+    # Record live responses for every image in the Test folder:
+    #   python ocr_engine.py Test/*.png
+    import sys
+
+    recorder = RecordEngine()
+    for path in sys.argv[1:]:
+        with open(path, "rb") as image_file:
+            recorder.annotate(image_file.read(), image_name=os.path.basename(path))
+        print(f"Recorded {path}")
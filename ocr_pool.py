@@ -0,0 +1,78 @@
+"""
+FILE       : ocr_pool.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-05
+DESCRIPTION:
+This module provides the bounded worker pool used to OCR several uploaded
+files at once. One thread pool is shared by every request in the process
+(OCR_MAX_WORKERS threads) and each request may only keep OCR_REQUEST_CONCURRENCY
+of its files in flight, so one large upload cannot take over the whole pool.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import OCR_MAX_WORKERS, OCR_REQUEST_CONCURRENCY
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_END = object()
+
+
+# FUNCTION   : get_executor
+# DESCRIPTION: Returns the process-wide OCR thread pool, creating it on first use
+#              (and again in a forked worker, since threads do not survive a fork)
+# PARAMETERS : None
+# RETURNS    : ThreadPoolExecutor
+
+def get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=OCR_MAX_WORKERS,
+                                               thread_name_prefix="ocr")
+                _executor_pid = pid
+    return _executor
+
+
+# FUNCTION   : run_ordered
+# DESCRIPTION: Applies fn to every item on the shared pool with at most `limit`
+#              calls in flight, and returns the results in the order of items.
+#              Items are taken from the iterable only when a slot is free, so a
+#              generator (e.g. the pages of a document) is never read ahead.
+# PARAMETERS : fn (callable)    - Function applied to each item
+#              items (iterable) - Items to process
+#              limit (int)      - Maximum concurrent calls for this request
+# RETURNS    : list - fn(item) for each item, in input order
+
+def run_ordered(fn, items, limit=OCR_REQUEST_CONCURRENCY):
+    if limit <= 1:
+        return [fn(item) for item in items]
+
+    executor = get_executor()
+    items = iter(items)
+    results = []
+    pending = {}
+    exhausted = False
+
+    while not exhausted or pending:
+        # Keep the window full, then wait for any call to finish
+        while not exhausted and len(pending) < limit:
+            item = next(items, _END)
+            if item is _END:
+                exhausted = True
+                break
+            pending[executor.submit(fn, item)] = len(results)
+            results.append(None)
+        if not pending:
+            break
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+
+    return results
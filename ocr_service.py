@@ -0,0 +1,309 @@
+"""
+FILE       : ocr_service.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-05
+DESCRIPTION:
+This module runs the OCR pipeline for an upload: each file is saved to the
+upload folder (in a single pass while it is received, see uploads.py), its text
+is extracted and whitespace is normalised. PDF and TIFF documents are split into
+pages as they are consumed (see documents.py). Images are processed in one of
+three ways: batched Vision requests (OCR_BATCH_MODE), a bounded concurrent pool
+(OCR_REQUEST_CONCURRENCY > 1) or one after another.
+Before OCR, a file that is a near-duplicate of one of the user's previous
+uploads reuses that upload's text. Results always come back in upload order
+and are written to the history table by record_results.
+"""
+
+import os
+import itertools
+from werkzeug.utils import secure_filename
+from config import (UPLOAD_FOLDER, OCR_BATCH_MODE, OCR_REQUEST_CONCURRENCY, NEAR_DUPLICATE_REUSE,
+                    VISION_BATCH_SIZE)
+from vision_api import extract_from_bytes, extract_batch_from_bytes
+from ocr_pool import run_ordered
+from uploads import UploadSpool, UploadedImage, stored_filename
+import near_duplicate
+import documents
+import layout
+import metrics
+from quota import QuotaExceeded
+from db import get_db_connection
+
+
+# FUNCTION   : format_text
+# DESCRIPTION: Collapses the line breaks and repeated whitespace in OCR output
+# PARAMETERS : text (str) - Raw OCR text
+# RETURNS    : str - Single-line text
+
+def format_text(text):
+    return ' '.join(text.split()).replace('. ', '. ')
+
+
+# FUNCTION   : store_upload
+# DESCRIPTION: Saves an uploaded file to the upload folder under a unique name.
+#              Files received through an UploadSpool are already written and
+#              only need to be moved to their final name.
+# PARAMETERS : file (FileStorage) - Uploaded file
+# RETURNS    : tuple - (saved filename, original filename for display)
+
+def store_upload(file):
+    if isinstance(file.stream, UploadSpool):
+        return file.stream.finish(), file.stream.name
+    filename = stored_filename(file.filename)
+    file.save(os.path.join(UPLOAD_FOLDER, filename))
+    return filename, secure_filename(file.filename)
+
+
+# FUNCTION   : load_upload
+# DESCRIPTION: Refers to a saved upload; its bytes are read from the upload
+#              folder when OCR needs them
+# PARAMETERS : filename (str) - Saved filename
+#              name (str, optional) - Original filename for display
+# RETURNS    : UploadedImage
+
+def load_upload(filename, name=None):
+    return UploadedImage(filename, name=name)
+
+
+# FUNCTION   : save_upload
+# DESCRIPTION: Saves an uploaded file and returns it for OCR, with the bytes
+#              kept while it was received when there are any
+# PARAMETERS : file (FileStorage) - Uploaded file
+# RETURNS    : UploadedImage
+
+def save_upload(file):
+    if isinstance(file.stream, UploadSpool):
+        return file.stream.image()
+    return load_upload(*store_upload(file))
+
+
+# FUNCTION   : check_duplicate
+# DESCRIPTION: Hashes an upload and looks for a near-duplicate in the user's
+#              history. The returned result already holds the reused text when
+#              one is found.
+# PARAMETERS : image (UploadedImage), user_id (int or None)
+# RETURNS    : dict - Partial result with "image" (saved filename), "filename"
+#              (original name) and "phash" (and "text" and "duplicate_of" when
+#              the previous text is reused, and "document", "document_id" and
+#              "page" for a page of a document). A document that could not be
+#              read comes back as a failed result, with "text" and "error".
+
+def check_duplicate(image, user_id):
+    if image.error:
+        return {"image": image.filename, "filename": image.name, "text": "", "error": image.error}
+    result = {"image": image.filename, "filename": image.name,
+              "phash": near_duplicate.dhash(image.content)}
+    if image.page is not None:
+        result.update(document=image.document, document_id=image.document_id, page=image.page)
+    if not NEAR_DUPLICATE_REUSE or user_id is None:
+        return result
+
+    try:
+        duplicate = near_duplicate.find_duplicate(user_id, result["phash"], image.content)
+    except Exception as e:
+        print(f"Near-duplicate lookup failed: {e}")
+        duplicate = None
+    if duplicate:
+        result["text"] = duplicate["text"]
+        result["duplicate_of"] = duplicate
+    return result
+
+
+# FUNCTION   : ocr_image
+# DESCRIPTION: Runs near-duplicate check -> extract_text -> format for one image
+# PARAMETERS : image (UploadedImage) - Saved upload; its bytes are released
+#                                     once it has been OCR'd
+#              user_id (int)        - Owner of the upload
+# RETURNS    : dict - {"image", "text", "phash", "layout"} plus "error" when OCR
+#              failed and "duplicate_of" when a previous result was reused
+
+def ocr_image(image, user_id=None):
+    try:
+        result = check_duplicate(image, user_id)
+        if "duplicate_of" in result or "error" in result:
+            return result
+        try:
+            text, result["layout"] = extract_from_bytes(image.content, image.digest)
+            result["text"] = format_text(text)
+        except QuotaExceeded:
+            # Not a problem with this image; the caller decides whether to wait
+            raise
+        except Exception as e:
+            result["text"] = ""
+            result["error"] = str(e)
+        return result
+    finally:
+        image.release()
+
+
+# FUNCTION   : process_images
+# DESCRIPTION: OCRs a list of saved images using the configured mode
+# PARAMETERS : images (list of UploadedImage) - Saved uploads, in upload order
+#              user_id (int)           - Owner of the upload
+#              concurrency (int)       - Images in flight for this call
+# RETURNS    : list of result dicts, in upload order
+
+def process_images(images, user_id=None, concurrency=OCR_REQUEST_CONCURRENCY):
+    # Batch mode sends the whole upload to Vision in as few requests as
+    # possible; each image still gets its own text or error.
+    if OCR_BATCH_MODE and len(images) > 1:
+        try:
+            results = [check_duplicate(image, user_id) for image in images]
+            pending = [i for i, result in enumerate(results)
+                       if "duplicate_of" not in result and "error" not in result]
+            ocr_results = extract_batch_from_bytes([images[i].content for i in pending],
+                                                   [images[i].digest for i in pending])
+        finally:
+            for image in images:
+                image.release()
+        for i, (extracted_text, packed, error) in zip(pending, ocr_results):
+            if error:
+                results[i]["text"] = ""
+                results[i]["error"] = error
+            else:
+                results[i]["text"] = format_text(extracted_text)
+                results[i]["layout"] = packed
+        return results
+
+    return run_ordered(lambda image: ocr_image(image, user_id), images, limit=concurrency)
+
+
+# FUNCTION   : batches
+# DESCRIPTION: Groups a stream of images into lists of at most `size`, reading
+#              the stream only as far as the current batch
+# PARAMETERS : images (iterable), size (int)
+# RETURNS    : generator of lists
+
+def batches(images, size=VISION_BATCH_SIZE):
+    images = iter(images)
+    return iter(lambda: list(itertools.islice(images, size)), [])
+
+
+# FUNCTION   : process_stream
+# DESCRIPTION: OCRs saved uploads, splitting documents into pages on the way.
+#              Only one batch (batch mode) or `concurrency` pages (pool mode)
+#              are held at a time, however many pages a document has.
+# PARAMETERS : images (iterable of UploadedImage) - Saved uploads, in order
+#              user_id (int)     - Owner of the upload
+#              concurrency (int) - Images in flight for this call
+# RETURNS    : list of result dicts, in upload and page order
+
+def process_stream(images, user_id=None, concurrency=OCR_REQUEST_CONCURRENCY):
+    pages = documents.expand(images)
+    if OCR_BATCH_MODE:
+        results = []
+        for batch in batches(pages):
+            results.extend(process_images(batch, user_id, concurrency))
+        return results
+    return run_ordered(lambda image: ocr_image(image, user_id), pages, limit=concurrency)
+
+
+# FUNCTION   : process_uploads
+# DESCRIPTION: Saves and OCRs the files of an upload request
+# PARAMETERS : files (list of FileStorage) - Allowed uploaded files, in order
+#              user_id (int)               - Owner of the upload
+#              concurrency (int)           - Images in flight for this request
+# RETURNS    : list of result dicts, in upload and page order
+
+def process_uploads(files, user_id=None, concurrency=OCR_REQUEST_CONCURRENCY):
+    # Files are already written while the request is received, so saving
+    # only moves each one to its final name as the stream reaches it
+    return process_stream((save_upload(file) for file in files), user_id, concurrency)
+
+
+# FUNCTION   : record_results
+# DESCRIPTION: Writes the successful results of an upload to the history table
+#              in upload order, on one connection, and logs each file. Each
+#              document gets a row in the documents table and its pages are
+#              linked to it with their page numbers. Layouts are moved out of
+#              the results into the ocr_layouts table.
+# PARAMETERS : user_id (int)          - Owner of the upload
+#              results (list of dict) - Results from process_images
+#              log_activity (callable) - log_user_activity(user_id, activity, details)
+# RETURNS    : None
+
+def record_results(user_id, results, log_activity):
+    conn = get_db_connection()
+    c = conn.cursor()
+    page_counts = {}
+    for result in results:
+        if result.get("document_id"):
+            key = (result["document_id"], result["document"])
+            page_counts[key] = page_counts.get(key, 0) + 1
+    for (document_id, document), pages in page_counts.items():
+        c.execute("INSERT INTO documents (id, user_id, filename, pages) VALUES (%s, %s, %s, %s)",
+                  (document_id, user_id, document, pages))
+
+    inserted = []
+    for result in results:
+        filename = result.get("filename", result["image"])
+        packed = result.pop("layout", None)
+        if result.get("error"):
+            log_activity(user_id, "OCR Failed", f"File: {filename}, Error: {result['error']}")
+            continue
+        phash = result.get("phash")
+        with metrics.stage("history_insert"):
+            c.execute("""
+                INSERT INTO history (user_id, image, filename, text, phash, document_id, page)
+                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id
+            """, (user_id, result["image"], filename, result["text"],
+                  near_duplicate.to_signed(phash) if phash is not None else None,
+                  result.get("document_id"), result.get("page")))
+            history_id = c.fetchone()[0]
+        # Lets the result page offer to OCR a reused result again
+        result["history_id"] = history_id
+        inserted.append((history_id, phash))
+        if packed:
+            layout.save(c, history_id, packed)
+        elif result.get("duplicate_of"):
+            layout.copy(c, history_id, result["duplicate_of"]["history_id"])
+
+        # Log this activity
+        if result.get("duplicate_of"):
+            log_activity(user_id, "OCR Reused", f"File: {filename}, Previous: {result['duplicate_of']['filename']}")
+        else:
+            log_activity(user_id, "OCR Performed", f"File: {filename}")
+    with metrics.stage("history_commit"):
+        conn.commit()
+    conn.close()
+
+    for history_id, phash in inserted:
+        near_duplicate.add(user_id, history_id, phash)
+
+
+# FUNCTION   : rerun_ocr
+# DESCRIPTION: OCRs one of the user's history rows again from its saved upload,
+#              without the near-duplicate check, and replaces its text and
+#              layout (for a result that reused the text of another upload)
+# PARAMETERS : user_id (int), history_id (int)
+# RETURNS    : str - The new text, or None when the row or its saved upload
+#              does not exist. Rows saved before uploads had unique names
+#              (no filename) are refused, as a later upload of the same name
+#              may have replaced their file. Raises QuotaExceeded and the OCR
+#              engine's errors.
+
+def rerun_ocr(user_id, history_id):
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SELECT image FROM history WHERE id=%s AND user_id=%s AND filename IS NOT NULL",
+                  (history_id, user_id))
+        row = c.fetchone()
+        if row is None or not os.path.exists(os.path.join(UPLOAD_FOLDER, row[0])):
+            return None
+        image = load_upload(row[0])
+        try:
+            text, packed = extract_from_bytes(image.content, image.digest)
+        finally:
+            image.release()
+        text = format_text(text)
+        c.execute("UPDATE history SET text=%s WHERE id=%s", (text, history_id))
+        c.execute("DELETE FROM ocr_layouts WHERE history_id=%s", (history_id,))
+        if packed:
+            layout.save(c, history_id, packed)
+        conn.commit()
+        return text
+    finally:
+        conn.close()
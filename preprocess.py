@@ -0,0 +1,187 @@
+"""
+FILE       : preprocess.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-14
+DESCRIPTION:
+This module shrinks uploaded images before they are sent for OCR. Phone photos
+are often 8-12 MB, far more than Vision needs to read handwriting. Each step is
+configurable in config.py: EXIF orientation is applied, the image is scaled so
+its longest side is at most PREPROCESS_MAX_SIDE, converted to grayscale, blank
+margins are cropped and the result is re-encoded. Images smaller than
+PREPROCESS_MIN_BYTES are sent unchanged, as is any image the stage cannot make
+smaller. Bytes saved and time spent are counted for every image, and the scale
+and crop offset are returned so OCR coordinates can be mapped back to the
+uploaded image.
+"""
+
+import io
+import time
+import threading
+from PIL import Image, ImageOps
+from config import (PREPROCESS_ENABLED, PREPROCESS_MIN_BYTES, PREPROCESS_MAX_SIDE,
+                    PREPROCESS_GRAYSCALE, PREPROCESS_CROP_MARGINS, PREPROCESS_FORMAT,
+                    PREPROCESS_QUALITY)
+
+# Pixels darker than this (0-255) count as ink when looking for blank margins
+INK_THRESHOLD = 160
+
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION = 0x0112
+
+# Padding kept around the cropped content, as a fraction of each side
+CROP_PADDING = 0.02
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "processed": 0, "failed": 0,
+          "original_bytes": 0, "output_bytes": 0, "seconds": 0.0}
+
+
+# FUNCTION   : signature
+# DESCRIPTION: Describes the active settings. Included in the OCR cache key so
+#              results are not shared between different pre-processing setups.
+# PARAMETERS : None
+# RETURNS    : str
+
+def signature():
+    if not PREPROCESS_ENABLED:
+        return "raw"
+    return (f"pre{PREPROCESS_MIN_BYTES}-{PREPROCESS_MAX_SIDE}-{int(PREPROCESS_GRAYSCALE)}"
+            f"-{int(PREPROCESS_CROP_MARGINS)}-{PREPROCESS_FORMAT}{PREPROCESS_QUALITY}")
+
+
+# FUNCTION   : flatten
+# DESCRIPTION: Converts an image to grayscale or RGB, painting transparent areas
+#              white so they do not turn black
+# PARAMETERS : image (PIL.Image), grayscale (bool)
+# RETURNS    : PIL.Image in mode "L" or "RGB"
+
+def flatten(image, grayscale):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    return image.convert("L" if grayscale else "RGB")
+
+
+# FUNCTION   : content_box
+# DESCRIPTION: Finds the bounding box of the ink on a page, with a little
+#              padding. Works on a small copy of the image for speed.
+# PARAMETERS : image (PIL.Image)
+# RETURNS    : tuple (left, upper, right, lower) or None when the page is blank
+
+def content_box(image):
+    gray = image if image.mode == "L" else image.convert("L")
+    small = gray.copy()
+    small.thumbnail((512, 512))
+    mask = small.point(lambda p: 255 if p < INK_THRESHOLD else 0)
+    box = mask.getbbox()
+    if box is None:
+        return None
+
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+    pad_x = int(image.width * CROP_PADDING)
+    pad_y = int(image.height * CROP_PADDING)
+    return (max(0, int(box[0] * scale_x) - pad_x),
+            max(0, int(box[1] * scale_y) - pad_y),
+            min(image.width, int(box[2] * scale_x) + pad_x),
+            min(image.height, int(box[3] * scale_y) + pad_y))
+
+
+# FUNCTION   : preprocess
+# DESCRIPTION: Runs the configured pre-processing steps on an image
+# PARAMETERS : content (bytes)  - Raw image bytes
+#              min_bytes (int)  - Images smaller than this are left unchanged
+# RETURNS    : tuple - (bytes to send for OCR, stats dict). stats["transform"]
+#              is (scale_x, scale_y, offset_x, offset_y) taking coordinates
+#              in the returned image to the upright uploaded image, or None
+#              when the image was sent unchanged.
+
+def preprocess(content, min_bytes=PREPROCESS_MIN_BYTES):
+    start = time.perf_counter()
+    stats = {"original_bytes": len(content), "output_bytes": len(content),
+             "processed": False, "seconds": 0.0, "transform": None}
+    if not PREPROCESS_ENABLED or len(content) < min_bytes:
+        return content, stats
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            # Full size of the upright image, before draft() shrinks it
+            width, height = image.size
+            if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            if PREPROCESS_MAX_SIDE:
+                # JPEGs can be decoded at reduced scale, which is much faster
+                # than decoding at full size and resizing afterwards
+                image.draft("L" if PREPROCESS_GRAYSCALE else "RGB",
+                            (PREPROCESS_MAX_SIDE, PREPROCESS_MAX_SIDE))
+            image = ImageOps.exif_transpose(image)
+            image = flatten(image, PREPROCESS_GRAYSCALE)
+        if PREPROCESS_MAX_SIDE:
+            image.thumbnail((PREPROCESS_MAX_SIDE, PREPROCESS_MAX_SIDE), Image.LANCZOS)
+        scale_x = width / image.width
+        scale_y = height / image.height
+        left = top = 0
+        if PREPROCESS_CROP_MARGINS:
+            box = content_box(image)
+            if box:
+                image = image.crop(box)
+                left, top = box[0], box[1]
+
+        output = io.BytesIO()
+        if PREPROCESS_FORMAT == "JPEG":
+            image.save(output, format="JPEG", quality=PREPROCESS_QUALITY, optimize=True)
+        else:
+            image.save(output, format=PREPROCESS_FORMAT, optimize=True)
+        processed = output.getvalue()
+    except Exception as e:
+        print(f"Image pre-processing failed: {e}")
+        _record(stats, start, failed=True)
+        return content, stats
+
+    if len(processed) < len(content):
+        content = processed
+        stats["output_bytes"] = len(processed)
+        stats["processed"] = True
+        stats["transform"] = (scale_x, scale_y, left * scale_x, top * scale_y)
+    _record(stats, start)
+    return content, stats
+
+
+def _record(stats, start, failed=False):
+    stats["seconds"] = time.perf_counter() - start
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["processed"] += 1 if stats["processed"] else 0
+        _stats["failed"] += 1 if failed else 0
+        _stats["original_bytes"] += stats["original_bytes"]
+        _stats["output_bytes"] += stats["output_bytes"]
+        _stats["seconds"] += stats["seconds"]
+
+
+# FUNCTION   : prepare_for_ocr
+# DESCRIPTION: Returns the pre-processed bytes and their coordinate transform
+#              (used as the OCR cache's prepare step)
+# PARAMETERS : content (bytes) - Raw image bytes
+# RETURNS    : tuple - (bytes, transform or None)
+
+def prepare_for_ocr(content):
+    output, image_stats = preprocess(content)
+    return output, image_stats["transform"]
+
+
+# FUNCTION   : stats
+# DESCRIPTION: Returns totals for every image that went through the stage
+# PARAMETERS : None
+# RETURNS    : dict with image counts, bytes in/out, bytes saved and time spent
+
+def stats():
+    with _stats_lock:
+        totals = dict(_stats)
+    totals["bytes_saved"] = totals["original_bytes"] - totals["output_bytes"]
+    totals["seconds"] = round(totals["seconds"], 4)
+    totals["enabled"] = PREPROCESS_ENABLED
+    totals["signature"] = signature()
+    return totals
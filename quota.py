@@ -0,0 +1,279 @@
+"""
+FILE       : quota.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-26
+DESCRIPTION:
+This module keeps OCR calls within the Vision quota. A token bucket allows
+VISION_REQUESTS_PER_MINUTE images per minute (with bursts up to that many) and
+a daily budget caps the images sent per UTC day. Two backends are available:
+  - memory   : the bucket is shared by the threads of this process.
+  - postgres : the bucket is a row in the rate_limits table, updated under a
+               row lock, so every worker process and instance shares it.
+A caller that finds the bucket empty waits for tokens, up to VISION_QUOTA_WAIT
+seconds, and then gets QuotaExceeded with the time until the budget frees up.
+Transient errors (quota and 5xx) are retried with jittered exponential backoff,
+but never past the deadline of the call (see resilience.py).
+"""
+
+import time
+import random
+import datetime
+import threading
+from google.api_core import exceptions as api_exceptions
+from db import get_db_connection
+import resilience
+from config import (VISION_RATE_LIMIT, VISION_REQUESTS_PER_MINUTE, VISION_DAILY_BUDGET,
+                    VISION_QUOTA_WAIT, VISION_RETRY_ATTEMPTS, VISION_RETRY_BASE_DELAY,
+                    VISION_RETRY_MAX_DELAY)
+
+BUCKET_NAME = "vision"
+
+# Status codes (google.rpc.Code) that Vision reports per image for errors
+# worth retrying: DEADLINE_EXCEEDED, RESOURCE_EXHAUSTED, INTERNAL, UNAVAILABLE
+TRANSIENT_STATUS_CODES = {4, 8, 13, 14}
+
+# 429 and every 5xx raised by the client library
+TRANSIENT_ERRORS = (api_exceptions.TooManyRequests, api_exceptions.ServerError)
+
+
+class QuotaExceeded(Exception):
+    """Raised when the OCR budget is used up for longer than a caller can wait."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _seconds_to_midnight():
+    now = datetime.datetime.now(datetime.timezone.utc)
+    midnight = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+
+# FUNCTION   : take_tokens
+# DESCRIPTION: Token bucket arithmetic shared by both backends
+# PARAMETERS : tokens (float)   - Tokens in the bucket at the last update
+#              elapsed (float)  - Seconds since the last update
+#              day_used (int)   - Images already sent today
+#              cost (int)       - Images wanted now
+# RETURNS    : tuple - (granted, tokens, day_used, wait). When granted the new
+#              state is returned; otherwise wait is the seconds until it can be.
+
+def take_tokens(tokens, elapsed, day_used, cost):
+    rate = VISION_REQUESTS_PER_MINUTE / 60.0
+    tokens = min(float(VISION_REQUESTS_PER_MINUTE), tokens + elapsed * rate)
+    if VISION_DAILY_BUDGET and day_used + cost > VISION_DAILY_BUDGET:
+        return False, tokens, day_used, _seconds_to_midnight()
+    # A request bigger than the bucket is let through once the bucket is full
+    needed = min(cost, VISION_REQUESTS_PER_MINUTE)
+    if tokens < needed:
+        return False, tokens, day_used, (needed - tokens) / rate
+    return True, tokens - cost, day_used + cost, 0.0
+
+
+# CLASS      : MemoryLimiter
+# DESCRIPTION: Token bucket and daily counter held in this process
+
+class MemoryLimiter:
+    name = "memory"
+
+    def __init__(self):
+        self._tokens = float(VISION_REQUESTS_PER_MINUTE)
+        self._updated = time.monotonic()
+        self._day = datetime.datetime.now(datetime.timezone.utc).date()
+        self._day_used = 0
+        self._lock = threading.Lock()
+
+    def try_take(self, cost):
+        """Take cost tokens if available. Returns the seconds to wait otherwise (0 on success)."""
+        with self._lock:
+            now = time.monotonic()
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            if today != self._day:
+                self._day, self._day_used = today, 0
+            granted, tokens, day_used, wait = take_tokens(
+                self._tokens, now - self._updated, self._day_used, cost)
+            self._tokens, self._updated = tokens, now
+            if granted:
+                self._day_used = day_used
+            return wait
+
+    def state(self):
+        with self._lock:
+            _, tokens, _, _ = take_tokens(self._tokens, time.monotonic() - self._updated, 0, 0)
+            return tokens, self._day_used
+
+
+# CLASS      : PostgresLimiter
+# DESCRIPTION: Token bucket and daily counter stored in the rate_limits table
+
+class PostgresLimiter:
+    name = "postgres"
+
+    def _locked_row(self, c):
+        c.execute("""
+            INSERT INTO rate_limits (name, tokens, updated_at, day, day_used)
+            VALUES (%s, %s, NOW(), (NOW() AT TIME ZONE 'UTC')::date, 0)
+            ON CONFLICT (name) DO NOTHING
+        """, (BUCKET_NAME, float(VISION_REQUESTS_PER_MINUTE)))
+        c.execute("""
+            SELECT tokens, EXTRACT(EPOCH FROM NOW() - updated_at),
+                   CASE WHEN day = (NOW() AT TIME ZONE 'UTC')::date THEN day_used ELSE 0 END
+            FROM rate_limits WHERE name = %s FOR UPDATE
+        """, (BUCKET_NAME,))
+        tokens, elapsed, day_used = c.fetchone()
+        return float(tokens), max(0.0, float(elapsed)), int(day_used)
+
+    def try_take(self, cost):
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            granted, tokens, day_used, wait = take_tokens(*self._locked_row(c), cost)
+            if granted:
+                c.execute("""
+                    UPDATE rate_limits SET tokens = %s, updated_at = NOW(),
+                        day = (NOW() AT TIME ZONE 'UTC')::date, day_used = %s
+                    WHERE name = %s
+                """, (tokens, day_used, BUCKET_NAME))
+            conn.commit()
+            return wait
+        finally:
+            conn.close()
+
+    def state(self):
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            tokens, elapsed, day_used = self._locked_row(c)
+            conn.commit()
+        finally:
+            conn.close()
+        _, tokens, _, _ = take_tokens(tokens, elapsed, 0, 0)
+        return tokens, day_used
+
+
+LIMITERS = {
+    "memory": MemoryLimiter,
+    "postgres": PostgresLimiter,
+}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+# FUNCTION   : get_limiter
+# DESCRIPTION: Returns the process-wide limiter selected by VISION_RATE_LIMIT
+# PARAMETERS : None
+# RETURNS    : MemoryLimiter, PostgresLimiter or None when limiting is off
+
+def get_limiter():
+    global _limiter
+    if VISION_RATE_LIMIT not in LIMITERS:
+        return None
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = LIMITERS[VISION_RATE_LIMIT]()
+    return _limiter
+
+
+# FUNCTION   : acquire
+# DESCRIPTION: Takes `cost` images from the budget, waiting for the bucket to
+#              refill when it is empty
+# PARAMETERS : cost (int)          - Images about to be sent
+#              max_wait (float)    - Longest time to wait, in seconds
+# RETURNS    : None; raises QuotaExceeded when the budget does not free up in time
+
+def acquire(cost=1, max_wait=VISION_QUOTA_WAIT):
+    limiter = get_limiter()
+    if limiter is None:
+        return
+    deadline = time.monotonic() + max_wait
+    while True:
+        wait = limiter.try_take(cost)
+        if wait <= 0:
+            return
+        remaining = deadline - time.monotonic()
+        if wait > remaining:
+            raise QuotaExceeded(f"OCR quota exhausted, retry in {int(wait) + 1} s", wait)
+        time.sleep(wait)
+
+
+# FUNCTION   : is_transient
+# DESCRIPTION: Tells whether an OCR failure is worth retrying
+# PARAMETERS : error (Exception) or response (AnnotateImageResponse)
+# RETURNS    : bool
+
+def is_transient(error):
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "error", None)
+    return status is not None and status.code in TRANSIENT_STATUS_CODES
+
+
+# FUNCTION   : backoff_delay
+# DESCRIPTION: Full-jitter exponential backoff: a random delay between 0 and
+#              base * 2^attempt, capped at VISION_RETRY_MAX_DELAY
+# PARAMETERS : attempt (int) - Retries made so far
+# RETURNS    : float - Seconds to sleep
+
+def backoff_delay(attempt):
+    return random.uniform(0, min(VISION_RETRY_MAX_DELAY, VISION_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+# FUNCTION   : call_with_retry
+# DESCRIPTION: Takes budget for `cost` images and calls fn, retrying transient
+#              errors (raised, or reported in the returned response) with
+#              jittered backoff. Every attempt is charged to the budget. Within
+#              a call that has a deadline, waits for budget and retries stop
+#              where they would run past it.
+# PARAMETERS : fn (callable) - Makes the OCR call
+#              cost (int)    - Images sent by one call
+#              attempts (int) - Total attempts
+# RETURNS    : Whatever fn returns (the last response if every attempt failed)
+
+def call_with_retry(fn, cost=1, attempts=VISION_RETRY_ATTEMPTS):
+    for attempt in range(attempts):
+        left = resilience.time_left()
+        acquire(cost, VISION_QUOTA_WAIT if left is None else max(0.0, min(VISION_QUOTA_WAIT, left)))
+        delay = backoff_delay(attempt)
+        try:
+            result = fn()
+        except Exception as e:
+            if _last_attempt(attempt, attempts, delay) or not is_transient(e):
+                raise
+            print(f"Transient OCR error, retrying: {e}")
+        else:
+            if _last_attempt(attempt, attempts, delay) or not is_transient(result):
+                return result
+            print(f"Transient OCR error, retrying: {result.error.message}")
+        time.sleep(delay)
+
+
+def _last_attempt(attempt, attempts, delay):
+    left = resilience.time_left()
+    return attempt == attempts - 1 or (left is not None and delay >= left)
+
+
+# FUNCTION   : remaining
+# DESCRIPTION: Reports how much of the budget is left
+# PARAMETERS : None
+# RETURNS    : dict
+
+def remaining():
+    limiter = get_limiter()
+    if limiter is None:
+        return {"enabled": False}
+    tokens, day_used = limiter.state()
+    return {
+        "enabled": True,
+        "backend": limiter.name,
+        "per_minute_limit": VISION_REQUESTS_PER_MINUTE,
+        "tokens": round(tokens, 2),
+        "daily_budget": VISION_DAILY_BUDGET or None,
+        "daily_used": day_used,
+        "daily_remaining": max(0, VISION_DAILY_BUDGET - day_used) if VISION_DAILY_BUDGET else None,
+        "day_resets_in": int(_seconds_to_midnight()),
+    }
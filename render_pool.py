@@ -0,0 +1,209 @@
+"""
+FILE       : render_pool.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-01
+DESCRIPTION:
+This module runs CPU-heavy document rendering (python-docx and reportlab) in a
+pool of RENDER_POOL_WORKERS worker processes, so a long PDF neither blocks the
+request thread's gunicorn worker nor holds the GIL the other threads of that
+worker need. The workers are started with "spawn" and import the rendering
+libraries once when they start, so a job does not pay for the imports. At most
+RENDER_QUEUE_LIMIT jobs may be queued or running; more are refused with
+RenderBusy rather than left waiting. A job not done after RENDER_TIMEOUT
+seconds raises RenderTimeout. New jobs then go to a fresh pool, and the old
+pool's processes are ended once its other jobs have finished, so a stuck render
+does not keep its process and does not take other requests' jobs down with it.
+A job lost because a worker died is run once more on a fresh pool. With
+RENDER_POOL_WORKERS=0 jobs run inline.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import (ProcessPoolExecutor, CancelledError, TimeoutError as FutureTimeout,
+                                wait)
+from concurrent.futures.process import BrokenProcessPool
+import metrics
+from config import RENDER_POOL_WORKERS, RENDER_QUEUE_LIMIT, RENDER_TIMEOUT
+
+
+class RenderBusy(Exception):
+    """Raised when RENDER_QUEUE_LIMIT render jobs are already waiting or running,
+    or when a job was lost twice to a worker that died."""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render job does not finish within its timeout."""
+
+
+def _warm():
+    # Runs once in every worker process: load python-docx and reportlab now
+    import exports  # noqa: F401
+
+
+# CLASS      : RenderPool
+# DESCRIPTION: Process pool for render jobs with a queue-depth limit and a
+#              per-job timeout. Jobs are top-level functions and their
+#              arguments, which are pickled to the worker.
+
+class RenderPool:
+
+    def __init__(self, workers=RENDER_POOL_WORKERS, max_queue=RENDER_QUEUE_LIMIT,
+                 timeout=RENDER_TIMEOUT):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.counts = {"jobs": 0, "rejected": 0, "timeouts": 0, "errors": 0, "restarts": 0}
+        self._executor = None
+        self._executor_pid = None
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # Caller holds the lock. A forked gunicorn worker starts its own pool.
+        pid = os.getpid()
+        if self._executor_pid != pid:
+            self._executor = None
+            self._depth = 0
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_warm)
+            self._executor.jobs = set()
+            self._executor_pid = pid
+        return self._executor
+
+    def _replace(self, executor):
+        # Sends new jobs to a fresh pool. Jobs already on this one keep running.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.counts["restarts"] += 1
+        executor.shutdown(wait=False)
+
+    def _retire(self, executor, stuck):
+        # Replaces a pool with a stuck job, ending its processes once the
+        # other jobs on it are done (each within its own timeout)
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        with self._lock:
+            others = [future for future in executor.jobs if future is not stuck]
+        self._replace(executor)
+        threading.Thread(target=self._reap, args=(processes, others), daemon=True,
+                         name="render-pool-reaper").start()
+
+    def _reap(self, processes, others):
+        wait(others, timeout=self.timeout)
+        # shutdown() cannot stop a job that is running; end the processes themselves
+        for process in processes:
+            process.terminate()
+
+    def _done(self, future):
+        with self._lock:
+            self._depth -= 1
+            if future is not None:
+                future.executor.jobs.discard(future)
+
+    def depth(self):
+        """Jobs waiting or running."""
+        with self._lock:
+            return self._depth
+
+    def submit(self, fn, *args, limit=True, retry=True):
+        """Queue fn(*args) on the pool and return its Future.
+
+        With limit=False the job is accepted even when the queue is full
+        (for callers that bound their own number of jobs in flight).
+        """
+        with self._lock:
+            if limit and self._depth >= self.max_queue:
+                self.counts["rejected"] += 1
+                metrics.RENDER_JOBS.inc(outcome="rejected")
+                raise RenderBusy(f"{self._depth} documents are already being rendered")
+            executor = self._get_executor()
+            self._depth += 1
+            self.counts["jobs"] += 1
+        try:
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # A worker died (or the pool was just replaced): try once on a fresh pool
+            self._done(None)
+            self._replace(executor)
+            if not retry:
+                raise RenderBusy("The render pool is restarting") from e
+            return self.submit(fn, *args, limit=limit, retry=False)
+        future.executor = executor
+        future.job = (fn, args, limit)
+        with self._lock:
+            executor.jobs.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def result(self, future, timeout=None, retry=True):
+        """Wait for a job submitted with submit().
+
+        A job lost to a worker that died is submitted once more; if that is
+        lost too, RenderBusy is raised.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self.counts["timeouts"] += 1
+            metrics.RENDER_JOBS.inc(outcome="timeout")
+            self._retire(future.executor, future)
+            raise RenderTimeout(f"Rendering took longer than {timeout:g} seconds")
+        except (BrokenProcessPool, CancelledError) as e:
+            with self._lock:
+                self.counts["errors"] += 1
+            metrics.RENDER_JOBS.inc(outcome="error")
+            self._replace(future.executor)
+            if not retry:
+                raise RenderBusy("The document could not be rendered, the render pool was restarted") from e
+            fn, args, limit = future.job
+            return self.result(self.submit(fn, *args, limit=limit), timeout, retry=False)
+        except Exception:
+            with self._lock:
+                self.counts["errors"] += 1
+            metrics.RENDER_JOBS.inc(outcome="error")
+            raise
+        metrics.RENDER_JOBS.inc(outcome="ok")
+        return result
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool (inline without workers) and return its result."""
+        if self.workers <= 0:
+            with metrics.RENDER_SECONDS.time(mode="inline"):
+                return fn(*args)
+        with metrics.RENDER_SECONDS.time(mode="pool"):
+            return self.result(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "queue_limit": self.max_queue, "timeout": self.timeout,
+                    "depth": self._depth, **self.counts}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# FUNCTION   : get_pool
+# DESCRIPTION: Returns the process-wide render pool
+# PARAMETERS : None
+# RETURNS    : RenderPool
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RenderPool()
+    return _pool
+
+
+metrics.Gauge("ocr_app_render_queue_depth", "Render jobs waiting for or running in the render pool",
+              function=lambda: _pool.depth() if _pool is not None else 0)
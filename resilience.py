@@ -0,0 +1,168 @@
+"""
+FILE       : resilience.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-27
+DESCRIPTION:
+This module holds the building blocks that keep slow or failing OCR calls from
+holding up requests (used by the engine wrappers in ocr_engine.py):
+  - Deadlines      : an OCR call runs with a deadline that the code under it
+                     (quota waits, retries, Vision's own timeout) can read.
+  - LatencyWindow  : the latencies of recent successful calls, from which the
+                     p95 is taken to decide when a call is slow enough to hedge.
+  - CircuitBreaker : tracks the outcome of recent calls. When the share of
+                     failures crosses OCR_BREAKER_ERROR_RATE it opens, and calls
+                     fail at once (or go to the fallback engine) for
+                     OCR_BREAKER_COOLDOWN seconds. Then one trial call is let
+                     through; it closes the breaker again if it succeeds.
+"""
+
+import time
+import threading
+import contextvars
+from collections import deque
+from config import (OCR_BREAKER_WINDOW, OCR_BREAKER_MIN_CALLS, OCR_BREAKER_ERROR_RATE,
+                    OCR_BREAKER_COOLDOWN, OCR_HEDGE_WINDOW)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# time.monotonic() value by which the OCR call running in this context must end
+_deadline = contextvars.ContextVar("ocr_deadline", default=None)
+
+
+# FUNCTION   : call_before
+# DESCRIPTION: Calls fn with a deadline that code inside it can read with
+#              time_left(). Runs in a fresh context, so pool threads do not
+#              keep the deadline of an earlier call.
+# PARAMETERS : deadline (float) - time.monotonic() value, fn (callable)
+# RETURNS    : Whatever fn returns
+
+def call_before(deadline, fn):
+    def run():
+        _deadline.set(deadline)
+        return fn()
+    return contextvars.Context().run(run)
+
+
+# FUNCTION   : time_left
+# DESCRIPTION: Seconds left before the deadline of the current OCR call
+# PARAMETERS : None
+# RETURNS    : float, or None outside a call with a deadline
+
+def time_left():
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+# FUNCTION   : percentile
+# DESCRIPTION: Nearest-rank percentile of a list of numbers
+# PARAMETERS : values (list of float), fraction (float, 0-1)
+# RETURNS    : float, or None for an empty list
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# CLASS      : LatencyWindow
+# DESCRIPTION: Latencies of the last `size` calls, shared by all threads
+
+class LatencyWindow:
+
+    def __init__(self, size=OCR_HEDGE_WINDOW):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._values.append(seconds)
+
+    def __len__(self):
+        return len(self._values)
+
+    def percentile(self, fraction):
+        with self._lock:
+            values = list(self._values)
+        return percentile(values, fraction)
+
+
+# CLASS      : CircuitBreaker
+# DESCRIPTION: Closed / open / half-open breaker over the outcomes of the last
+#              `window` calls
+
+class CircuitBreaker:
+
+    def __init__(self, window=OCR_BREAKER_WINDOW, min_calls=OCR_BREAKER_MIN_CALLS,
+                 error_rate=OCR_BREAKER_ERROR_RATE, cooldown=OCR_BREAKER_COOLDOWN):
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.counts = {"allowed": 0, "rejected": 0, "failures": 0, "opened": 0}
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Tell whether a call may go ahead. Counts it as allowed or rejected."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+            if self.state == CLOSED or (self.state == HALF_OPEN and not self._trial_running):
+                self._trial_running = self.state == HALF_OPEN
+                self.counts["allowed"] += 1
+                return True
+            self.counts["rejected"] += 1
+            return False
+
+    def record(self, success):
+        """Record the outcome of an allowed call."""
+        with self._lock:
+            if not success:
+                self.counts["failures"] += 1
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                # Started before the breaker opened
+                return
+            self._outcomes.append(success)
+            if len(self._outcomes) >= self.min_calls and self._failure_rate() >= self.error_rate:
+                self._open()
+
+    def cancel(self):
+        """Forget an allowed call whose outcome says nothing about the service."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trial_running = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.counts["opened"] += 1
+
+    def _failure_rate(self):
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "recent_failure_rate": round(self._failure_rate(), 3) if self._outcomes else 0.0,
+                "recent_calls": len(self._outcomes),
+                "error_rate_threshold": self.error_rate,
+                "cooldown": self.cooldown,
+                **self.counts,
+            }
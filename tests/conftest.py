@@ -0,0 +1,56 @@
+"""
+FILE       : conftest.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-04
+DESCRIPTION:
+Shared setup for the unit tests. Makes the app's modules importable and gives
+each test a fresh in-memory Vision quota on a fake clock, so waits for budget
+and retry backoff are recorded instead of slept.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quota
+
+
+# FUNCTION   : sleeps
+# DESCRIPTION: Gives the quota module a fake clock whose sleep records the
+#              delay and moves the clock forward without waiting
+# PARAMETERS : monkeypatch (pytest fixture)
+# RETURNS    : list of float - Seconds slept, in order
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    now = [1000.0]
+
+    def sleep(seconds):
+        delays.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(quota, "time", types.SimpleNamespace(monotonic=lambda: now[0], sleep=sleep))
+    return delays
+
+
+# FUNCTION   : limiter
+# DESCRIPTION: Installs a new memory limiter allowing 60 images per minute and
+#              no daily cap, on the fake clock
+# PARAMETERS : monkeypatch (pytest fixture), sleeps (fixture)
+# RETURNS    : quota.MemoryLimiter
+
+@pytest.fixture
+def limiter(monkeypatch, sleeps):
+    monkeypatch.setattr(quota, "VISION_RATE_LIMIT", "memory")
+    monkeypatch.setattr(quota, "VISION_REQUESTS_PER_MINUTE", 60)
+    monkeypatch.setattr(quota, "VISION_DAILY_BUDGET", 0)
+    monkeypatch.setattr(quota, "_limiter", None)
+    return quota.get_limiter()
@@ -0,0 +1,98 @@
+"""
+FILE       : test_ddl.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-04
+DESCRIPTION:
+Tests that routes never change the schema; every schema change is a migration
+in migrations.py. The app's modules are checked for schema statements outside
+migrations.py, and, as in benchmarks/check_ddl.py, the migrations are applied
+to the local PostgreSQL database (see db.py) and a new user signs up and calls
+the login, settings, preference, session, history and search routes through
+Flask's test client with DB_FORBID_REQUEST_DDL on. Every CREATE/ALTER/DROP a
+route runs is counted in ocr_app_db_request_ddl_total, which has to stay at
+zero. The route test is skipped when the local database cannot be reached.
+
+Usage: python -m pytest tests
+"""
+
+import os
+import ast
+import glob
+import uuid
+
+import psycopg2
+import pytest
+
+import db
+import metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def schema_statements(path):
+    with open(path, encoding="utf-8") as source:
+        tree = ast.parse(source.read())
+    # SQL is written in capitals, so a docstring starting "Create ..." is not one
+    return [node.value.strip().split("\n")[0] for node in ast.walk(tree)
+            if isinstance(node, ast.Constant) and isinstance(node.value, str)
+            and db._DDL.match(node.value) and node.value.split()[0].isupper()]
+
+
+def test_only_migrations_change_the_schema():
+    found = {os.path.basename(path): schema_statements(path)
+             for path in glob.glob(os.path.join(ROOT, "*.py"))
+             if os.path.basename(path) != "migrations.py"}
+    assert {name: statements for name, statements in found.items() if statements} == {}
+
+
+# FUNCTION   : client
+# DESCRIPTION: Applies the migrations to the local database and returns a
+#              test client of the app that refuses and counts schema
+#              statements run by routes, starting from a count of zero
+# PARAMETERS : monkeypatch (pytest fixture)
+# RETURNS    : flask.testing.FlaskClient
+
+@pytest.fixture
+def client(monkeypatch):
+    try:
+        db.connect().close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Local database not available: {e}")
+    import migrations
+    from app import app
+
+    migrations.migrate()
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    monkeypatch.setattr(db, "DB_FORBID_REQUEST_DDL", True)
+    monkeypatch.setattr(metrics.DB_REQUEST_DDL, "_values", {})
+    return app.test_client()
+
+
+def test_routes_run_no_schema_statements(client):
+    name = f"ddltest_{uuid.uuid4().hex[:8]}"
+    calls = [
+        ("POST", "/signup", {"data": {"username": name, "password": "ddltest",
+                                      "gmail": f"{name}@ddltest.invalid"}}),
+        ("POST", "/login", {"data": {"username": name, "password": "ddltest"}}),
+        ("GET", "/settings", {}),
+        ("POST", "/toggle_2fa", {"json": {"enabled": True}}),
+        ("POST", "/toggle_2fa", {"json": {"enabled": False}}),
+        ("POST", "/toggle_analytics", {"json": {"enabled": True}}),
+        ("POST", "/toggle_notifications", {"json": {"enabled": True}}),
+        ("POST", "/update_language", {"json": {"language": "fr"}}),
+        ("GET", "/get_active_sessions", {}),
+        ("GET", "/history", {}),
+        ("GET", "/search_history?query=test", {}),
+        ("GET", "/logout", {}),
+    ]
+    errors = {}
+    for method, path, kwargs in calls:
+        response = client.open(path, method=method, **kwargs)
+        if response.status_code >= 500:
+            errors[f"{method} {path}"] = response.status_code
+
+    ddl = {labels[0]: value for _, labels, _, value in metrics.DB_REQUEST_DDL.samples()}
+    assert ddl == {}
+    assert errors == {}
@@ -0,0 +1,272 @@
+"""
+FILE       : test_quota.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-04
+DESCRIPTION:
+Tests for the Vision quota (quota.py) and the LimitedEngine that applies it:
+transient errors are retried with backoff, an empty bucket or a used up daily
+budget raises QuotaExceeded with the time to wait, and the images of a batch
+that are sent again (alone, or as the whole batch) are charged to the budget.
+Vision is replaced by FakeEngine, a stub engine or a mocked client, so no
+network call is made.
+
+Usage: python -m pytest tests
+"""
+
+import types
+
+import pytest
+from google.api_core import exceptions as api_exceptions
+from google.cloud import vision
+
+import quota
+import ocr_engine
+
+
+def ok_response(text="text"):
+    return vision.AnnotateImageResponse(full_text_annotation=vision.TextAnnotation(text=text))
+
+
+def error_response(code, message="error"):
+    return vision.AnnotateImageResponse(error={"code": code, "message": message})
+
+
+def texts(responses):
+    return [response.full_text_annotation.text for response in responses]
+
+
+def images_charged(limiter):
+    return limiter.state()[1]
+
+
+# FUNCTION   : max_backoff
+# DESCRIPTION: Makes backoff_delay() return its upper bound instead of a random
+#              share of it, with a 0.5 s base and an 8 s cap
+# PARAMETERS : monkeypatch (pytest fixture)
+# RETURNS    : None
+
+@pytest.fixture
+def max_backoff(monkeypatch):
+    monkeypatch.setattr(quota, "VISION_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(quota, "VISION_RETRY_MAX_DELAY", 8)
+    monkeypatch.setattr(quota, "random", types.SimpleNamespace(uniform=lambda low, high: high))
+
+
+# CLASS      : Calls
+# DESCRIPTION: Callable that returns or raises the given outcomes in turn
+
+class Calls:
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.count = 0
+
+    def __call__(self):
+        outcome = self.outcomes[min(self.count, len(self.outcomes) - 1)]
+        self.count += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+# CLASS      : StubEngine
+# DESCRIPTION: Engine whose batch call returns the given responses and whose
+#              single-image calls succeed, recording the images they get
+
+class StubEngine(ocr_engine.OCREngine):
+    name = "stub"
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.singles = []
+
+    def annotate_batch(self, contents):
+        return list(self.batch)
+
+    def annotate(self, content):
+        self.singles.append(content)
+        return ok_response(content.decode())
+
+
+# CLASS      : VisionClient
+# DESCRIPTION: Stands in for ImageAnnotatorClient. Batch calls raise the given
+#              errors in turn and then succeed; single-image calls succeed.
+
+class VisionClient:
+
+    def __init__(self, *batch_errors):
+        self.batch_errors = list(batch_errors)
+        self.batch_calls = 0
+        self.single_calls = 0
+
+    def batch_annotate_images(self, requests, timeout):
+        self.batch_calls += 1
+        if self.batch_errors:
+            raise self.batch_errors.pop(0)
+        return vision.BatchAnnotateImagesResponse(responses=[ok_response("batch") for _ in requests])
+
+    def document_text_detection(self, image, timeout):
+        self.single_calls += 1
+        return ok_response("single")
+
+
+@pytest.fixture
+def vision_client(monkeypatch):
+    def install(*batch_errors):
+        client = VisionClient(*batch_errors)
+        monkeypatch.setattr(ocr_engine.VisionEngine, "get_client", classmethod(lambda cls: client))
+        return client
+    return install
+
+
+# Retries
+
+@pytest.mark.parametrize("error", [api_exceptions.TooManyRequests("429"),
+                                   api_exceptions.ServiceUnavailable("503")])
+def test_transient_error_is_retried_with_backoff(limiter, sleeps, max_backoff, error):
+    fn = Calls(error, error, "done")
+
+    assert quota.call_with_retry(fn, attempts=4) == "done"
+    assert fn.count == 3
+    assert sleeps == [0.5, 1.0]
+    # Every attempt is charged
+    assert images_charged(limiter) == 3
+
+
+def test_backoff_is_capped(max_backoff):
+    assert [quota.backoff_delay(attempt) for attempt in range(6)] == [0.5, 1, 2, 4, 8, 8]
+
+
+def test_backoff_is_jittered():
+    for attempt in range(6):
+        assert 0 <= quota.backoff_delay(attempt) <= min(quota.VISION_RETRY_MAX_DELAY,
+                                                        quota.VISION_RETRY_BASE_DELAY * 2 ** attempt)
+
+
+def test_last_transient_error_is_raised_after_all_attempts(limiter, sleeps, max_backoff):
+    fn = Calls(api_exceptions.ServiceUnavailable("503"))
+
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        quota.call_with_retry(fn, attempts=3)
+    assert fn.count == 3
+    assert sleeps == [0.5, 1.0]
+
+
+def test_other_errors_are_not_retried(limiter, sleeps):
+    fn = Calls(api_exceptions.InvalidArgument("bad image"), "done")
+
+    with pytest.raises(api_exceptions.InvalidArgument):
+        quota.call_with_retry(fn, attempts=4)
+    assert fn.count == 1
+    assert sleeps == []
+
+
+def test_transient_error_in_response_is_retried(limiter, sleeps, max_backoff):
+    fn = Calls(error_response(14, "unavailable"), ok_response("done"))
+
+    assert texts([quota.call_with_retry(fn, attempts=4)]) == ["done"]
+    assert fn.count == 2
+
+
+def test_fake_engine_quota_errors_are_retried_and_charged(limiter, sleeps):
+    fake = ocr_engine.FakeEngine(latency=0, quota_error_rate=1.0, seed=1)
+
+    with pytest.raises(api_exceptions.ResourceExhausted):
+        ocr_engine.LimitedEngine(fake).annotate(b"page")
+    assert fake.stats()["calls"] == quota.VISION_RETRY_ATTEMPTS
+    assert images_charged(limiter) == quota.VISION_RETRY_ATTEMPTS
+
+
+# Token bucket and daily budget
+
+def test_empty_bucket_raises_with_retry_after(limiter, sleeps):
+    quota.acquire(60, max_wait=0)
+
+    with pytest.raises(quota.QuotaExceeded) as raised:
+        quota.acquire(2, max_wait=0)
+    # 60 images per minute refill one per second
+    assert raised.value.retry_after == pytest.approx(2.0)
+    assert sleeps == []
+
+
+def test_empty_bucket_is_waited_for_within_max_wait(limiter, sleeps):
+    quota.acquire(60, max_wait=0)
+
+    quota.acquire(1, max_wait=5)
+    assert sleeps == [pytest.approx(1.0)]
+
+
+def test_daily_budget_cuts_off_until_midnight(monkeypatch, limiter, sleeps):
+    monkeypatch.setattr(quota, "VISION_DAILY_BUDGET", 5)
+    quota.acquire(5, max_wait=0)
+
+    with pytest.raises(quota.QuotaExceeded) as raised:
+        quota.acquire(1, max_wait=0)
+    assert raised.value.retry_after == pytest.approx(quota._seconds_to_midnight(), abs=5)
+    assert images_charged(limiter) == 5
+    assert quota.remaining()["daily_remaining"] == 0
+
+
+def test_daily_budget_refuses_batch_that_does_not_fit(monkeypatch, limiter, sleeps):
+    monkeypatch.setattr(quota, "VISION_DAILY_BUDGET", 5)
+    quota.acquire(3, max_wait=0)
+
+    with pytest.raises(quota.QuotaExceeded):
+        quota.acquire(3, max_wait=0)
+    quota.acquire(2, max_wait=0)
+    assert images_charged(limiter) == 5
+
+
+def test_quota_exceeded_is_not_retried(monkeypatch, limiter, sleeps):
+    monkeypatch.setattr(quota, "VISION_DAILY_BUDGET", 1)
+    engine = StubEngine([])
+    limited = ocr_engine.LimitedEngine(engine)
+    limited.annotate(b"a")
+
+    with pytest.raises(quota.QuotaExceeded):
+        limited.annotate(b"b")
+    assert engine.singles == [b"a"]
+
+
+# Batches
+
+def test_transient_errors_in_batch_are_retried_per_image(limiter, sleeps):
+    engine = StubEngine([ok_response("a"), error_response(14), ok_response("c"), error_response(3)])
+    responses = ocr_engine.LimitedEngine(engine).annotate_batch([b"a", b"b", b"c", b"d"])
+
+    assert texts(responses[:3]) == ["a", "b", "c"]
+    # An invalid image (INVALID_ARGUMENT) is not worth retrying
+    assert responses[3].error.code == 3
+    assert engine.singles == [b"b"]
+    assert images_charged(limiter) == 5
+
+
+def test_transient_batch_error_retries_whole_batch(limiter, sleeps, vision_client):
+    client = vision_client(api_exceptions.ServiceUnavailable("503"))
+    responses = ocr_engine.LimitedEngine(ocr_engine.VisionEngine()).annotate_batch([b"a", b"b", b"c"])
+
+    assert texts(responses) == ["batch"] * 3
+    assert (client.batch_calls, client.single_calls) == (2, 0)
+    assert images_charged(limiter) == 6
+
+
+def test_rejected_batch_falls_back_to_single_images_within_budget(limiter, sleeps, vision_client):
+    client = vision_client(api_exceptions.InvalidArgument("request too large"))
+    responses = ocr_engine.LimitedEngine(ocr_engine.VisionEngine()).annotate_batch([b"a", b"b", b"c"])
+
+    assert texts(responses) == ["single"] * 3
+    assert (client.batch_calls, client.single_calls) == (1, 3)
+    # The rejected batch and each image sent alone
+    assert images_charged(limiter) == 6
+
+
+def test_batch_fallback_stops_when_budget_runs_out(monkeypatch, limiter, sleeps, vision_client):
+    monkeypatch.setattr(quota, "VISION_DAILY_BUDGET", 4)
+    client = vision_client(api_exceptions.InvalidArgument("request too large"))
+
+    with pytest.raises(quota.QuotaExceeded):
+        ocr_engine.LimitedEngine(ocr_engine.VisionEngine()).annotate_batch([b"a", b"b", b"c"])
+    assert client.single_calls == 1
+    assert images_charged(limiter) == 4
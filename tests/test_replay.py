@@ -0,0 +1,86 @@
+"""
+FILE       : test_replay.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-05-04
+DESCRIPTION:
+Tests for the saved Vision responses in Test/replay, which the replay engine
+serves offline (OCR_ENGINE=replay, the load test). Each one has to load
+through ReplayEngine as the response for its image, carry the full layout
+(pages, blocks, paragraphs, words and symbols with bounding boxes and
+confidences) so layout.pack and the features built on it have something to
+work with, and spell out the same text in its symbols as in its full text.
+
+Usage: python -m pytest tests
+"""
+
+import os
+import glob
+import json
+
+import pytest
+
+import layout
+import ocr_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPLAY_DIR = os.path.join(ROOT, "Test", "replay")
+RECORDS = sorted(glob.glob(os.path.join(REPLAY_DIR, "*.json")))
+
+# Text that follows a symbol with this detected break (see vision.TextAnnotation.DetectedBreak)
+BREAKS = {"SPACE": " ", "SURE_SPACE": " ", "EOL_SURE_SPACE": "\n", "HYPHEN": "-\n", "LINE_BREAK": "\n"}
+
+
+def recorded_image(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["image"]
+
+
+def replay(path):
+    with open(os.path.join(ROOT, "Test", recorded_image(path)), "rb") as f:
+        content = f.read()
+    return content, ocr_engine.ReplayEngine(REPLAY_DIR).annotate(content)
+
+
+def symbols_text(response):
+    text = []
+    for page in response.full_text_annotation.pages:
+        for block in page.blocks:
+            for paragraph in block.paragraphs:
+                for word in paragraph.words:
+                    for symbol in word.symbols:
+                        text.append(symbol.text)
+                        text.append(BREAKS.get(symbol.property.detected_break.type_.name, ""))
+    return "".join(text)
+
+
+def test_every_test_image_has_a_response():
+    images = {os.path.basename(path) for path in glob.glob(os.path.join(ROOT, "Test", "*.png"))}
+    assert {recorded_image(path) for path in RECORDS} == images
+
+
+@pytest.mark.parametrize("path", RECORDS, ids=os.path.basename)
+def test_response_is_saved_under_its_image_digest(path):
+    content, _ = replay(path)
+    assert os.path.basename(path) == f"{ocr_engine.image_digest(content)}.json"
+
+
+@pytest.mark.parametrize("path", RECORDS, ids=os.path.basename)
+def test_response_has_full_layout(path):
+    _, response = replay(path)
+    page = response.full_text_annotation.pages[0]
+    unpacked = layout.Layout(layout.pack(response))
+
+    assert unpacked.counts["pages"] == 1
+    assert unpacked.counts["blocks"] >= 1 and unpacked.counts["paragraphs"] >= 1
+    assert unpacked.counts["words"] > 0 and all(unpacked.words_text)
+    for _, _, (x0, y0, x1, y1), confidence in unpacked.words():
+        assert 0 <= x0 < x1 <= page.width and 0 <= y0 < y1 <= page.height
+        assert 0 < confidence <= 1
+
+
+@pytest.mark.parametrize("path", RECORDS, ids=os.path.basename)
+def test_symbols_spell_the_full_text(path):
+    _, response = replay(path)
+    assert symbols_text(response) == response.full_text_annotation.text
@@ -1,37 +1,537 @@
-"""
-FILE       : translate_api.py
-PROJECT    : Handwritten OCR | Capstone Project 2025
-PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
-             Shubh Soni (8887735), Dev Patel (8866936)
-DATE       : 2025-03-10
-DESCRIPTION:
-This module provides a helper function to translate text into different languages
-using the Google Translate API through the `googletrans` library.
-"""
-
-
-'''
-    References: We have used the Google Translate API to translate the text. The API is free to use and has a limit of 1000 requests per user. 
-    The link to the API is given below: 
-    - https://github.com/googletrans/googletrans
-    - https://github.com/google/translate-python
-'''
-from googletrans import Translator
-
-translator = Translator()
-
-
-# FUNCTION   : translate_text
-# DESCRIPTION: Translates the given text to the specified target language using
-#              the Google Translate API via `googletrans`.
-# PARAMETERS : text (str)         - The text to be translated
-#              target_lang (str)  - Language code to translate into (default: "es")
-# RETURNS    : str - Translated text or error message
-
-def translate_text(text, target_lang="es"):
-    """Translate text using Google Translate."""
-    try:
-        translated = translator.translate(text, dest=target_lang)
-        return translated.text
-    except Exception as e:
-        return f"Translation Error: {str(e)}"
+"""
+FILE       : translate_api.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-03-10
+DESCRIPTION:
+This module provides helper functions to translate text into different languages
+using the Google Translate API through the `googletrans` library. A googletrans
+Translator is not safe to share between threads, so calls go through a
+TranslatorPool: up to TRANSLATE_POOL_SIZE clients, each used by one thread at
+a time and each keeping its HTTP connection open for the next call. Every call
+has a deadline (TRANSLATE_TIMEOUT by default) that bounds both the wait for a
+free client and the HTTP request, and can be cancelled by the caller. The
+backend behind the pool is chosen with TRANSLATE_ENGINE from BACKENDS; "fake"
+is a stand-in that makes no network calls (for offline runs and throughput
+tests). Results are served from the translation cache when the same text was
+translated before (see translation_cache.py). Text is cached segment by
+segment (paragraphs, or sentences of long paragraphs), so after an edit only
+the changed segments are sent again. Consecutive segments are grouped into
+batches of up to TRANSLATE_BATCH_MAX_CHARS characters that are translated in
+parallel, each with one backend call for its uncached segments, so a long text
+on a cold cache takes a few calls per language. translate_many() translates one
+text into several languages concurrently; stream_translations() does the same
+but hands out each segment as soon as it is done.
+"""
+
+
+'''
+    References: We have used the Google Translate API to translate the text. The API is free to use and has a limit of 1000 requests per user. 
+    The link to the API is given below: 
+    - https://github.com/googletrans/googletrans
+    - https://github.com/google/translate-python
+'''
+import os
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+import httpx
+from googletrans import Translator
+import metrics
+import translation_cache
+from config import (TRANSLATE_ENGINE, FAKE_TRANSLATE_LATENCY, TRANSLATE_WORKERS,
+                    TRANSLATE_TIMEOUT, TRANSLATE_POOL_SIZE, TRANSLATE_SEGMENT_MAX_CHARS,
+                    TRANSLATE_BATCH_MAX_CHARS)
+
+# A blank line (with any whitespace after it) ends a paragraph
+_PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+# Whitespace after sentence-ending punctuation ends a sentence
+_SENTENCE_END = re.compile(r"(?<=[.!?\u3002\uff01\uff1f])(\s+)")
+# Segments of a batch are sent as paragraphs of one text; none contains a
+# blank line, so the translation splits back at the paragraph breaks
+_BATCH_SEPARATOR = "\n\n"
+
+
+class TranslationError(Exception):
+    """Raised when a text cannot be translated."""
+
+
+class TranslationTimeout(TranslationError):
+    """Raised when a translation does not finish before its deadline."""
+
+
+class TranslationCancelled(TranslationError):
+    """Raised when the caller cancelled a translation before it started."""
+
+
+# CLASS      : TranslationBackend
+# DESCRIPTION: Base class for translation backends. A backend creates clients
+#              and translates with one of them; the pool makes sure a client
+#              is only used by one thread at a time.
+
+class TranslationBackend:
+    name = "base"
+
+    def new_client(self):
+        """Return a new client for this backend."""
+        raise NotImplementedError
+
+    def translate(self, client, text, target_lang, timeout, cancel):
+        """Return text translated into target_lang within `timeout` seconds."""
+        raise NotImplementedError
+
+    def translate_batch(self, client, texts, target_lang, timeout, cancel):
+        """Return texts translated into target_lang within `timeout` seconds.
+
+        The texts are sent as the paragraphs of one text. When the translation
+        does not split back into as many paragraphs, each text is sent on its
+        own in the time left.
+        """
+        deadline = time.monotonic() + timeout
+        if len(texts) > 1:
+            joined = self.translate(client, _BATCH_SEPARATOR.join(texts), target_lang, timeout, cancel)
+            translated = _PARAGRAPH_BREAK.split(joined.strip())[::2]
+            if len(translated) == len(texts):
+                return translated
+        translated = []
+        for text in texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TranslationTimeout(f"Translation timed out after {timeout:.1f} seconds")
+            if cancel.is_set():
+                raise TranslationCancelled("Translation cancelled")
+            translated.append(self.translate(client, text, target_lang, remaining, cancel))
+        return translated
+
+    def close(self, client):
+        """Release a client that is no longer used."""
+
+
+# CLASS      : GoogleBackend
+# DESCRIPTION: googletrans backend. Each client is a Translator with its own
+#              httpx connection pool; its timeout is set to the time left
+#              before the call's deadline.
+
+class GoogleBackend(TranslationBackend):
+    name = "google"
+
+    def new_client(self):
+        return Translator(timeout=httpx.Timeout(TRANSLATE_TIMEOUT))
+
+    def translate(self, client, text, target_lang, timeout, cancel):
+        client.client.timeout = httpx.Timeout(timeout)
+        try:
+            return client.translate(text, dest=target_lang).text
+        except httpx.TimeoutException as e:
+            raise TranslationTimeout(f"Translation timed out after {timeout:.1f} seconds") from e
+
+    def close(self, client):
+        client.client.close()
+
+
+# CLASS      : FakeBackend
+# DESCRIPTION: Stand-in backend. Returns the text tagged with the target
+#              language after `latency` seconds; the wait ends early when the
+#              call is cancelled or its deadline passes.
+
+class FakeBackend(TranslationBackend):
+    name = "fake"
+
+    def __init__(self, latency=FAKE_TRANSLATE_LATENCY):
+        self.latency = latency
+
+    def new_client(self):
+        return object()
+
+    def translate(self, client, text, target_lang, timeout, cancel):
+        if cancel.wait(min(self.latency, timeout)):
+            raise TranslationCancelled("Translation cancelled")
+        if self.latency > timeout:
+            raise TranslationTimeout(f"Translation timed out after {timeout:.1f} seconds")
+        return f"[{target_lang}] {text}"
+
+    def translate_batch(self, client, texts, target_lang, timeout, cancel):
+        # One wait for the whole batch, like one request
+        return [self.translate(client, texts[0], target_lang, timeout, cancel)] + \
+               [f"[{target_lang}] {text}" for text in texts[1:]]
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "fake": FakeBackend,
+}
+
+
+# CLASS      : TranslatorPool
+# DESCRIPTION: Up to `size` clients of one backend shared by all threads.
+#              Idle clients are reused, so their connections stay open; a
+#              client whose call failed is closed and replaced.
+
+class TranslatorPool:
+
+    def __init__(self, backend, size=TRANSLATE_POOL_SIZE):
+        self.backend = backend
+        self.size = size
+        self.counts = {"calls": 0, "errors": 0, "timeouts": 0, "cancelled": 0,
+                       "clients_created": 0, "wait_seconds": 0.0}
+        self._idle = []
+        self._created = 0
+        self._busy = 0
+        self._cond = threading.Condition()
+
+    def _checkout(self, deadline, cancel):
+        start = time.monotonic()
+        with self._cond:
+            while not self._idle and self._created >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TranslationTimeout("No translation client became free before the deadline")
+                if cancel.is_set():
+                    raise TranslationCancelled("Translation cancelled")
+                # Woken when a client is returned; cancel is checked at least every 0.1 s
+                self._cond.wait(min(remaining, 0.1))
+            self._busy += 1
+            self.counts["wait_seconds"] += time.monotonic() - start
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+            self.counts["clients_created"] += 1
+        try:
+            return self.backend.new_client()
+        except Exception:
+            self._checkin(None)
+            raise
+
+    def _checkin(self, client):
+        with self._cond:
+            self._busy -= 1
+            if client is None:
+                self._created -= 1
+            else:
+                self._idle.append(client)
+            self._cond.notify()
+
+    def _count(self, name):
+        with self._cond:
+            self.counts[name] += 1
+
+    def translate(self, text, target_lang, deadline=None, cancel=None):
+        """Translate text, failing once time.monotonic() passes deadline."""
+        return self._call(self.backend.translate, text, target_lang, deadline, cancel)
+
+    def translate_batch(self, texts, target_lang, deadline=None, cancel=None):
+        """Translate a list of texts with one client, like translate()."""
+        return self._call(self.backend.translate_batch, texts, target_lang, deadline, cancel)
+
+    def _call(self, translate, text, target_lang, deadline, cancel):
+        deadline = deadline if deadline is not None else time.monotonic() + TRANSLATE_TIMEOUT
+        cancel = cancel or threading.Event()
+        self._count("calls")
+        try:
+            client = self._checkout(deadline, cancel)
+        except TranslationTimeout:
+            self._count("timeouts")
+            raise
+        except TranslationCancelled:
+            self._count("cancelled")
+            raise
+
+        remaining = deadline - time.monotonic()
+        if cancel.is_set() or remaining <= 0:
+            self._checkin(client)
+            if cancel.is_set():
+                self._count("cancelled")
+                raise TranslationCancelled("Translation cancelled")
+            self._count("timeouts")
+            raise TranslationTimeout("No time left before the deadline")
+        try:
+            translated = translate(client, text, target_lang, remaining, cancel)
+        except TranslationCancelled:
+            self._count("cancelled")
+            self._checkin(client)
+            raise
+        except Exception as e:
+            self._count("timeouts" if isinstance(e, TranslationTimeout) else "errors")
+            # The connection may be left half-read; start the next call on a new client
+            self._discard(client)
+            raise
+        self._checkin(client)
+        return translated
+
+    def _discard(self, client):
+        try:
+            self.backend.close(client)
+        except Exception as e:
+            print(f"Closing translation client failed: {e}")
+        self._checkin(None)
+
+    def stats(self):
+        with self._cond:
+            return {"backend": self.backend.name, "size": self.size, "clients": self._created,
+                    "busy": self._busy, "idle": len(self._idle), **self.counts}
+
+
+_pool = None
+_pool_pid = None
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+# FUNCTION   : get_pool
+# DESCRIPTION: Returns the process-wide translator pool for TRANSLATE_ENGINE,
+#              creating it on first use (and again in a forked worker, since
+#              open connections must not be shared across processes)
+# PARAMETERS : None
+# RETURNS    : TranslatorPool
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _executor_lock:
+            if _pool is None or _pool_pid != pid:
+                if TRANSLATE_ENGINE not in BACKENDS:
+                    raise ValueError(f"Unknown translation engine: {TRANSLATE_ENGINE}")
+                _pool = TranslatorPool(BACKENDS[TRANSLATE_ENGINE]())
+                _pool_pid = pid
+    return _pool
+
+
+# FUNCTION   : set_backend
+# DESCRIPTION: Replaces the process-wide pool with one for the given backend
+#              (used by benchmarks and tools)
+# PARAMETERS : backend (TranslationBackend), size (int, optional)
+# RETURNS    : TranslatorPool - The new pool
+
+def set_backend(backend, size=TRANSLATE_POOL_SIZE):
+    global _pool, _pool_pid
+    with _executor_lock:
+        _pool = TranslatorPool(backend, size)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+# FUNCTION   : get_executor
+# DESCRIPTION: Returns the process-wide translation thread pool, creating it on
+#              first use (and again in a forked worker)
+# PARAMETERS : None
+# RETURNS    : ThreadPoolExecutor
+
+def get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS,
+                                               thread_name_prefix="translate")
+                _executor_pid = pid
+    return _executor
+
+
+def _busy_clients():
+    return _pool.stats()["busy"] if _pool is not None else 0
+
+
+metrics.Gauge("ocr_app_translation_clients_busy", "Translation clients in use by a call",
+              function=_busy_clients)
+
+
+# FUNCTION   : split_segments
+# DESCRIPTION: Splits text into the segments that are translated (and cached)
+#              one by one: paragraphs, and the sentences of paragraphs longer
+#              than TRANSLATE_SEGMENT_MAX_CHARS. A boundary only depends on the
+#              text around it, so an edit changes the segments it touches and
+#              leaves the others as they were.
+# PARAMETERS : text (str), max_chars (int, optional)
+# RETURNS    : list of (segment, separator) - text is every segment followed
+#              by its separator, in order
+
+def split_segments(text, max_chars=TRANSLATE_SEGMENT_MAX_CHARS):
+    parts = _PARAGRAPH_BREAK.split(text or "")
+    # parts alternates paragraph, break, paragraph, ...; the last has no break
+    parts.append("")
+    pieces = []
+    for paragraph, separator in zip(parts[::2], parts[1::2]):
+        if len(paragraph) <= max_chars:
+            pieces.append((paragraph, separator))
+            continue
+        sentences = _SENTENCE_END.split(paragraph)
+        sentences.append("")
+        pieces.extend(zip(sentences[::2], sentences[1::2]))
+        pieces[-1] = (pieces[-1][0], pieces[-1][1] + separator)
+    return pieces
+
+
+# FUNCTION   : translate_text
+# DESCRIPTION: Translates the given text to the specified target language using
+#              the Google Translate API via `googletrans`.
+# PARAMETERS : text (str)         - The text to be translated
+#              target_lang (str)  - Language code to translate into (default: "es")
+#              timeout (float)    - Seconds allowed for the call
+# RETURNS    : str - Translated text or error message
+
+def translate_text(text, target_lang="es", timeout=TRANSLATE_TIMEOUT):
+    """Translate text using Google Translate."""
+    translations, errors = translate_many(text, [target_lang], timeout)
+    return translations.get(target_lang, errors.get(target_lang))
+
+
+# FUNCTION   : translate_many
+# DESCRIPTION: Translates one text into several languages at once. The text is
+#              split into segments (see split_segments) and every batch of
+#              segments of every language is started on the shared pool
+#              straight away; segments translated before come from the cache
+#              and only new or edited ones reach the backend. Each language
+#              gets `timeout` seconds; one that fails or runs late is reported
+#              in errors without holding back the others.
+# PARAMETERS : text (str)                - The text to be translated
+#              target_langs (list of str) - Language codes, without duplicates
+#              timeout (float)            - Seconds allowed per language
+# RETURNS    : tuple - (translations {lang: text}, errors {lang: message})
+
+def translate_many(text, target_langs, timeout=TRANSLATE_TIMEOUT):
+    pieces = split_segments(text)
+    done = {lang: {} for lang in target_langs}
+    errors = {}
+    for lang, segment, translated, error in _translate_segments(_to_translate(pieces),
+                                                                 target_langs, timeout):
+        if error is not None:
+            errors.setdefault(lang, error)
+        else:
+            done[lang][segment] = translated
+    translations = {lang: _join(pieces, done[lang]) for lang in target_langs if lang not in errors}
+    return translations, errors
+
+
+# FUNCTION   : stream_translations
+# DESCRIPTION: Translates like translate_many, but yields each segment as soon
+#              as its batch is translated, with the number of segments done so far,
+#              instead of waiting for the whole text. Events:
+#                {"event": "start", "total", "languages", "layout"}
+#                {"event": "segment", "language", "indexes", "text", "done", "total"}
+#                {"event": "error", "language", "message", "done", "total"}
+#                {"event": "end", "done", "total", "errors"}
+#              layout lists [blank segment or "", separator] for every piece of
+#              the text, and indexes tells which pieces a segment fills.
+#              Closing the generator cancels the segments still pending.
+# PARAMETERS : text (str)                - The text to be translated
+#              target_langs (list of str) - Language codes, without duplicates
+#              timeout (float)            - Seconds allowed per language
+# RETURNS    : generator of dict
+
+def stream_translations(text, target_langs, timeout=TRANSLATE_TIMEOUT):
+    pieces = split_segments(text)
+    segments = _to_translate(pieces)
+    positions = {}
+    for index, (segment, _) in enumerate(pieces):
+        positions.setdefault(segment, []).append(index)
+    total = len(segments) * len(target_langs)
+    yield {"event": "start", "total": total, "languages": list(target_langs),
+           "layout": [["" if segment.strip() else segment, separator]
+                      for segment, separator in pieces]}
+
+    done = 0
+    failed = []
+    for lang, segment, translated, error in _translate_segments(segments, target_langs, timeout):
+        done += 1
+        if lang in failed:
+            continue
+        if error is not None:
+            failed.append(lang)
+            yield {"event": "error", "language": lang, "message": error, "done": done, "total": total}
+        else:
+            yield {"event": "segment", "language": lang, "indexes": positions[segment],
+                   "text": translated, "done": done, "total": total}
+    yield {"event": "end", "done": done, "total": total, "errors": failed}
+
+
+def _to_translate(pieces):
+    # Each distinct segment once; blank ones are kept as they are
+    return list(dict.fromkeys(segment for segment, _ in pieces if segment.strip()))
+
+
+def _join(pieces, translated):
+    return "".join(translated.get(segment, segment) + separator for segment, separator in pieces)
+
+
+def _batches(segments, max_chars=TRANSLATE_BATCH_MAX_CHARS):
+    # Consecutive segments, up to max_chars with their separators; a longer
+    # segment goes alone
+    batch, size = [], 0
+    for segment in segments:
+        if batch and size + len(_BATCH_SEPARATOR) + len(segment) > max_chars:
+            yield batch
+            batch, size = [], 0
+        size += (len(_BATCH_SEPARATOR) if batch else 0) + len(segment)
+        batch.append(segment)
+    if batch:
+        yield batch
+
+
+def _translate_segments(segments, target_langs, timeout):
+    """Yield (lang, segment, translation, error) as each batch finishes.
+
+    A language's remaining batches are cancelled after its first error, and
+    everything still pending is cancelled when the generator is closed.
+    """
+    executor = get_executor()
+    deadline = time.monotonic() + timeout
+    cancels = {lang: threading.Event() for lang in target_langs}
+    futures = {executor.submit(_cached_translate, batch, lang, deadline, cancels[lang]):
+               (lang, batch) for lang in target_langs for batch in _batches(segments)}
+    pending = set(futures)
+    timed_out = f"{translation_cache.ERROR_PREFIX} timed out after {timeout:g} seconds"
+    try:
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                pending.discard(future)
+                lang, batch = futures[future]
+                try:
+                    translations = future.result()
+                except TranslationTimeout:
+                    cancels[lang].set()
+                    translations, error = [None] * len(batch), timed_out
+                except Exception as e:
+                    cancels[lang].set()
+                    translations, error = [None] * len(batch), f"{translation_cache.ERROR_PREFIX} {str(e)}"
+                else:
+                    error = None
+                for segment, translated in zip(batch, translations):
+                    yield lang, segment, translated, error
+        except FutureTimeout:
+            for future in pending:
+                future.cancel()
+                lang, batch = futures[future]
+                for segment in batch:
+                    yield lang, segment, None, timed_out
+    finally:
+        # Nobody is waiting any more: batches still queued or waiting for a client stop
+        for cancel in cancels.values():
+            cancel.set()
+
+
+def _cached_translate(texts, target_lang, deadline, cancel):
+    def translate(texts, target_lang):
+        return _translate(texts, target_lang, deadline, cancel)
+    return translation_cache.cached_translate_many(texts, target_lang, translate,
+                                                   get_pool().backend.name)
+
+
+def _translate(texts, target_lang, deadline, cancel):
+    try:
+        translated = get_pool().translate_batch(texts, target_lang, deadline, cancel)
+    except TranslationTimeout:
+        metrics.TRANSLATION_CALLS.inc(status="timeout")
+        raise
+    except TranslationCancelled:
+        metrics.TRANSLATION_CALLS.inc(status="cancelled")
+        raise
+    except Exception:
+        metrics.TRANSLATION_CALLS.inc(status="error")
+        raise
+    metrics.TRANSLATION_CALLS.inc(status="ok")
+    return translated
@@ -0,0 +1,300 @@
+"""
+FILE       : translation_cache.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-29
+DESCRIPTION:
+This module caches translations so pressing translate again on the same text,
+or translating a handout many users share, does not call the translation
+service each time. Entries are keyed by the SHA-256 of the normalized source
+text (Unicode NFC, runs of spaces collapsed, lines trimmed) together with the
+source and target languages and the translation backend. Lookups go to an
+in-process LRU first and then to the translation_cache table in PostgreSQL;
+both tiers expire entries after TRANSLATE_CACHE_TTL seconds and are bounded in
+size, and texts over TRANSLATE_CACHE_MAX_CHARS are not cached. Failed
+translations are never cached. Invalidating the cache reaches the memory tier
+of every process through its generation (see cache_generations.py).
+"""
+
+import re
+import hashlib
+import threading
+import unicodedata
+import psycopg2
+from db import get_db_connection
+from cache import LRUCache
+import cache_generations
+import metrics
+from config import (TRANSLATE_CACHE_ENABLED, TRANSLATE_CACHE_MEMORY_ENTRIES,
+                    TRANSLATE_CACHE_DB_MAX_ROWS, TRANSLATE_CACHE_TTL, TRANSLATE_CACHE_MAX_CHARS)
+
+# Results starting with this are error messages, never translations
+ERROR_PREFIX = "Translation Error:"
+
+# Name of this cache in the cache_generations table
+GENERATION_NAME = "translation"
+
+# Expired and surplus rows are pruned from the table once every this many stores
+PRUNE_INTERVAL = 100
+
+memory_cache = LRUCache(max_entries=TRANSLATE_CACHE_MEMORY_ENTRIES, ttl=TRANSLATE_CACHE_TTL)
+
+_counter_lock = threading.Lock()
+_counters = {"db_hits": 0, "db_misses": 0, "db_errors": 0, "stores": 0, "skipped": 0}
+
+_SPACES = re.compile(r"[ \t\u00a0]+")
+
+
+def _count(name, amount=1):
+    with _counter_lock:
+        _counters[name] += amount
+
+
+# FUNCTION   : normalize
+# DESCRIPTION: Normalizes text so that copies differing only in Unicode form
+#              or spacing share a cache entry
+# PARAMETERS : text (str)
+# RETURNS    : str
+
+def normalize(text):
+    text = unicodedata.normalize("NFC", text)
+    return "\n".join(_SPACES.sub(" ", line).strip() for line in text.splitlines()).strip()
+
+
+# FUNCTION   : cache_key
+# DESCRIPTION: Builds the cache key for a text, language pair and backend
+# PARAMETERS : text (str), source_lang (str), target_lang (str), backend (str)
+# RETURNS    : str - Cache key
+
+def cache_key(text, source_lang, target_lang, backend):
+    digest = hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+    return f"{backend}:{source_lang}:{target_lang}:{digest}"
+
+
+# FUNCTION   : lookup
+# DESCRIPTION: Looks a key up in memory, then in PostgreSQL. A memory entry
+#              stored before the cache was last invalidated is ignored. A
+#              database hit is copied into the memory tier.
+# PARAMETERS : key (str) - Cache key
+# RETURNS    : str (translated text), or None on a miss
+
+def lookup(key):
+    generation = cache_generations.current(GENERATION_NAME)
+    entry = memory_cache.get(key)
+    if entry is not None:
+        if entry[0] == generation:
+            metrics.TRANSLATION_CACHE_LOOKUPS.inc(result="memory")
+            return entry[1]
+        memory_cache.delete(key)
+
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE translation_cache SET last_hit = NOW()
+                WHERE cache_key = %s AND created_at > NOW() - %s * INTERVAL '1 second'
+                RETURNING text
+            """, (key, TRANSLATE_CACHE_TTL))
+            row = c.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"Translation cache lookup failed: {e}")
+        _count("db_errors")
+        metrics.TRANSLATION_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    if row is None:
+        _count("db_misses")
+        metrics.TRANSLATION_CACHE_LOOKUPS.inc(result="miss")
+        return None
+    _count("db_hits")
+    metrics.TRANSLATION_CACHE_LOOKUPS.inc(result="db")
+    memory_cache.set(key, (generation, row[0]))
+    return row[0]
+
+
+# FUNCTION   : store
+# DESCRIPTION: Saves a translation under key in both tiers. Error messages and
+#              empty results are refused.
+# PARAMETERS : key (str), backend (str), source_lang (str), target_lang (str),
+#              translated (str)
+# RETURNS    : bool - Whether the translation was stored
+
+def store(key, backend, source_lang, target_lang, translated):
+    if not translated or translated.startswith(ERROR_PREFIX):
+        return False
+    memory_cache.set(key, (cache_generations.current(GENERATION_NAME), translated))
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO translation_cache (cache_key, backend, source_lang, target_lang, text,
+                                               created_at, last_hit)
+                VALUES (%s, %s, %s, %s, %s, NOW(), NOW())
+                ON CONFLICT (cache_key) DO UPDATE
+                SET text = EXCLUDED.text, created_at = NOW(), last_hit = NOW()
+            """, (key, backend, source_lang, target_lang, translated))
+            conn.commit()
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        print(f"Translation cache store failed: {e}")
+        _count("db_errors")
+        return True
+
+    _count("stores")
+    if _counters["stores"] % PRUNE_INTERVAL == 0:
+        prune()
+    return True
+
+
+# FUNCTION   : prune
+# DESCRIPTION: Deletes expired rows and the least recently hit rows beyond
+#              TRANSLATE_CACHE_DB_MAX_ROWS from the translation_cache table
+# PARAMETERS : None
+# RETURNS    : int - Number of rows deleted
+
+def prune():
+    try:
+        conn = get_db_connection()
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM translation_cache WHERE created_at <= NOW() - %s * INTERVAL '1 second'",
+                      (TRANSLATE_CACHE_TTL,))
+            deleted = c.rowcount
+            c.execute("""
+                DELETE FROM translation_cache WHERE cache_key IN (
+                    SELECT cache_key FROM translation_cache ORDER BY last_hit DESC OFFSET %s
+                )
+            """, (TRANSLATE_CACHE_DB_MAX_ROWS,))
+            deleted += c.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return deleted
+    except psycopg2.Error as e:
+        print(f"Translation cache prune failed: {e}")
+        _count("db_errors")
+        return 0
+
+
+# FUNCTION   : cached_translate
+# DESCRIPTION: Returns the translation of text from the cache, calling
+#              translate and caching its result on a miss
+# PARAMETERS : text (str) - Source text
+#              target_lang (str) - Target language code
+#              translate (callable) - translate(text, target_lang) -> str;
+#                  raises on failure
+#              backend (str) - Name of the translation backend
+#              source_lang (str) - Source language code ("auto" = detected)
+# RETURNS    : str - Translated text
+
+def cached_translate(text, target_lang, translate, backend, source_lang="auto"):
+    if not TRANSLATE_CACHE_ENABLED or not text:
+        return translate(text, target_lang)
+    if len(text) > TRANSLATE_CACHE_MAX_CHARS:
+        _count("skipped")
+        return translate(text, target_lang)
+
+    key = cache_key(text, source_lang, target_lang, backend)
+    cached = lookup(key)
+    if cached is None:
+        cached = translate(text, target_lang)
+        store(key, backend, source_lang, target_lang, cached)
+    return cached
+
+
+# FUNCTION   : cached_translate_many
+# DESCRIPTION: Returns the translations of several texts, taking the cached
+#              ones from the cache and passing all the others to one
+#              translate_many call, whose results are cached
+# PARAMETERS : texts (list of str) - Source texts
+#              target_lang (str) - Target language code
+#              translate_many (callable) - translate_many(texts, target_lang)
+#                  -> list of str, in order; raises on failure
+#              backend (str) - Name of the translation backend
+#              source_lang (str) - Source language code ("auto" = detected)
+# RETURNS    : list of str - Translated texts, in order
+
+def cached_translate_many(texts, target_lang, translate_many, backend, source_lang="auto"):
+    translations = [None] * len(texts)
+    keys = {}
+    for index, text in enumerate(texts):
+        if not TRANSLATE_CACHE_ENABLED or not text:
+            continue
+        if len(text) > TRANSLATE_CACHE_MAX_CHARS:
+            _count("skipped")
+            continue
+        keys[index] = cache_key(text, source_lang, target_lang, backend)
+        translations[index] = lookup(keys[index])
+
+    missing = [index for index, translated in enumerate(translations) if translated is None]
+    if missing:
+        for index, translated in zip(missing, translate_many([texts[i] for i in missing], target_lang)):
+            translations[index] = translated
+            if index in keys:
+                store(keys[index], backend, source_lang, target_lang, translated)
+    return translations
+
+
+# FUNCTION   : invalidate
+# DESCRIPTION: Removes every cached translation, or those of one backend. The
+#              cache's generation is bumped with the delete, so every process
+#              drops its memory entries within CACHE_GENERATION_CHECK_INTERVAL
+#              seconds; those of other backends are then read back from the
+#              table.
+# PARAMETERS : backend (str, optional)
+# RETURNS    : int - Number of database rows deleted
+
+def invalidate(backend=None):
+    conn = get_db_connection()
+    try:
+        c = conn.cursor()
+        if backend:
+            c.execute("DELETE FROM translation_cache WHERE backend = %s", (backend,))
+        else:
+            c.execute("DELETE FROM translation_cache")
+        deleted = c.rowcount
+        cache_generations.bump(c, GENERATION_NAME)
+        conn.commit()
+    finally:
+        conn.close()
+    memory_cache.clear()
+    return deleted
+
+
+# FUNCTION   : stats
+# DESCRIPTION: Returns hit/miss counters for both cache tiers and the overall
+#              hit rate
+# PARAMETERS : None
+# RETURNS    : dict
+
+def stats():
+    with _counter_lock:
+        database = dict(_counters)
+    memory = memory_cache.stats()
+    hits = memory["hits"] + database["db_hits"]
+    lookups = memory["hits"] + memory["misses"]
+    return {"enabled": TRANSLATE_CACHE_ENABLED, "memory": memory, "database": database,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "generation": cache_generations.current(GENERATION_NAME)}
+
+
+if __name__ == "__main__":
+    # Admin commands:
+    #   python translation_cache.py invalidate [backend]
+    #   python translation_cache.py prune
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "invalidate":
+        print(f"Deleted {invalidate(sys.argv[2] if len(sys.argv) > 2 else None)} cached translations")
+    elif command == "prune":
+        print(f"Deleted {prune()} expired or surplus translations")
+    else:
+        print("Usage: python translation_cache.py invalidate [backend] | prune")
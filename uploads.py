@@ -0,0 +1,355 @@
+"""
+FILE       : uploads.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-04-20
+DESCRIPTION:
+This module receives uploaded files in a single pass. By default the multipart
+parser spools every file to a temporary file, which is then copied into the
+upload folder and read back again for OCR. Here the parser writes straight into
+an UploadSpool instead: the first bytes are checked against the signatures of
+the accepted image and document types, the content is hashed as it arrives
+and written to the upload folder, and the bytes are also kept in memory while
+the process-wide budget (UPLOAD_MEMORY_BYTES) allows, so OCR gets them without
+reading the file back.
+Every upload is stored under a unique name (see stored_filename), since users'
+files often share one; the original name is kept for display only.
+Files that are too large or of another type are rejected before anything is
+written. Peak RSS is sampled around every upload request.
+"""
+
+import io
+import os
+import uuid
+import hashlib
+import resource
+import threading
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.utils import secure_filename
+from config import (UPLOAD_FOLDER, ALLOWED_EXTENSIONS, DOCUMENT_EXTENSIONS,
+                    UPLOAD_MAX_FILE_BYTES, UPLOAD_MEMORY_BYTES)
+
+# Leading bytes of each accepted file type
+SIGNATURES = {
+    "png": (b"\x89PNG\r\n\x1a\n",),
+    "jpeg": (b"\xff\xd8\xff",),
+    "pdf": (b"%PDF-",),
+    "tiff": (b"II*\x00", b"MM\x00*"),
+}
+
+# Bytes needed before the type can be checked
+SIGNATURE_LENGTH = max(len(magic) for magics in SIGNATURES.values() for magic in magics)
+
+_stats_lock = threading.Lock()
+_stats = {"files": 0, "bytes": 0, "rejected": 0, "in_memory": 0, "from_disk": 0,
+          "requests": 0, "peak_rss_kb": 0, "max_rss_growth_kb": 0}
+
+
+def _count(**amounts):
+    with _stats_lock:
+        for name, amount in amounts.items():
+            _stats[name] += amount
+
+
+# FUNCTION   : stored_filename
+# DESCRIPTION: Unique name an upload is saved under in the upload folder, so
+#              an upload never replaces an earlier one of the same name (every
+#              phone's image.jpg)
+# PARAMETERS : filename (str) - Name of the uploaded file
+# RETURNS    : str - <random hex>.<extension>
+
+def stored_filename(filename):
+    name = secure_filename(filename)
+    extension = name.rsplit(".", 1)[1].lower() if "." in name else ""
+    return f"{uuid.uuid4().hex}.{extension}" if extension else uuid.uuid4().hex
+
+
+# FUNCTION   : detect_type
+# DESCRIPTION: Identifies a file from its first bytes
+# PARAMETERS : head (bytes) - Start of the file
+# RETURNS    : str (a key of SIGNATURES) or None when it is not an accepted type
+
+def detect_type(head):
+    for kind, magics in SIGNATURES.items():
+        if any(head.startswith(magic) for magic in magics):
+            return kind
+    return None
+
+
+# CLASS      : MemoryBudget
+# DESCRIPTION: Bytes of upload content the process may hold in memory at once.
+#              Once it is used up, further uploads are read from disk when
+#              they are OCR'd instead of being kept.
+
+class MemoryBudget:
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size):
+        """Take size bytes from the budget. Returns False if they don't fit."""
+        with self._lock:
+            if self.used + size > self.limit:
+                return False
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self._lock:
+            self.used = max(0, self.used - size)
+
+
+memory_budget = MemoryBudget(UPLOAD_MEMORY_BYTES)
+
+
+# CLASS      : UploadedImage
+# DESCRIPTION: A saved upload on its way through OCR. The content is either the
+#              bytes kept while the file was received, or read from the upload
+#              folder on first use. release() drops it once OCR is done.
+#              filename is the name in the upload folder and name the one
+#              shown to the user. Pages of a multi-page document also carry
+#              the document's id, name and their page number. A document
+#              that could not be read is passed on with its error, so it is
+#              reported like an image that failed OCR.
+
+class UploadedImage:
+
+    def __init__(self, filename, content=None, digest=None, reserved=0,
+                 document_id=None, document=None, page=None, name=None, error=None):
+        self.filename = filename
+        self.name = name or filename
+        self._content = content
+        self._digest = digest
+        self._reserved = reserved
+        self.document_id = document_id
+        self.document = document
+        self.page = page
+        self.error = error
+
+    @property
+    def content(self):
+        if self._content is None:
+            with open(os.path.join(UPLOAD_FOLDER, self.filename), "rb") as saved_file:
+                self._content = saved_file.read()
+            _count(from_disk=1)
+        return self._content
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.content).hexdigest()
+        return self._digest
+
+    def release(self):
+        """Forget the content and give its memory back to the budget."""
+        self._content = None
+        if self._reserved:
+            memory_budget.release(self._reserved)
+            self._reserved = 0
+
+
+# CLASS      : UploadSpool
+# DESCRIPTION: Writable stream the multipart parser fills with one uploaded
+#              file. Rejects the file as soon as it is known to be too large
+#              or of an unsupported type; otherwise writes it to <name>.part in the
+#              upload folder, which finish() renames to the final, unique name.
+
+class UploadSpool:
+
+    def __init__(self, filename, max_bytes=UPLOAD_MAX_FILE_BYTES, keep=True):
+        self.name = secure_filename(filename)
+        self.filename = stored_filename(filename)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.kind = None
+        self._hash = hashlib.sha256()
+        self._head = b""
+        self._part_path = os.path.join(UPLOAD_FOLDER, f"{self.filename}.part")
+        self._file = None
+        self._buffer = io.BytesIO() if keep else None
+        self._reserved = 0
+        self._image = None
+        self._finished = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            _count(rejected=1)
+            raise RequestEntityTooLarge(f"{self.name} is larger than {self.max_bytes} bytes")
+
+        if self._file is None:
+            # Nothing is written until the signature has been checked
+            self._head += bytes(data)
+            if len(self._head) < SIGNATURE_LENGTH:
+                return len(data)
+            self._open()
+            data, self._head = self._head, b""
+
+        self._hash.update(data)
+        self._file.write(data)
+        if self._buffer is not None:
+            if memory_budget.reserve(len(data)):
+                self._reserved += len(data)
+                self._buffer.write(data)
+            else:
+                # Over budget: this file will be read from disk instead
+                self._drop_buffer()
+        return len(data)
+
+    def _open(self):
+        self.kind = detect_type(self._head)
+        if self.kind is None:
+            self.close()
+            _count(rejected=1)
+            raise UnsupportedMediaType(f"{self.name} is not a supported image or document")
+        self._file = open(self._part_path, "wb")
+
+    def _drop_buffer(self):
+        self._buffer = None
+        memory_budget.release(self._reserved)
+        self._reserved = 0
+
+    def seek(self, offset, whence=0):
+        # The parser rewinds the stream once the part is complete
+        if self._file is None:
+            self._open()
+            self._hash.update(self._head)
+            self._file.write(self._head)
+            self._head = b""
+        self._file.flush()
+        return 0
+
+    def tell(self):
+        return self.size
+
+    def read(self, size=-1):
+        with open(self._path(), "rb") as saved_file:
+            return saved_file.read(size)
+
+    def readable(self):
+        return True
+
+    def _path(self):
+        return os.path.join(UPLOAD_FOLDER, self.filename) if self._finished else self._part_path
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def finish(self):
+        """Move the file to its final name in the upload folder. Returns the name."""
+        if not self._finished:
+            self._file.close()
+            os.replace(self._part_path, os.path.join(UPLOAD_FOLDER, self.filename))
+            self._finished = True
+            _count(files=1, bytes=self.size)
+        return self.filename
+
+    def image(self):
+        """Finish the file and return it as an UploadedImage for OCR."""
+        if self._image is None:
+            self.finish()
+            content = None
+            if self._buffer is not None:
+                # BytesIO hands over its buffer without copying it
+                content = self._buffer.getvalue()
+                self._buffer = None
+                _count(in_memory=1)
+            self._image = UploadedImage(self.filename, content, self.digest, self._reserved,
+                                        name=self.name)
+            self._reserved = 0
+        return self._image
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+        if not self._finished and os.path.exists(self._part_path):
+            os.remove(self._part_path)
+        if self._buffer is not None:
+            self._drop_buffer()
+        if self._image is not None:
+            self._image.release()
+
+    @property
+    def closed(self):
+        return self._file is None or self._file.closed
+
+
+# CLASS      : UploadRequest
+# DESCRIPTION: Flask request class that gives each uploaded file an UploadSpool
+#              and cleans up every spool (kept bytes, unfinished files) when
+#              the request ends, even if parsing was aborted part-way.
+
+class UploadRequest(Request):
+
+    # Set to False when uploads are only stored (e.g. OCR job mode)
+    keep_in_memory = True
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        if not filename:
+            # Empty file input in the form
+            return io.BytesIO()
+        extension = filename.rsplit(".", 1)[1].lower() if "." in filename else ""
+        if extension not in ALLOWED_EXTENSIONS:
+            _count(rejected=1)
+            raise UnsupportedMediaType(f"{filename} is not a supported image or document")
+        # Documents are split into pages from disk, so their bytes are not kept
+        keep = self.keep_in_memory and extension not in DOCUMENT_EXTENSIONS
+        spool = UploadSpool(filename, keep=keep)
+        self.__dict__.setdefault("_upload_spools", []).append(spool)
+        return spool
+
+    def close(self):
+        super().close()
+        for spool in self.__dict__.get("_upload_spools", ()):
+            spool.close()
+
+
+# FUNCTION   : rss_kb
+# DESCRIPTION: Current and peak resident set size of this process
+# PARAMETERS : None
+# RETURNS    : tuple - (current KB or None when unavailable, peak KB)
+
+def rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        with open("/proc/self/statm") as statm:
+            current = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        current = None
+    return current, peak
+
+
+# FUNCTION   : record_request_rss
+# DESCRIPTION: Records how far an upload request raised the process's peak RSS
+# PARAMETERS : peak_before (int) - Peak RSS in KB when the request started
+# RETURNS    : int - Growth of the peak in KB during the request
+
+def record_request_rss(peak_before):
+    _, peak = rss_kb()
+    growth = max(0, peak - peak_before)
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats["peak_rss_kb"] = max(_stats["peak_rss_kb"], peak)
+        _stats["max_rss_growth_kb"] = max(_stats["max_rss_growth_kb"], growth)
+    return growth
+
+
+# FUNCTION   : stats
+# DESCRIPTION: Returns upload counters, memory budget use and RSS figures
+# PARAMETERS : None
+# RETURNS    : dict
+
+def stats():
+    with _stats_lock:
+        totals = dict(_stats)
+    totals["rss_kb"], _ = rss_kb()
+    totals["memory_budget"] = {"limit": memory_budget.limit, "used": memory_budget.used}
+    totals["max_file_bytes"] = UPLOAD_MAX_FILE_BYTES
+    return totals
@@ -1,49 +1,142 @@
-"""
-FILE       : vision_api.py
-PROJECT    : Handwritten OCR | Capstone Project 2025
-PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
-             Shubh Soni (8887735), Dev Patel (8866936)
-DATE       : 2025-03-10
-DESCRIPTION:
-This module uses the Google Cloud Vision API to extract handwritten text from
-uploaded images. It provides a utility function that performs OCR using the
-document_text_detection endpoint.
-"""
-
-
-'''
-    References: We have used the Google Vision API to extract text from images. The API is free to use and has a limit of 1000 requests per user
-    The link to the API is given below: 
-    - https://cloud.google.com/vision/docs/ocr
-    - https://cloud.google.com/vision/docs/reference/rest/v1/images/annotate
-'''
-
-
-import os
-import io
-from google.cloud import vision
-
-#  local credentials file when running locally
-if os.getenv("GAE_ENV", "").startswith(""):  # Only set when running locally
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "lucid-diode-452919-p1-e5138e5e4227.json"
-
-# FUNCTION   : extract_text
-# DESCRIPTION: Extracts handwritten text from a given image using the
-#              Google Cloud Vision API's document_text_detection feature.
-# PARAMETERS : image_path (str) - Path to the image file to be processed
-# RETURNS    : str - Extracted full text from the image
-
-def extract_text(image_path):
-    """Extracts handwritten text using Google Vision API."""
-    client = vision.ImageAnnotatorClient()
-
-    with io.open(image_path, "rb") as image_file:
-        content = image_file.read()
-
-    image = vision.Image(content=content)
-    response = client.document_text_detection(image=image)
-
-    if response.error.message:
-        raise Exception(f"Vision API Error: {response.error.message}")
-
-    return response.full_text_annotation.text
+"""
+FILE       : vision_api.py
+PROJECT    : Handwritten OCR | Capstone Project 2025
+PROGRAMMER : Bhuwan Shrestha (8892146), Alen Varghese (8827755),
+             Shubh Soni (8887735), Dev Patel (8866936)
+DATE       : 2025-03-10
+DESCRIPTION:
+This module uses the Google Cloud Vision API to extract handwritten text from
+uploaded images. It provides a utility function that performs OCR using the
+document_text_detection endpoint through the engine layer in ocr_engine.py.
+Images are shrunk by the pre-processing stage (preprocess.py) before they are
+sent, and results are served from the OCR cache when the same image was seen
+before. Besides the text, the layout of the result (words, boxes and
+confidences) can be returned in packed form for storage (see layout.py).
+While the OCR engine's circuit breaker is open, calls go to the fallback
+engine (OCR_FALLBACK_ENGINE) when one is configured.
+"""
+
+
+'''
+    References: We have used the Google Vision API to extract text from images. The API is free to use and has a limit of 1000 requests per user
+    The link to the API is given below: 
+    - https://cloud.google.com/vision/docs/ocr
+    - https://cloud.google.com/vision/docs/reference/rest/v1/images/annotate
+'''
+
+
+import os
+import io
+from ocr_engine import get_engine, get_fallback_engine, CircuitOpen
+from ocr_cache import cached_extract, cached_extract_batch, cached_extract_text, OCR_OPTIONS
+import preprocess
+import metrics
+
+#  local credentials file when running locally
+if os.getenv("GAE_ENV", "").startswith(""):  # Only set when running locally
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "lucid-diode-452919-p1-e5138e5e4227.json"
+
+# FUNCTION   : extract_text
+# DESCRIPTION: Extracts handwritten text from a given image using the
+#              configured OCR engine (Google Cloud Vision's
+#              document_text_detection feature by default).
+# PARAMETERS : image_path (str) - Path to the image file to be processed
+# RETURNS    : str - Extracted full text from the image
+
+def extract_text(image_path):
+    """Extracts handwritten text using Google Vision API."""
+    with io.open(image_path, "rb") as image_file:
+        content = image_file.read()
+
+    return extract_text_from_bytes(content)
+
+
+# FUNCTION   : extract_text_from_bytes
+# DESCRIPTION: Same as extract_text for image bytes that are already in memory
+# PARAMETERS : content (bytes) - Raw image bytes
+#              digest (str, optional) - SHA-256 of content if already known
+# RETURNS    : str - Extracted full text from the image
+
+def extract_text_from_bytes(content, digest=None):
+    return with_fallback(lambda engine: cached_extract_text(
+        content, engine, ocr_options(), prepare=preprocess.prepare_for_ocr, digest=digest))
+
+
+# FUNCTION   : extract_from_bytes
+# DESCRIPTION: Same as extract_text_from_bytes, also returning the packed layout
+# PARAMETERS : content (bytes) - Raw image bytes
+#              digest (str, optional) - SHA-256 of content if already known
+# RETURNS    : tuple - (text, packed layout or None)
+
+def extract_from_bytes(content, digest=None):
+    return with_fallback(lambda engine: cached_extract(
+        content, engine, ocr_options(), prepare=preprocess.prepare_for_ocr, digest=digest))
+
+
+# FUNCTION   : extract_text_batch
+# DESCRIPTION: Extracts text from several images using batched Vision requests.
+#              A failure on one image does not affect the others.
+# PARAMETERS : image_paths (list of str) - Paths to the image files, in order
+# RETURNS    : list of (text, error) tuples in the same order as image_paths
+
+def extract_text_batch(image_paths):
+    """Extracts handwritten text from several images in batched requests."""
+    contents = []
+    for image_path in image_paths:
+        with io.open(image_path, "rb") as image_file:
+            contents.append(image_file.read())
+
+    return extract_text_batch_from_bytes(contents)
+
+
+# FUNCTION   : extract_text_batch_from_bytes
+# DESCRIPTION: Same as extract_text_batch for image bytes already in memory
+# PARAMETERS : contents (list of bytes) - Raw image bytes, in order
+#              digests (list of str, optional) - SHA-256 of each content
+# RETURNS    : list of (text, error) tuples in the same order as contents
+
+def extract_text_batch_from_bytes(contents, digests=None):
+    return [(text, error) for text, _, error in extract_batch_from_bytes(contents, digests)]
+
+
+# FUNCTION   : extract_batch_from_bytes
+# DESCRIPTION: Same as extract_text_batch_from_bytes, also returning the packed
+#              layout of each image
+# PARAMETERS : contents (list of bytes) - Raw image bytes, in order
+#              digests (list of str, optional) - SHA-256 of each content
+# RETURNS    : list of (text, layout, error) tuples in the same order as contents
+
+def extract_batch_from_bytes(contents, digests=None):
+    try:
+        return with_fallback(lambda engine: cached_extract_batch(
+            contents, engine, ocr_options(), prepare=preprocess.prepare_for_ocr, digests=digests))
+    except CircuitOpen as e:
+        return [(None, None, str(e))] * len(contents)
+
+
+# FUNCTION   : with_fallback
+# DESCRIPTION: Runs an OCR call on the active engine, or on the fallback engine
+#              when the active one's circuit breaker is open. Results of the
+#              fallback engine are cached under its own name.
+# PARAMETERS : call (callable) - Takes the engine to use
+# RETURNS    : Whatever call returns; raises CircuitOpen when there is no fallback
+
+def with_fallback(call):
+    with metrics.stage("extract_text"):
+        try:
+            return call(get_engine())
+        except CircuitOpen:
+            fallback = get_fallback_engine()
+            if fallback is None:
+                raise
+            return call(fallback)
+
+
+# FUNCTION   : ocr_options
+# DESCRIPTION: Describes everything besides the image that affects OCR output
+#              (the Vision feature and the pre-processing settings)
+# PARAMETERS : None
+# RETURNS    : str - Used as part of the OCR cache key
+
+def ocr_options():
+    return f"{OCR_OPTIONS}+{preprocess.signature()}"